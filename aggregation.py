@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+CUBE_KEYS = ["year", "month", "region", "type"]
+CUBE_MEASURES = ["Total Volume", "EarnedRevenue"]
+
+
+def _codes(values):
+    # Integer codes and their labels, reusing the codes of categoricals
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories.astype(str)
+    codes, labels = pd.factorize(values, sort=True)
+    return codes, pd.Index(labels).astype(str)
+
+
+def build_cube(df):
+    # Sum Total Volume and EarnedRevenue over every (year, month, region, type)
+    # cell in a single pass: each row gets one flat cell number and np.bincount
+    # adds up all the measures by it
+    months = df["Date"].to_numpy(dtype="datetime64[ns]").astype("datetime64[M]").astype(np.int64)
+    month_values, month_codes = np.unique(months, return_inverse=True)
+    region_codes, regions = _codes(df["region"])
+    type_codes, types = _codes(df["type"])
+
+    shape = (len(month_values), len(regions), len(types))
+    cells = np.ravel_multi_index((month_codes, region_codes, type_codes), shape)
+    size = int(np.prod(shape))
+
+    volume = df["Total Volume"].to_numpy(dtype=np.float64)
+    if "EarnedRevenue" in df:
+        revenue = df["EarnedRevenue"].to_numpy(dtype=np.float64)
+    else:
+        revenue = df["AveragePrice"].to_numpy(dtype=np.float64) * volume
+    totals = {
+        "Total Volume": np.bincount(cells, weights=volume, minlength=size),
+        "EarnedRevenue": np.bincount(cells, weights=revenue, minlength=size),
+        "rows": np.bincount(cells, minlength=size),
+    }
+
+    # Keep only the cells that actually have rows
+    present = np.flatnonzero(totals["rows"])
+    month_index, region_index, type_index = np.unravel_index(present, shape)
+    cube = pd.DataFrame(
+        {
+            "year": month_values[month_index] // 12 + 1970,
+            "month": month_values[month_index] % 12 + 1,
+            "region": regions[region_index],
+            "type": types[type_index],
+            **{name: values[present] for name, values in totals.items()},
+        }
+    )
+    return cube
+
+
+def rollup(cube, by, measures=CUBE_MEASURES):
+    # Cheap roll-up of the cube to any subset of its keys
+    return cube.groupby(by, sort=True)[measures].sum()
+
@@ -1,42 +1,104 @@
-import pandas as pd
-from dash import Dash, dcc, html, Input, Output, dash_table
-import plotly.express as px
-from prophet import Prophet
-import datetime
-
-# Read the data and preprocess it
-data = (
-    pd.read_csv("avocado.csv")
-    .assign(Date=lambda data: pd.to_datetime(data["Date"], format="%Y-%m-%d"))
-    .sort_values(by="Date")
-)
-regions = data["region"].sort_values().unique()
-avocado_types = data["type"].sort_values().unique()
+import os
+import time
+from functools import lru_cache
+
+import numpy as np
+from dash import ClientsideFunction, Dash, dcc, html, Input, Output, State, no_update
+from flask import jsonify
+
+import figures
+from compression import enable_compression
+from data_loader import compact_frame, dataset_version, load_avocado
+from decomposition import cached_decomposition
+from downsample import downsample, points_for_width
+from forecasting import DEFAULT_ENGINE, ForecastWorker
+from ingest import DROP_DIR, DropDirectoryWatcher
+from metrics import enable_metrics, observe_phase, phase
+from result_cache import RESULT_CACHE_TTL, DiskCache, cached
+from store import DataStore
 
-# Modify the data to include the week number and month and replace the unnamed column with the week number
-data["Week"] = data["Date"].dt.week
-data["Month"] = data["Date"].dt.month
-data["Year"] = data["Date"].dt.year
-# Drop the unnamed column
-data = data.drop(columns=["Unnamed: 0"])
-# Create Index column
-data["Index"] = range(1, len(data) + 1)
+# Read the data from the columnar cache with the compact schema: categorical
+# region and type, float32 measures and an int16 year. Week, month and the
+# like are not stored; take them from Date where they are needed.
+data = load_avocado(compact=True)
 
-# Reorder the columns
-data = data[["Index", "Date", "Year", "Month", "Week", "AveragePrice", "Total Volume", "4046", "4225", "4770", "Total Bags", "Small Bags", "Large Bags", "XLarge Bags", "type", "year", "region"]]
 
+# Keep the data indexed by (region, type) so callbacks can slice instead of scanning.
+# Rows dropped into the incoming directory are merged in without a restart
+# (by the development server; see PREFORK below).
+with phase("load", "index"):
+    store = DataStore(data, dataset_version())
+watcher = DropDirectoryWatcher(DROP_DIR)
+with phase("load", "ingest"):
+    for rows in watcher.scan():
+        store.append(compact_frame(rows))
 
-# Perform time series forecasting
-prophet_data = data[["Date", "AveragePrice"]].rename(columns={"Date": "ds", "AveragePrice": "y"})
+
+# Forecast the average price of every (region, type) series in the background,
+# reusing the cached forecasts when the data and settings are unchanged.
+# AVOCADO_FORECAST_ENGINE picks the model: prophet (the default) or arima fit
+# each series in parallel, holt-winters or seasonal-naive fit all of them at
+# once in well under a second.
 confidence_interval = 0.95
-model = Prophet(interval_width=confidence_interval)
-model.fit(prophet_data)
-weeks_to_forecast = 12 # Forecasting for 4 weeks
-last_date = data["Date"].max()
-forecast_start_date = last_date + datetime.timedelta(days=7)
-future_dates = pd.date_range(start=forecast_start_date, periods=weeks_to_forecast, freq="W")
-future = model.make_future_dataframe(periods=weeks_to_forecast, freq="W", include_history=False)
-forecast = model.predict(future)
+weeks_to_forecast = 12 # Forecasting for 12 weeks
+forecast_engine = os.environ.get("AVOCADO_FORECAST_ENGINE", DEFAULT_ENGINE)
+forecast_worker = ForecastWorker(
+    store.index,
+    store.version,
+    interval_width=confidence_interval,
+    weeks_to_forecast=weeks_to_forecast,
+    engine=forecast_engine,
+)
+
+
+# Merge new rows and refit only the series they touched, warm-started
+def ingest_rows(rows):
+    series_keys = store.append(compact_frame(rows))
+    if series_keys:
+        forecast_worker.refit(store.index, store.version, series_keys)
+
+
+# Under a pre-forking server (see wsgi.py) the forecasts are loaded here,
+# before the fork, so every worker shares them with the data. Live ingest is
+# off there: merging rows rebuilds the index and matrix, which would give
+# every worker its own private copy (and, for a while, its own data version).
+# Rows dropped into the incoming directory are merged by the scan above the
+# next time the server starts, e.g. on a gunicorn USR2 upgrade.
+PREFORK = os.environ.get("AVOCADO_PREFORK") == "1"
+
+
+def start_background():
+    # The forecast worker first: it forks its process pool before any other
+    # thread is running
+    forecast_worker.start()
+    watcher.start(ingest_rows)
+
+
+if PREFORK:
+    with phase("startup", "forecasts"):
+        forecast_worker.prime()
+else:
+    start_background()
+
+
+def filter_options():
+    regions = sorted(store.data["region"].unique())
+    avocado_types = sorted(store.data["type"].unique())
+    return (
+        [{"label": region, "value": region} for region in regions],
+        [
+            {"label": avocado_type.title(), "value": avocado_type}
+            for avocado_type in avocado_types
+        ],
+    )
+
+
+region_options, type_options = filter_options()
+
+# Regions compared when the page opens
+comparison_regions = [
+    region for region in ["Albany", "Boston", "Chicago"] if region in store.matrix.regions
+]
 
 # Set the External Stylesheets
 external_stylesheets = [
@@ -52,12 +114,85 @@ external_stylesheets = [
 # Create the Dash application instance
 app = Dash(__name__, external_stylesheets=external_stylesheets)
 
+# Time every request and serve the timings on /metrics. This is registered
+# first so the compression below counts towards the request time.
+enable_metrics(app.server)
+
+# Compress the callback and layout responses
+enable_compression(app.server)
+
 # Set the application title
 app.title = "Avocado Analytics: Understand Your Avocados!"
 
 
-# Create the application layout
+# Figures and tables are cached on disk for every worker on the host, keyed by
+# the callback inputs, the data or forecast version they were built from and
+# the code version (result_cache.code_version). Old entries expire with the
+# TTL or are evicted once the cache is full.
+result_cache = DiskCache() if RESULT_CACHE_TTL > 0 else None
+
+
+# Health check for the load balancer: 200 once the forecasts are ready, 503 before
+@app.server.route("/health")
+def health():
+    status = forecast_worker.status
+    return jsonify({"forecast": status}), 200 if status == "ready" else 503
+
+
+# The whole selected series for the browser. The date range is applied there
+# (assets/client_filter.js), so only a new region or type reaches the server.
+@cached(result_cache)
+def series_data(region, avocado_type, data_version):
+    with phase("series-store", "filter"):
+        columns = store.index.columns(
+            region, avocado_type, names=["Date", "AveragePrice", "Total Volume"]
+        )
+    with phase("series-store", "encode"):
+        return figures.series_store(columns)
+
+
+# Several regions side by side for one type, gathered from the store's date x
+# region matrices. Weeks a region has no row for are left out of its line.
+@cached(result_cache)
+def comparison_chart(regions, avocado_type, metric, data_version):
+    with phase("comparison-chart", "gather"):
+        if metric == "share":
+            dates, values = store.matrix.share(avocado_type, regions)
+        else:
+            dates, values = store.matrix.columns(avocado_type, regions, metric)
+    with phase("comparison-chart", "filter"):
+        series = {}
+        for position, region in enumerate(regions):
+            present = ~np.isnan(values[:, position])
+            series[region] = (dates[present], values[present, position])
+    with phase("comparison-chart", "figure"):
+        return figures.comparison_figure(series, metric)
+
+
+# Trend, seasonal and residual volume of every series, decomposed together
+# once per data version and kept on disk for the other workers and restarts
+@lru_cache(maxsize=1)
+def decomposition_for(data_version):
+    return cached_decomposition(store.matrix, data_version)
+
+
+@cached(result_cache)
+def decomposition_chart(region, avocado_type, points, data_version):
+    with phase("decomposition-chart", "filter"):
+        components = downsample(
+            decomposition_for(data_version).series(region, avocado_type),
+            "Date",
+            "observed",
+            points,
+        )
+    with phase("decomposition-chart", "figure"):
+        return figures.decomposition_figure(components)
+
 
+# Create the application layout. Everything on it that depends on the
+# selection is filled in by the callbacks when the page loads, so building it
+# only costs the series-store of the default selection.
+layout_started = time.perf_counter()
 app.layout = html.Div(
     children=[
         html.Div(
@@ -81,10 +216,7 @@ app.layout = html.Div(
                         html.Div(children="Region", className="menu-title"),
                         dcc.Dropdown(
                             id="region-filter",
-                            options=[
-                                {"label": region, "value": region}
-                                for region in regions
-                            ],
+                            options=region_options,
                             value="Albany",
                             clearable=False,
                             className="dropdown",
@@ -96,13 +228,7 @@ app.layout = html.Div(
                         html.Div(children="Type", className="menu-title"),
                         dcc.Dropdown(
                             id="type-filter",
-                            options=[
-                                {
-                                    "label": avocado_type.title(),
-                                    "value": avocado_type,
-                                }
-                                for avocado_type in avocado_types
-                            ],
+                            options=type_options,
                             value="organic",
                             clearable=False,
                             searchable=False,
@@ -118,10 +244,10 @@ app.layout = html.Div(
                         ),
                         dcc.DatePickerRange(
                             id="date-range",
-                            min_date_allowed=data["Date"].min().date(),
-                            max_date_allowed=data["Date"].max().date(),
-                            start_date=data["Date"].min().date(),
-                            end_date=data["Date"].max().date(),
+                            min_date_allowed=store.data["Date"].min().date(),
+                            max_date_allowed=store.data["Date"].max().date(),
+                            start_date=store.data["Date"].min().date(),
+                            end_date=store.data["Date"].max().date(),
                         ),
                     ]
                 ),
@@ -134,12 +260,7 @@ app.layout = html.Div(
                     children=[
                         dcc.Graph(
                             id="price-chart",
-                            figure=px.line(
-                                data,
-                                x="Date",
-                                y="AveragePrice",
-                                title="Average Price of Avocados"
-                            ),
+                            figure=figures.price_figure([], []),
                         ),
                     ],
                     className="graph-container",
@@ -148,11 +269,17 @@ app.layout = html.Div(
                     children=[
                         dcc.Graph(
                             id="volume-chart",
-                            figure=px.line(
-                                data,
-                                x="Date",
-                                y="Total Volume",
-                                title="Avocados Sold"
+                            figure=figures.volume_figure([], []),
+                        ),
+                    ],
+                    className="graph-container",
+                ),
+                html.Div(
+                    children=[
+                        dcc.Graph(
+                            id="decomposition-chart",
+                            figure=figures.pending_figure(
+                                "Trend and Seasonality of Avocados Sold"
                             ),
                         ),
                     ],
@@ -162,12 +289,7 @@ app.layout = html.Div(
                     children=[
                         dcc.Graph(
                             id="forecast-chart",
-                            figure=px.line(
-                                forecast,
-                                x="ds",
-                                y=["yhat", "yhat_lower", "yhat_upper"],
-                                title="Forecasted Average Price of Avocados"
-                            ),
+                            figure=figures.pending_forecast_figure(),
                         ),
                     ],
                     className="graph-container",
@@ -179,182 +301,265 @@ app.layout = html.Div(
             id="forecast-table",
             children=[
                 html.H2("Projected or Future Price Data"),
-                html.Table(
-                    className="forecast-table",
+                figures.pending_forecast_table(),
+            ],
+            className="wrapper"
+        ),
+        html.Div(
+            id="summary-table",
+            children=[
+                html.H2("Summary Statistics"),
+                figures.pending_stats_table(
+                    ["AveragePrice", "Total Volume"], id="summary-data"
+                ),
+            ],
+            className="wrapper",
+        ),
+        html.Div(
+            children=[
+                html.H2("Compare Regions"),
+                html.Div(
                     children=[
-                        html.Thead(
-                            html.Tr(
-                                children=[
-                                    html.Th("Date"),
-                                    html.Th("Projected Price"),
-                                    html.Th("Lower Bound"),
-                                    html.Th("Upper Bound"),
-                                ]
-                            )
+                        html.Div(
+                            children=[
+                                html.Div(children="Regions", className="menu-title"),
+                                dcc.Dropdown(
+                                    id="comparison-regions",
+                                    options=region_options,
+                                    value=comparison_regions,
+                                    multi=True,
+                                ),
+                            ]
                         ),
-                        html.Tbody(
-                            [
-                                html.Tr(
-                                    children=[
-                                        html.Td(str(date)),
-                                        html.Td(f"${price:.2f}"),
-                                        html.Td(f"${lower_bound:.2f}"),
-                                        html.Td(f"${upper_bound:.2f}"),
-                                    ]
-                                )
-                                for date, price, lower_bound, upper_bound in zip(
-                                    forecast["ds"].tail(weeks_to_forecast),
-                                    forecast["yhat"].tail(weeks_to_forecast),
-                                    forecast["yhat_lower"].tail(weeks_to_forecast),
-                                    forecast["yhat_upper"].tail(weeks_to_forecast),
-                                )
+                        html.Div(
+                            children=[
+                                html.Div(children="Metric", className="menu-title"),
+                                dcc.RadioItems(
+                                    id="comparison-metric",
+                                    options=[
+                                        {"label": settings["label"], "value": metric}
+                                        for metric, settings in figures.COMPARISON_METRICS.items()
+                                    ],
+                                    value="AveragePrice",
+                                    inline=True,
+                                ),
                             ]
                         ),
                     ],
                 ),
+                html.Div(
+                    children=[
+                        dcc.Graph(
+                            id="comparison-chart",
+                            figure=figures.pending_figure("Compare Regions"),
+                        ),
+                    ],
+                    className="graph-container",
+                ),
             ],
-            className="wrapper"
+            className="wrapper",
+        ),
+        # Polls for the background forecast and is switched off once it is done
+        dcc.Interval(id="forecast-poll", interval=2000),
+        # Browser window width, used to cap the points drawn per trace
+        dcc.Store(id="viewport-width"),
+        # Dates and measures of the selected series, sliced in the browser
+        dcc.Store(
+            id="series-store",
+            data=series_data("Albany", "organic", store.version),
         ),
+        # Every date of the compared regions, sliced in the browser as well
+        dcc.Store(id="comparison-store"),
+        # Version of the data on the page, bumped when new rows are ingested
+        dcc.Store(id="data-version", data=store.version),
+        dcc.Interval(id="data-poll", interval=10000),
     ]
 )
 
 
 
-# Define the callback function to update the graphs and selected data based on the selected date range
+# Each output has its own callback so it is only recomputed when its own
+# inputs change. The date range and the window width are handled in the
+# browser from the series-store; the server only sends a new series.
+
+app.clientside_callback(
+    "function(id) { return window.innerWidth; }",
+    Output("viewport-width", "data"),
+    Input("viewport-width", "id"),
+)
+
 
 @app.callback(
-    [Output("price-chart", "figure"),
-        Output("volume-chart", "figure"),
-        Output("forecast-chart", "figure"),
-        Output("forecast-table", "children")],
+    Output("series-store", "data"),
     [
         Input("region-filter", "value"),
         Input("type-filter", "value"),
+        Input("data-version", "data"),
+    ],
+    prevent_initial_call=True,
+)
+def update_series_store(region, avocado_type, version):
+    return series_data(region, avocado_type, store.version)
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace="avocado", function_name="priceChart"),
+    Output("price-chart", "figure"),
+    [
+        Input("series-store", "data"),
         Input("date-range", "start_date"),
         Input("date-range", "end_date"),
-    ],    
+        Input("viewport-width", "data"),
+    ],
+    State("price-chart", "figure"),
 )
-def update_data(region, avocado_type, start_date, end_date):
-    filtered_data = data.query(
-        "region == @region & type == @avocado_type"
-        " and Date >= @start_date and Date <= @end_date"
-    )
 
-    
-    
-    price_chart_figure = {
-        "data": [
-            {
-                "x": filtered_data["Date"],
-                "y": filtered_data["AveragePrice"],
-                "type": "lines",
-                "hovertemplate": "$%{y:.2f}<extra></extra>",
-            },
-        ],
-        "layout": {
-            "title": {
-                "text": "Average Price of Avocados",
-                "x": 0.05,
-                "xanchor": "left",
-            },
-            "xaxis": {"fixedrange": True},
-            "yaxis": {"tickprefix": "$", "fixedrange": True},
-            "colorway": ["#17B897"],
-        },
-    }
-    price_chart_figure["data"][0]["line"] = {"color": "#E12D39"}
-    price_chart_figure["data"][0]["hovertemplate"] = "$%{y:.2f}<extra></extra>"
-    price_chart_figure["layout"]["yaxis"]["title"] = {"text": "Price"}
-    price_chart_figure["layout"]["xaxis"]["title"] = {"text": "Date"}
-
-
-
-    volume_chart_figure = {
-        "data": [
-            {
-                "x": filtered_data["Date"],
-                "y": filtered_data["Total Volume"],
-                "type": "lines",
-            },
-        ],
-        "layout": {
-            "title": {"text": "Avocados Sold", "x": 0.05, "xanchor": "left"},
-            "xaxis": {"fixedrange": True},
-            "yaxis": {"fixedrange": True},
-            "colorway": ["#E12D39"],
-        },
-    }
-    volume_chart_figure["data"][0]["line"] = {"color": "#17B897"}
-    volume_chart_figure["data"][0]["hovertemplate"] = "%{y:.2f}<extra></extra>"
-    volume_chart_figure["layout"]["yaxis"]["title"] = {"text": "Avocados Sold"}
-    volume_chart_figure["layout"]["xaxis"]["title"] = {"text": "Date"}
-
-
-
-    forecast_chart_figure = {
-        "data": [
-            {
-                "x": forecast["ds"],
-                "y": forecast["yhat"],
-                "type": "lines",
-                "hovertemplate": "$%{y:.2f}<extra></extra>",
-            },
-            {
-                "x": forecast["ds"],
-                "y": forecast["yhat_upper"],
-                "type": "lines",
-                "hovertemplate": "$%{y:.2f}<extra></extra>",
-                "line": {"color": "#E12D39", "dash": "dash"},
-                "showlegend": False,
-            },
-            {
-                "x": forecast["ds"],
-                "y": forecast["yhat_lower"],
-                "type": "lines",
-                "hovertemplate": "$%{y:.2f}<extra></extra>",
-                "line": {"color": "#E12D39", "dash": "dash"},
-                "showlegend": False,
-            },
-        ],
-        "layout": {
-            "title": {
-                "text": "Forecasted Average Price of Avocados",
-                "x": 0.05,
-                "xanchor": "left",
-            },
-            "xaxis": {"fixedrange": True},
-            "yaxis": {"tickprefix": "$", "fixedrange": True},
-            "colorway": ["#17B897"],
-        },
-    }
-    forecast_chart_figure["layout"]["yaxis"]["title"] = {"text": "Price"}
-    forecast_chart_figure["layout"]["xaxis"]["title"] = {"text": "Date"}
-    forecast_chart_figure["layout"]["hovermode"] = "x unified"
-    
-
-
-    forecast_table_data = forecast.loc[
-        :, ["ds", "yhat", "yhat_lower", "yhat_upper"]
-    ].tail(weeks_to_forecast)
-
-    forecast_table_data.rename(
-        columns={"ds": "Date", "yhat": "Projected Price"}, inplace=True
-    )
+app.clientside_callback(
+    ClientsideFunction(namespace="avocado", function_name="volumeChart"),
+    Output("volume-chart", "figure"),
+    [
+        Input("series-store", "data"),
+        Input("date-range", "start_date"),
+        Input("date-range", "end_date"),
+        Input("viewport-width", "data"),
+    ],
+    State("volume-chart", "figure"),
+)
 
-    forecast_table = dash_table.DataTable(
-        data=forecast_table_data.to_dict("records"),
-        columns=[{"id": c, "name": c} for c in forecast_table_data.columns],
-        style_cell={"textAlign": "left"},
-        style_header={
-            "backgroundColor": "white",
-            "fontWeight": "bold",
-            "border": "1px solid black",
-        },
-        style_data={"border": "1px solid black"},
-    )
-    
-    
-    return price_chart_figure, volume_chart_figure, forecast_chart_figure, forecast_table
+# Summary statistics of the selected series and date range
+app.clientside_callback(
+    ClientsideFunction(namespace="avocado", function_name="summary"),
+    Output("summary-data", "data"),
+    [
+        Input("series-store", "data"),
+        Input("date-range", "start_date"),
+        Input("date-range", "end_date"),
+    ],
+)
+
+
+@app.callback(
+    Output("decomposition-chart", "figure"),
+    [
+        Input("region-filter", "value"),
+        Input("type-filter", "value"),
+        Input("viewport-width", "data"),
+        Input("data-version", "data"),
+    ],
+)
+def update_decomposition_chart(region, avocado_type, width, version):
+    return decomposition_chart(region, avocado_type, points_for_width(width), store.version)
+
+
+# The comparison uses the selected type with its own regions. The server
+# sends every date of them once; the date range and the window width are
+# applied in the browser, as for the price and volume charts.
+@app.callback(
+    Output("comparison-store", "data"),
+    [
+        Input("comparison-regions", "value"),
+        Input("comparison-metric", "value"),
+        Input("type-filter", "value"),
+        Input("data-version", "data"),
+    ],
+)
+def update_comparison_store(regions, metric, avocado_type, version):
+    return comparison_chart(regions or [], avocado_type, metric, store.version)
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace="avocado", function_name="comparisonChart"),
+    Output("comparison-chart", "figure"),
+    [
+        Input("comparison-store", "data"),
+        Input("date-range", "start_date"),
+        Input("date-range", "end_date"),
+        Input("viewport-width", "data"),
+    ],
+)
+
+
+# The forecast outputs only change with the series and the forecast version, so
+# they are built once per series after the forecast is ready and served from
+# memory, or from the shared cache if another worker built them first
+@lru_cache(maxsize=1024)
+@cached(result_cache)
+def forecast_outputs(region, avocado_type, forecast_version):
+    forecast = forecast_worker.get((region, avocado_type))
+    with phase("forecast-chart", "figure"):
+        figure = figures.forecast_figure(forecast)
+    with phase("forecast-chart", "table"):
+        table = figures.forecast_table(forecast, weeks_to_forecast)
+    return figure, table
+
+
+@app.callback(
+    [Output("forecast-chart", "figure"), Output("forecast-table", "children")],
+    [
+        Input("region-filter", "value"),
+        Input("type-filter", "value"),
+        Input("forecast-poll", "n_intervals"),
+    ],
+)
+def update_forecast(region, avocado_type, n_intervals):
+    state = forecast_worker.state((region, avocado_type))
+    if state != "ready":
+        return figures.pending_forecast_figure(state), figures.pending_forecast_table(state)
+    return forecast_outputs(region, avocado_type, forecast_worker.version)
+
+
+# Pick up rows merged by the drop directory watcher
+@app.callback(
+    Output("data-version", "data"),
+    Input("data-poll", "n_intervals"),
+    State("data-version", "data"),
+)
+def poll_data_version(n_intervals, version):
+    return no_update if version == store.version else store.version
+
+
+# Refresh the filters when the data changes, moving the end of the date range
+# along if it was at the latest week
+@app.callback(
+    [
+        Output("region-filter", "options"),
+        Output("type-filter", "options"),
+        Output("comparison-regions", "options"),
+        Output("date-range", "min_date_allowed"),
+        Output("date-range", "max_date_allowed"),
+        Output("date-range", "end_date"),
+    ],
+    Input("data-version", "data"),
+    [State("date-range", "end_date"), State("date-range", "max_date_allowed")],
+    prevent_initial_call=True,
+)
+def update_filters(version, end_date, max_date_allowed):
+    region_options, type_options = filter_options()
+    first_date = store.data["Date"].min().date()
+    last_date = store.data["Date"].max().date()
+    if end_date is not None and end_date >= str(max_date_allowed):
+        end_date = last_date
+    return region_options, type_options, region_options, first_date, last_date, end_date
+
+
+# Poll the forecast until it has caught up with the data on the page, and
+# stop once the selected series has failed or is too short to forecast
+@app.callback(
+    Output("forecast-poll", "disabled"),
+    [
+        Input("forecast-poll", "n_intervals"),
+        Input("data-version", "data"),
+        Input("region-filter", "value"),
+        Input("type-filter", "value"),
+    ],
+)
+def stop_forecast_poll(n_intervals, version, region, avocado_type):
+    if forecast_worker.state((region, avocado_type)) in ("failed", "too-short"):
+        return True
+    return forecast_worker.error is not None or forecast_worker.version == version
+
+
+observe_phase("startup", "layout", time.perf_counter() - layout_started)
 
 
 
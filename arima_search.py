@@ -0,0 +1,213 @@
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+from data_loader import CACHE_DIR
+from forecasting import file_lock, pool_context
+
+ORDERS_PATH = os.path.join(CACHE_DIR, "arima", "orders.json")
+
+
+def series_version(y, X=None):
+    # Hash of the values and dates a model is fitted on
+    digest = hashlib.sha1()
+    for frame in [y, X]:
+        if frame is None:
+            continue
+        digest.update(np.ascontiguousarray(np.asarray(frame, dtype=np.float64)).tobytes())
+        if hasattr(frame, "index"):
+            digest.update(np.asarray(frame.index).astype("datetime64[ns]").tobytes())
+    return digest.hexdigest()
+
+
+def candidate_orders(d, D, m, seasonal=True, max_p=2, max_q=2, max_P=1, max_Q=1):
+    # Every (p, d, q)(P, D, Q, m) combination, simplest first so the cheap
+    # models are done before the time budget runs out
+    seasonal_orders = (
+        [(P, D, Q, m) for P in range(max_P + 1) for Q in range(max_Q + 1)]
+        if seasonal
+        else [(0, 0, 0, 0)]
+    )
+    candidates = [
+        ((p, d, q), seasonal_order)
+        for p, q in itertools.product(range(max_p + 1), range(max_q + 1))
+        for seasonal_order in seasonal_orders
+    ]
+    return sorted(candidates, key=lambda c: sum(c[0]) + sum(c[1][:3]))
+
+
+def _model(order, seasonal_order, m=52, fourier_terms=None):
+    from pmdarima import ARIMA
+    from pmdarima.pipeline import Pipeline
+    from pmdarima.preprocessing import FourierFeaturizer
+
+    steps = []
+    if fourier_terms:
+        steps.append(("fourier", FourierFeaturizer(m=m, k=fourier_terms)))
+    steps.append(
+        ("arima", ARIMA(order, seasonal_order=seasonal_order, suppress_warnings=True))
+    )
+    return Pipeline(steps)
+
+
+def _fit_candidate(task):
+    # Runs inside a pool process; a candidate that does not converge scores inf
+    y, X, order, seasonal_order, m, fourier_terms = task
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            model = _model(order, seasonal_order, m, fourier_terms).fit(y, X)
+        aic = float(model.steps_[-1][1].aic())
+    except Exception:
+        aic = float("inf")
+    return order, seasonal_order, aic
+
+
+def _search_pool(tasks, deadline, processes):
+    results = []
+    pool = pool_context().Pool(processes)
+    try:
+        outcomes = pool.imap_unordered(_fit_candidate, tasks)
+        for _ in tasks:
+            try:
+                results.append(outcomes.next(timeout=max(0.0, deadline - time.monotonic())))
+            except multiprocessing.TimeoutError:
+                break
+    finally:
+        # Stops the candidates that are still running
+        pool.terminate()
+        pool.join()
+    return results
+
+
+def _search_serial(tasks, deadline):
+    # For callers that already run one search per process (e.g. the batch
+    # forecasts); the budget is checked between candidates
+    results = []
+    for task in tasks:
+        if time.monotonic() >= deadline:
+            break
+        results.append(_fit_candidate(task))
+    return results
+
+
+def search_orders(
+    y,
+    X=None,
+    m=52,
+    seasonal=True,
+    fourier_terms=None,
+    time_budget=300,
+    processes=None,
+    **grid,
+):
+    # Fit every candidate order in a process pool and keep the lowest AIC
+    # among those that finished within time_budget seconds
+    from pmdarima.arima import ndiffs, nsdiffs
+
+    y_values = np.asarray(y, dtype=np.float64)
+    d = ndiffs(y_values)
+    # Fourier terms replace seasonal differencing, so the ARIMA part is non-seasonal
+    seasonal = seasonal and not fourier_terms
+    D = nsdiffs(y_values, m=m) if seasonal else 0
+    X_values = None if X is None else np.asarray(X, dtype=np.float64)
+    tasks = [
+        (y_values, X_values, order, seasonal_order, m, fourier_terms)
+        for order, seasonal_order in candidate_orders(d, D, m, seasonal, **grid)
+    ]
+
+    deadline = time.monotonic() + time_budget
+    if processes == 1:
+        results = _search_serial(tasks, deadline)
+    else:
+        results = _search_pool(tasks, deadline, processes)
+    if len(results) < len(tasks):
+        logging.getLogger(__name__).warning(
+            "ARIMA order search hit its %ss budget after %d of %d candidates",
+            time_budget,
+            len(results),
+            len(tasks),
+        )
+
+    finished = [result for result in results if np.isfinite(result[2])]
+    if not finished:
+        return None
+    order, seasonal_order, aic = min(finished, key=lambda result: result[2])
+    return {
+        "order": list(order),
+        "seasonal_order": list(seasonal_order),
+        "aic": aic,
+        "fourier_terms": fourier_terms,
+        "candidates": len(tasks),
+        "finished": len(results),
+    }
+
+
+def _read_orders():
+    try:
+        with open(ORDERS_PATH) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_orders(orders):
+    os.makedirs(os.path.dirname(ORDERS_PATH), exist_ok=True)
+    fd, staging = tempfile.mkstemp(dir=os.path.dirname(ORDERS_PATH), prefix=".tmp-")
+    with os.fdopen(fd, "w") as handle:
+        json.dump(orders, handle, indent=2)
+    os.replace(staging, ORDERS_PATH)
+
+
+def fit_best_arima(
+    y,
+    X=None,
+    name="series",
+    m=52,
+    seasonal=True,
+    fourier_terms=None,
+    time_budget=300,
+    processes=None,
+    **grid,
+):
+    # Fit the best ARIMA for a series, searching for the order only when no
+    # order is cached for this series, data version and mode. The result is a
+    # pmdarima Pipeline, so predict(n_periods, X=..., return_conf_int=True) works
+    # the same with and without Fourier terms.
+    mode = f"fourier{fourier_terms}" if fourier_terms else f"m{m}" if seasonal else "nonseasonal"
+    key = f"{name}:{mode}:{series_version(y, X)}"
+    orders = _read_orders()
+    best = orders.get(key)
+    if best is None:
+        best = search_orders(
+            y, X, m, seasonal, fourier_terms, time_budget, processes, **grid
+        )
+        if best is not None:
+            # Merge into the orders on disk under the lock, so concurrent
+            # searches for other series do not overwrite each other's orders
+            with file_lock(ORDERS_PATH):
+                orders = _read_orders()
+                orders[key] = best
+                _write_orders(orders)
+        else:
+            # Nothing finished in time: fall back to a plain ARIMA(1, 1, 1)
+            # and leave the cache empty so the next run searches again
+            best = {"order": [1, 1, 1], "seasonal_order": [0, 0, 0, 0]}
+
+    model = _model(
+        tuple(best["order"]), tuple(best["seasonal_order"]), m, fourier_terms
+    )
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return model.fit(
+            np.asarray(y, dtype=np.float64),
+            None if X is None else np.asarray(X, dtype=np.float64),
+        )
@@ -0,0 +1,197 @@
+// Date-range filtering in the browser. The server sends the whole selected
+// (region, type) series to the series-store once; moving the date range only
+// slices it here, so scrubbing never waits for a round trip. The region
+// comparison is sent whole to the comparison-store and sliced the same way.
+// The slicing, the downsampling and the statistics follow series_index.py,
+// downsample.py and stats.py.
+(function () {
+    var MIN_POINTS = 100;
+    var DEFAULT_MAX_POINTS = 1000;
+    var STAT_COLUMNS = [
+        "Count", "Mean", "Median", "Standard Deviation", "Variance", "Range",
+        "Interquartile Range", "Min", "25%", "75%", "Max"
+    ];
+    var SUMMARY_COLUMNS = ["AveragePrice", "Total Volume"];
+
+    function pointsForWidth(width) {
+        if (!width) {
+            return DEFAULT_MAX_POINTS;
+        }
+        return Math.max(MIN_POINTS, Math.ceil(width / MIN_POINTS) * MIN_POINTS);
+    }
+
+    // First position whose value is >= target (or > target with after=true)
+    function search(values, target, after) {
+        var lo = 0;
+        var hi = values.length;
+        while (lo < hi) {
+            var mid = (lo + hi) >>> 1;
+            if (values[mid] < target || (after && values[mid] === target)) {
+                lo = mid + 1;
+            } else {
+                hi = mid;
+            }
+        }
+        return lo;
+    }
+
+    // Rows [lo, hi) between the two dates, both inclusive. The store's dates
+    // and the picker's are YYYY-MM-DD strings, which compare like the dates.
+    function bounds(dates, startDate, endDate) {
+        var lo = startDate ? search(dates, startDate.slice(0, 10), false) : 0;
+        var hi = endDate ? search(dates, endDate.slice(0, 10), true) : dates.length;
+        return [lo, Math.max(lo, hi)];
+    }
+
+    // Largest-Triangle-Three-Buckets with the same buckets as
+    // downsample.lttb_indices, so both sides keep the same points
+    function lttb(x, y, maxPoints) {
+        var size = y.length;
+        if (size <= maxPoints || maxPoints < 3) {
+            return {x: x, y: y};
+        }
+        var buckets = maxPoints - 2;
+        // np.linspace(1, size - 1, maxPoints - 1) truncated to integers
+        var step = (size - 2) / buckets;
+        var edges = [];
+        for (var e = 0; e < buckets; e++) {
+            edges.push(Math.floor(e * step + 1));
+        }
+        edges.push(size - 1);
+        var averageX = [];
+        var averageY = [];
+        for (var b = 0; b < buckets; b++) {
+            var sumX = 0;
+            var sumY = 0;
+            for (var j = edges[b]; j < edges[b + 1]; j++) {
+                sumX += x[j];
+                sumY += y[j];
+            }
+            averageX.push(sumX / (edges[b + 1] - edges[b]));
+            averageY.push(sumY / (edges[b + 1] - edges[b]));
+        }
+        averageX.push(x[size - 1]);
+        averageY.push(y[size - 1]);
+
+        var keptX = [x[0]];
+        var keptY = [y[0]];
+        var anchor = 0;
+        for (var bucket = 0; bucket < buckets; bucket++) {
+            var best = edges[bucket];
+            var bestArea = -1;
+            for (var i = edges[bucket]; i < edges[bucket + 1]; i++) {
+                var area = Math.abs(
+                    (x[anchor] - averageX[bucket + 1]) * (y[i] - y[anchor]) -
+                    (x[anchor] - x[i]) * (averageY[bucket + 1] - y[anchor])
+                );
+                if (area > bestArea) {
+                    bestArea = area;
+                    best = i;
+                }
+            }
+            keptX.push(x[best]);
+            keptY.push(y[best]);
+            anchor = best;
+        }
+        keptX.push(x[size - 1]);
+        keptY.push(y[size - 1]);
+        return {x: keptX, y: keptY};
+    }
+
+    function chart(column) {
+        return function (series, startDate, endDate, width, figure) {
+            if (!series || !figure) {
+                return window.dash_clientside.no_update;
+            }
+            var range = bounds(series.dates, startDate, endDate);
+            // LTTB needs numbers: epoch milliseconds, also read on a date axis
+            var points = lttb(
+                series.dates.slice(range[0], range[1]).map(Date.parse),
+                series[column].slice(range[0], range[1]),
+                pointsForWidth(width)
+            );
+            var trace = Object.assign({}, figure.data[0], {x: points.x, y: points.y});
+            return Object.assign({}, figure, {data: [trace].concat(figure.data.slice(1))});
+        };
+    }
+
+    // Every trace of a full-range figure (figures.comparison_figure) cut to the
+    // selected dates and downsampled, as the server used to do per request
+    function sliceFigure(figure, startDate, endDate, width) {
+        if (!figure) {
+            return window.dash_clientside.no_update;
+        }
+        var maxPoints = pointsForWidth(width);
+        var data = figure.data.map(function (trace) {
+            var range = bounds(trace.x, startDate, endDate);
+            var points = lttb(
+                trace.x.slice(range[0], range[1]).map(Date.parse),
+                trace.y.slice(range[0], range[1]),
+                maxPoints
+            );
+            return Object.assign({}, trace, {x: points.x, y: points.y});
+        });
+        return Object.assign({}, figure, {data: data});
+    }
+
+    // Linear interpolation between the closest ranks, as pandas does
+    function quantile(sorted, q) {
+        var position = q * (sorted.length - 1);
+        var lower = Math.floor(position);
+        var upper = Math.min(lower + 1, sorted.length - 1);
+        return sorted[lower] + (sorted[upper] - sorted[lower]) * (position - lower);
+    }
+
+    function round(value) {
+        return value === null || isNaN(value) ? null : Math.round(value * 100) / 100;
+    }
+
+    // The row of stats.describe for one column; an empty selection has no
+    // statistics at all, so every cell is null
+    function describe(values) {
+        var sorted = values.filter(function (v) { return v !== null && !isNaN(v); });
+        sorted.sort(function (a, b) { return a - b; });
+        var count = sorted.length;
+        if (count === 0) {
+            return STAT_COLUMNS.map(function () { return null; });
+        }
+        var mean = sorted.reduce(function (a, b) { return a + b; }, 0) / count;
+        var squares = sorted.reduce(function (a, b) { return a + (b - mean) * (b - mean); }, 0);
+        var variance = count > 1 ? squares / (count - 1) : NaN;
+        var q1 = quantile(sorted, 0.25);
+        var q3 = quantile(sorted, 0.75);
+        return [
+            count, mean, quantile(sorted, 0.5), Math.sqrt(variance), variance,
+            sorted[count - 1] - sorted[0], q3 - q1, sorted[0], q1, q3, sorted[count - 1]
+        ];
+    }
+
+    // One row per statistic of stats.describe, rounded to cents, for the
+    // selected dates
+    function summary(series, startDate, endDate) {
+        if (!series) {
+            return window.dash_clientside.no_update;
+        }
+        var range = bounds(series.dates, startDate, endDate);
+        var stats = {};
+        SUMMARY_COLUMNS.forEach(function (column) {
+            stats[column] = describe(series[column].slice(range[0], range[1]));
+        });
+        return STAT_COLUMNS.map(function (name, row) {
+            var record = {Statistic: name};
+            SUMMARY_COLUMNS.forEach(function (column) {
+                record[column] = round(stats[column][row]);
+            });
+            return record;
+        });
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        avocado: {
+            priceChart: chart("AveragePrice"),
+            volumeChart: chart("Total Volume"),
+            comparisonChart: sliceFigure,
+            summary: summary
+        }
+    });
+})();
@@ -0,0 +1,257 @@
+# Rolling-origin backtest of the forecast engines: each fold cuts the weekly
+# series at an earlier week, forecasts the weeks after it from the history
+# before it, and scores the forecast against what actually happened. The
+# report puts each engine's accuracy next to the CPU time it took, so an
+# engine can be picked on accuracy per CPU-second.
+#
+#     python backtest.py --engines prophet holt-winters seasonal-naive --folds 4
+#     python backtest.py --engines arima --series 12 --target "Total Volume"
+import argparse
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loader import (
+    CACHE_DIR,
+    dataset_version,
+    load_avocado,
+    read_columns,
+    source_path,
+    write_columns,
+)
+from forecasting import FORECAST_ENGINES, batch_forecasts, forecast_key
+from series_index import SeriesIndex
+
+BACKTEST_DIR = os.path.join(CACHE_DIR, "backtests")
+METRIC_COLUMNS = ["mape", "rmse", "coverage", "fit_seconds", "predict_seconds", "weeks"]
+TARGETS = ["AveragePrice", "Total Volume"]
+# Engines are compared against this one when it is part of the backtest
+BASELINE_ENGINE = "seasonal-naive"
+
+
+def fold_cutoffs(dates, folds=4, step=12, weeks_to_forecast=12):
+    # The last week of training data of each fold, oldest first. The newest
+    # fold leaves exactly weeks_to_forecast weeks to score against.
+    last = pd.Timestamp(np.max(dates))
+    return [
+        last - pd.Timedelta(weeks=weeks_to_forecast + step * (folds - 1 - fold))
+        for fold in range(folds)
+    ]
+
+
+def score(forecast, dates, values):
+    # Accuracy of one forecast frame on the actual (dates, values) it covers
+    actual = pd.DataFrame({"ds": pd.to_datetime(dates), "y": np.asarray(values, dtype=np.float64)})
+    scored = actual.merge(forecast, on="ds", how="inner")
+    if scored.empty:
+        return {"mape": np.nan, "rmse": np.nan, "coverage": np.nan, "weeks": 0}
+    error = scored["y"].to_numpy() - scored["yhat"].to_numpy()
+    nonzero = scored["y"].to_numpy() != 0
+    inside = (scored["yhat_lower"] <= scored["y"]) & (scored["y"] <= scored["yhat_upper"])
+    return {
+        "mape": float(np.mean(np.abs(error[nonzero] / scored["y"].to_numpy()[nonzero])) * 100)
+        if nonzero.any()
+        else np.nan,
+        "rmse": float(np.sqrt(np.mean(error**2))),
+        "coverage": float(inside.mean()),
+        "weeks": int(len(scored)),
+    }
+
+
+def fold_directory(version, engine, cutoff, target, interval_width, weeks_to_forecast):
+    key = forecast_key(version, interval_width, weeks_to_forecast, target)
+    return os.path.join(BACKTEST_DIR, f"{key}-{engine}-{cutoff:%Y%m%d}")
+
+
+def _read_fold(directory):
+    if not os.path.exists(os.path.join(directory, "meta.json")):
+        return None
+    return read_columns(directory, mmap=False)
+
+
+def run_fold(
+    series_index,
+    version,
+    engine,
+    cutoff,
+    series_keys,
+    target="AveragePrice",
+    interval_width=0.95,
+    weeks_to_forecast=12,
+    processes=None,
+    progress=None,
+):
+    # One row of metrics per series for one engine and cutoff. Results are
+    # kept per data version and fold, so a rerun only fits the series that
+    # were not scored before.
+    directory = fold_directory(version, engine, cutoff, target, interval_width, weeks_to_forecast)
+    cached = _read_fold(directory)
+    done = set()
+    if cached is not None:
+        done = set(zip(cached["region"].astype(str), cached["type"].astype(str)))
+    missing = [series_key for series_key in series_keys if series_key not in done]
+
+    if missing:
+        history = SeriesIndex(series_index.data[series_index.data["Date"] <= cutoff])
+        results = batch_forecasts(
+            history,
+            target,
+            engine,
+            interval_width,
+            weeks_to_forecast,
+            processes,
+            progress,
+            series_keys=[series_key for series_key in missing if series_key in history],
+        )
+        end = cutoff + pd.Timedelta(weeks=weeks_to_forecast)
+        rows = []
+        for series_key in missing:
+            result = results.get(series_key)
+            row = {"region": series_key[0], "type": series_key[1], "failed": result is None}
+            if result is None:
+                row.update({name: np.nan for name in METRIC_COLUMNS})
+                row["weeks"] = 0
+            else:
+                actual = series_index.columns(
+                    *series_key,
+                    start_date=cutoff + pd.Timedelta(days=1),
+                    end_date=end,
+                    names=["Date", target],
+                )
+                row.update(score(result["forecast"], actual["Date"], actual[target]))
+                row["fit_seconds"] = result["timings"].get("fit", 0.0)
+                row["predict_seconds"] = result["timings"].get("predict", 0.0)
+            rows.append(row)
+        table = pd.DataFrame(rows, columns=["region", "type", "failed", *METRIC_COLUMNS])
+        if cached is not None:
+            table = pd.concat(
+                [cached.astype({"region": str, "type": str}), table], ignore_index=True
+            )
+        table = table.astype({"region": "category", "type": "category", "weeks": np.int64})
+        shutil.rmtree(directory, ignore_errors=True)
+        write_columns(table, directory, {"engine": engine, "cutoff": str(cutoff.date())})
+        cached = table
+
+    selected = pd.MultiIndex.from_tuples(series_keys, names=["region", "type"])
+    keys = pd.MultiIndex.from_arrays(
+        [cached["region"].astype(str), cached["type"].astype(str)], names=["region", "type"]
+    )
+    return cached[keys.isin(selected)].reset_index(drop=True)
+
+
+def summarize(results):
+    # One row per engine: mean accuracy over every series and fold, the CPU
+    # seconds spent per series forecast, and how much of the baseline's error
+    # the engine removes per CPU-second spent on a forecast
+    scored = results[~results["failed"]].assign(
+        cpu_seconds=lambda frame: frame["fit_seconds"] + frame["predict_seconds"]
+    )
+    summary = scored.groupby("engine").agg(
+        mape=("mape", "mean"),
+        rmse=("rmse", "mean"),
+        coverage=("coverage", "mean"),
+        fit_seconds=("fit_seconds", "mean"),
+        predict_seconds=("predict_seconds", "mean"),
+        cpu_seconds=("cpu_seconds", "mean"),
+        forecasts=("mape", "size"),
+    )
+    summary["failed"] = results.groupby("engine")["failed"].sum().reindex(summary.index)
+    if BASELINE_ENGINE in summary.index:
+        baseline = summary.loc[BASELINE_ENGINE, "mape"]
+        summary["skill"] = 1 - summary["mape"] / baseline
+        summary["skill_per_cpu_second"] = summary["skill"] / summary["cpu_seconds"]
+    return summary.sort_values("mape")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Backtest the forecast engines on rolling origins and compare accuracy with cost"
+    )
+    parser.add_argument("--source", help="CSV file to backtest on (defaults to the bundled data)")
+    parser.add_argument(
+        "--engines",
+        nargs="+",
+        choices=sorted(FORECAST_ENGINES),
+        default=["prophet", "holt-winters", BASELINE_ENGINE],
+    )
+    parser.add_argument("--target", choices=TARGETS, default="AveragePrice")
+    parser.add_argument("--folds", type=int, default=4)
+    parser.add_argument("--step", type=int, default=12, help="weeks between fold cutoffs")
+    parser.add_argument("--weeks", type=int, default=12, help="weeks to forecast")
+    parser.add_argument("--interval-width", type=float, default=0.95)
+    parser.add_argument("--series", type=int, default=None, help="backtest this many series, spread over all of them")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (defaults to the CPU count)")
+    parser.add_argument("--output", help="write every series and fold's metrics to this CSV file")
+    return parser.parse_args(argv)
+
+
+def run(
+    source=None,
+    engines=("prophet", "holt-winters", BASELINE_ENGINE),
+    target="AveragePrice",
+    folds=4,
+    step=12,
+    weeks_to_forecast=12,
+    interval_width=0.95,
+    series=None,
+    processes=None,
+):
+    # Metrics of every engine, fold and series as one frame
+    source = source or source_path()
+    version = dataset_version(source)
+    series_index = SeriesIndex(load_avocado(source))
+    series_keys = series_index.series_keys()
+    if series is not None and series < len(series_keys):
+        picks = np.linspace(0, len(series_keys) - 1, series).astype(int)
+        series_keys = [series_keys[pick] for pick in picks]
+
+    frames = []
+    for engine in engines:
+        for cutoff in fold_cutoffs(series_index.dates, folds, step, weeks_to_forecast):
+            started = time.perf_counter()
+            fold = run_fold(
+                series_index,
+                version,
+                engine,
+                cutoff,
+                series_keys,
+                target,
+                interval_width,
+                weeks_to_forecast,
+                processes,
+            )
+            print(
+                f"[{engine}] fold {cutoff.date()}: {len(fold)} series, "
+                f"MAPE {fold['mape'].mean():.2f}%, {time.perf_counter() - started:.1f}s",
+                flush=True,
+            )
+            frames.append(fold.assign(engine=engine, cutoff=cutoff))
+    return pd.concat(frames, ignore_index=True)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(
+        args.source,
+        args.engines,
+        args.target,
+        args.folds,
+        args.step,
+        args.weeks,
+        args.interval_width,
+        args.series,
+        args.processes,
+    )
+    if args.output:
+        results.to_csv(args.output, index=False)
+    with pd.option_context("display.width", 160, "display.max_columns", 20):
+        print(summarize(results).round(4).to_string())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
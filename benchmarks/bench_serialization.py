@@ -0,0 +1,68 @@
+# Compare the size and serialization time of figure payloads sent by the
+# price chart callback: the old pandas/ISO-string path against the
+# "YYYY-MM-DD" date strings and rounded value lists that encoding.py sends by
+# default, and the base64 typed arrays it can send instead.
+#
+#     python -m benchmarks.bench_serialization
+import gzip
+import time
+
+import numpy as np
+import pandas as pd
+from plotly.io.json import to_json_plotly
+
+from encoding import encode_dates, encode_values
+
+
+def pandas_trace(dates, values):
+    # What update_data used to put into the figure
+    return {"x": pd.Series(dates), "y": pd.Series(values), "type": "lines"}
+
+
+def compact_trace(dates, values):
+    return {
+        "x": encode_dates(dates, binary=False),
+        "y": encode_values(values, binary=False),
+        "type": "lines",
+    }
+
+
+def binary_trace(dates, values):
+    return {
+        "x": encode_dates(dates, binary=True),
+        "y": encode_values(values, binary=True),
+        "type": "lines",
+    }
+
+
+ENCODERS = {"pandas": pandas_trace, "compact": compact_trace, "binary": binary_trace}
+
+
+def make_series(points, seed=0):
+    # Daily rather than weekly dates, so 100k of them still fit datetime64[ns]
+    random = np.random.default_rng(seed)
+    dates = np.datetime64("1970-01-01", "ns") + np.arange(points) * np.timedelta64(1, "D")
+    values = np.round(1.4 + random.normal(0, 0.2, points).cumsum() / 50, 2)
+    return dates, values
+
+
+def measure(encoder, dates, values, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        payload = to_json_plotly({"data": [encoder(dates, values)], "layout": {}})
+    elapsed = (time.perf_counter() - start) / repeat
+    return len(payload), len(gzip.compress(payload.encode())), elapsed
+
+
+def main():
+    print(f"{'points':>8} {'encoding':>8} {'bytes':>10} {'gzip':>9} {'ms':>8}")
+    for points in [169, 1_000, 10_000, 100_000]:
+        dates, values = make_series(points)
+        repeat = max(3, 20_000 // points)
+        for name, encoder in ENCODERS.items():
+            size, compressed, elapsed = measure(encoder, dates, values, repeat)
+            print(f"{points:>8} {name:>8} {size:>10} {compressed:>9} {elapsed * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+# Scaling benchmarks on synthetic data (see benchmarks/synthetic.py): app
+# import and startup, the dashboard callbacks and the size of what they send,
+# forecast fitting and the aggregations of avocado.py. Every benchmark runs
+# in a fresh process against its own cache directory, so wall time and peak
+# RSS belong to that benchmark alone. Results are written as JSON and two
+# runs can be compared:
+#
+#     python -m benchmarks.bench_suite --scales 1 10 100
+#     python -m benchmarks.bench_suite --compare benchmarks/results/old.json benchmarks/results/new.json
+import argparse
+import gzip
+import json
+import os
+import platform
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.synthetic import SCALES, write_csv
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BASE_DIR, "benchmarks", "results")
+
+# Benchmark name -> worker that runs it. The first import builds the columnar
+# cache, the second one reads it.
+SUITE = [
+    ("app_import_cold", "app_import"),
+    ("app_import_warm", "app_import"),
+    ("callbacks", "callbacks"),
+    ("aggregation", "aggregation"),
+    ("forecast", "forecast"),
+]
+WORKERS = {}
+
+RESULT_PREFIX = "RESULT "
+
+
+def worker(function):
+    WORKERS[function.__name__] = function
+    return function
+
+
+@contextmanager
+def timed(timings, name):
+    started = time.perf_counter()
+    yield
+    timings[name] = time.perf_counter() - started
+
+
+def without_forecasts():
+    # Forecast fitting has a benchmark of its own; keep the app's background
+    # fit from competing with the import and the callbacks for the CPU
+    from forecasting import ForecastWorker
+
+    ForecastWorker.start = lambda self: self
+
+
+def latency_summary(seconds):
+    milliseconds = np.asarray(seconds) * 1000
+    return {
+        "p50_ms": float(np.percentile(milliseconds, 50)),
+        "p95_ms": float(np.percentile(milliseconds, 95)),
+        "max_ms": float(milliseconds.max()),
+    }
+
+
+@worker
+def app_import(options):
+    without_forecasts()
+    started = time.perf_counter()
+    import app
+
+    return {
+        "import_seconds": time.perf_counter() - started,
+        "rows": len(app.store.data),
+        "series": len(app.store.index.series_keys()),
+    }
+
+
+@worker
+def callbacks(options):
+    # Latency and payload of the server callbacks for a spread of series. The
+    # series-store is sent once per series and the decomposition once per
+    # series and width, and the region comparison once per series' regions.
+    # The date range only changes what the browser slices out of them.
+    from downsample import points_for_width
+    from plotly.io.json import to_json_plotly
+
+    without_forecasts()
+    import app
+
+    keys = app.store.index.series_keys()
+    picks = np.linspace(0, len(keys) - 1, min(options.combos, len(keys))).astype(int)
+    points = points_for_width(options.width)
+    regions = list(app.store.matrix.regions)
+    version = app.store.version
+    # Call the functions themselves, not through Dash, and bypass the result
+    # cache. Each entry builds the arguments for one series.
+    chart_callbacks = {
+        "series": (
+            app.series_data.__wrapped__,
+            lambda region, avocado_type: (region, avocado_type, version),
+        ),
+        "decomposition": (
+            app.decomposition_chart.__wrapped__,
+            lambda region, avocado_type: (region, avocado_type, points, version),
+        ),
+        # The series' region and the two after it, as picked on the page
+        "comparison": (
+            app.comparison_chart.__wrapped__,
+            lambda region, avocado_type: (
+                regions[regions.index(region) :][:3],
+                avocado_type,
+                "AveragePrice",
+                version,
+            ),
+        ),
+    }
+    app.decomposition_for(version)
+
+    results = {}
+    for name, (function, arguments) in chart_callbacks.items():
+        latencies, serializing, sizes, compressed = [], [], [], []
+        for pick in picks:
+            region, avocado_type = keys[pick]
+            started = time.perf_counter()
+            output = function(*arguments(region, avocado_type))
+            latencies.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            payload = to_json_plotly(output).encode()
+            serializing.append(time.perf_counter() - started)
+            sizes.append(len(payload))
+            compressed.append(len(gzip.compress(payload, 6)))
+        results[name] = {
+            **latency_summary(latencies),
+            "serialize_ms": float(np.mean(serializing) * 1000),
+            "bytes": float(np.mean(sizes)),
+            "gzip_bytes": float(np.mean(compressed)),
+        }
+    return results
+
+
+@worker
+def aggregation(options):
+    # The summary table, dashboards and weekly resample blocks of avocado.py
+    from aggregation import build_cube, rollup
+    from data_loader import load_avocado
+    from pipeline import iter_chunks, summarize
+    from stats import describe
+
+    timings = {}
+    with timed(timings, "load_seconds"):
+        df = load_avocado()
+    with timed(timings, "describe_seconds"):
+        describe(df, ["AveragePrice", "Total Volume", "4046", "4225", "4770", "Total Bags"])
+    with timed(timings, "cube_seconds"):
+        cube = build_cube(df[df["region"] != "TotalUS"])
+    with timed(timings, "rollup_seconds"):
+        for by in ["year", "month", "region", "type"]:
+            rollup(cube, by)
+    with timed(timings, "weekly_chunked_seconds"):
+        summarize(iter_chunks()).weekly()
+    return timings
+
+
+@worker
+def forecast(options):
+    # Fit time of a few series with each engine, as the batch job does it.
+    # Batch engines are timed on every series at once.
+    from data_loader import load_avocado
+    from forecasting import BATCH_ENGINES, SERIES_ENGINES
+    from series_index import SeriesIndex
+
+    index = SeriesIndex(load_avocado())
+    keys = index.series_keys()
+    results = {}
+    for engine in options.engines:
+        seconds = []
+        if engine in BATCH_ENGINES:
+            series = []
+            for key in keys:
+                columns = index.columns(*key, names=["Date", "AveragePrice"])
+                series.append((columns["Date"], columns["AveragePrice"]))
+            started = time.perf_counter()
+            BATCH_ENGINES[engine](series, 0.95, 12)
+            seconds = [(time.perf_counter() - started) / len(keys)] * len(keys)
+        else:
+            for key in keys[: options.forecast_series]:
+                columns = index.columns(*key, names=["Date", "AveragePrice"])
+                started = time.perf_counter()
+                SERIES_ENGINES[engine](key, columns["Date"], columns["AveragePrice"], 0.95, 12)
+                seconds.append(time.perf_counter() - started)
+        results[engine] = {
+            "series": len(seconds),
+            "mean_seconds": float(np.mean(seconds)),
+            "max_seconds": float(np.max(seconds)),
+            "points_per_series": int(len(index.dates) / max(len(index.series_keys()), 1)),
+        }
+    return results
+
+
+def run_worker(name, worker_name, options, environment):
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.bench_suite",
+        "--worker",
+        worker_name,
+        "--combos",
+        str(options.combos),
+        "--width",
+        str(options.width),
+        "--forecast-series",
+        str(options.forecast_series),
+        "--engines",
+        *options.engines,
+    ]
+    started = time.perf_counter()
+    # A session of its own, so forecast pool processes left behind can be killed
+    process = subprocess.Popen(
+        command,
+        cwd=BASE_DIR,
+        env=environment,
+        stdout=subprocess.PIPE,
+        start_new_session=True,
+    )
+    output = process.stdout.read().decode()
+    _, status, usage = os.wait4(process.pid, 0)
+    wall_seconds = time.perf_counter() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+    metrics = None
+    for line in output.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            metrics = json.loads(line[len(RESULT_PREFIX):])
+    return {
+        "benchmark": name,
+        "wall_seconds": wall_seconds,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": usage.ru_maxrss / 1024,
+        "exit_code": process.returncode,
+        "metrics": metrics,
+    }
+
+
+def run_scale(scale, options, directory):
+    regions, types, years = SCALES[scale]
+    source = os.path.join(directory, f"avocado-{scale}x.csv")
+    started = time.perf_counter()
+    rows = write_csv(source, regions, types, years)
+    generate_seconds = time.perf_counter() - started
+
+    environment = dict(
+        os.environ,
+        AVOCADO_SOURCE=source,
+        AVOCADO_CACHE_DIR=os.path.join(directory, f"cache-{scale}x"),
+        AVOCADO_DROP_DIR=os.path.join(directory, f"incoming-{scale}x"),
+        MPLBACKEND="Agg",
+        PYTHONPATH=os.pathsep.join(filter(None, [BASE_DIR, os.environ.get("PYTHONPATH")])),
+    )
+    os.makedirs(environment["AVOCADO_DROP_DIR"], exist_ok=True)
+
+    results = []
+    for name, worker_name in SUITE:
+        if options.benchmarks and name not in options.benchmarks:
+            continue
+        result = run_worker(name, worker_name, options, environment)
+        print(
+            f"{scale:>5}x {name:<16} {result['wall_seconds']:8.2f}s "
+            f"{result['peak_rss_mb']:9.1f} MB  exit {result['exit_code']}",
+            flush=True,
+        )
+        results.append(result)
+    return {
+        "scale": scale,
+        "regions": regions,
+        "types": types,
+        "years": years,
+        "rows": rows,
+        "csv_bytes": os.path.getsize(source),
+        "generate_seconds": generate_seconds,
+        "benchmarks": results,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def flatten(metrics, prefix=""):
+    # {"a": {"b": 1}} -> {"a.b": 1}, keeping the numbers only
+    flat = {}
+    for key, value in (metrics or {}).items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(old_path, new_path):
+    def load(path):
+        with open(path) as handle:
+            report = json.load(handle)
+        values = {}
+        for run in report["runs"]:
+            for result in run["benchmarks"]:
+                prefix = f"{run['scale']}x {result['benchmark']}"
+                values[f"{prefix} wall_seconds"] = result["wall_seconds"]
+                values[f"{prefix} peak_rss_mb"] = result["peak_rss_mb"]
+                for name, value in flatten(result["metrics"]).items():
+                    values[f"{prefix} {name}"] = value
+        return values
+
+    old, new = load(old_path), load(new_path)
+    print(f"{'measurement':<60} {'old':>12} {'new':>12} {'ratio':>7}")
+    for name in sorted(set(old) & set(new)):
+        ratio = new[name] / old[name] if old[name] else float("nan")
+        print(f"{name:<60} {old[name]:>12.4g} {new[name]:>12.4g} {ratio:>7.2f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app on synthetic data")
+    parser.add_argument("--scales", type=int, nargs="+", choices=sorted(SCALES), default=[1, 10])
+    parser.add_argument("--benchmarks", nargs="+", choices=[name for name, _ in SUITE])
+    parser.add_argument("--combos", type=int, default=20, help="series per callback benchmark")
+    parser.add_argument("--width", type=int, default=1200, help="viewport width for the charts")
+    parser.add_argument("--forecast-series", type=int, default=3)
+    parser.add_argument("--engines", nargs="+", default=["prophet"])
+    parser.add_argument("--output", help="results file (defaults to benchmarks/results/<time>.json)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated data and caches")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--worker", choices=sorted(WORKERS), help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    if options.worker:
+        metrics = WORKERS[options.worker](options)
+        print(RESULT_PREFIX + json.dumps(metrics), flush=True)
+        # Skip interpreter shutdown, which would wait for background threads
+        os._exit(0)
+    if options.compare:
+        compare(*options.compare)
+        return
+
+    started = datetime.now(timezone.utc)
+    directory = tempfile.mkdtemp(prefix="avocado-bench-")
+    try:
+        runs = [run_scale(scale, options, directory) for scale in options.scales]
+    finally:
+        if options.keep:
+            print(f"data and caches kept in {directory}")
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    report = {
+        "started": started.isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "runs": runs,
+    }
+    output = options.output or os.path.join(
+        RESULTS_DIR, f"{started.strftime('%Y%m%dT%H%M%SZ')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
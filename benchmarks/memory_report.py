@@ -0,0 +1,52 @@
+# Bytes per column of the data app.py keeps in memory: the frame it used to
+# build (read_csv with object strings, float64/int64 numbers and the derived
+# Week/Month/Year/Index columns) against the compact schema of
+# data_loader.COMPACT_DTYPES.
+#
+#     python -m benchmarks.memory_report
+import numpy as np
+import pandas as pd
+
+from data_loader import _read_source, load_avocado, source_path
+
+
+def previous_frame(path=None):
+    # What app.py held before the compact schema
+    data = _read_source(path or source_path()).drop(columns=["Unnamed: 0"])
+    data["Date"] = pd.to_datetime(data["Date"], format="%Y-%m-%d")
+    data["Week"] = data["Date"].dt.isocalendar().week.astype(np.int64)
+    data["Month"] = data["Date"].dt.month
+    data["Year"] = data["Date"].dt.year
+    data["Index"] = range(1, len(data) + 1)
+    return data
+
+
+def column_bytes(frame):
+    usage = frame.memory_usage(deep=True, index=False)
+    return pd.DataFrame({"dtype": frame.dtypes.astype(str), "bytes": usage})
+
+
+def memory_report(before, after):
+    report = column_bytes(before).join(
+        column_bytes(after), lsuffix=" before", rsuffix=" after", how="outer"
+    )
+    report = report.loc[list(before.columns) + [c for c in after.columns if c not in before]]
+    report["bytes after"] = report["bytes after"].fillna(0).astype(np.int64)
+    report.loc["total"] = [
+        "",
+        report["bytes before"].sum(),
+        "",
+        report["bytes after"].sum(),
+    ]
+    return report.fillna({"dtype after": "(dropped)"})
+
+
+def main():
+    report = memory_report(previous_frame(), load_avocado(compact=True))
+    print(report.to_string())
+    before, after = report.loc["total", ["bytes before", "bytes after"]]
+    print(f"\n{before / 2**20:.2f} MB -> {after / 2**20:.2f} MB ({after / before:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# Synthetic data with the avocado.csv schema, for measuring how the app and
+# the analyses scale. The real file is 54 regions x 2 types x 169 weeks;
+# SCALES gives presets for 10x, 100x and 1000x that many rows.
+#
+#     python -m benchmarks.synthetic --scale 100 --output /tmp/avocado-100x.csv
+#     python -m benchmarks.synthetic --regions 200 --types 3 --years 10 --output /tmp/custom.csv
+import argparse
+
+import numpy as np
+import pandas as pd
+
+REAL_REGIONS = [
+    "Albany", "Atlanta", "BaltimoreWashington", "Boise", "Boston",
+    "BuffaloRochester", "California", "Charlotte", "Chicago", "CincinnatiDayton",
+    "Columbus", "DallasFtWorth", "Denver", "Detroit", "GrandRapids", "GreatLakes",
+    "HarrisburgScranton", "HartfordSpringfield", "Houston", "Indianapolis",
+    "Jacksonville", "LasVegas", "LosAngeles", "Louisville", "MiamiFtLauderdale",
+    "Midsouth", "Nashville", "NewOrleansMobile", "NewYork", "Northeast",
+    "NorthernNewEngland", "Orlando", "Philadelphia", "PhoenixTucson",
+    "Pittsburgh", "Plains", "Portland", "RaleighGreensboro", "RichmondNorfolk",
+    "Roanoke", "Sacramento", "SanDiego", "SanFrancisco", "Seattle",
+    "SouthCarolina", "SouthCentral", "Southeast", "Spokane", "StLouis",
+    "Syracuse", "Tampa", "TotalUS", "West", "WestTexNewMexico",
+]
+REAL_TYPES = ["conventional", "organic"]
+FIRST_WEEK = "2015-01-04"
+
+# (regions, types, years) per multiple of the real row count
+SCALES = {
+    1: (54, 2, 169 / 52),
+    10: (540, 2, 169 / 52),
+    100: (540, 2, 1690 / 52),
+    1000: (5400, 2, 1690 / 52),
+}
+
+
+def names(real, count, prefix):
+    # The real names first, so 'Albany'/'organic' (the app's defaults) exist
+    return real[:count] + [f"{prefix}{number}" for number in range(len(real), count)]
+
+
+def generate(regions=54, types=2, years=169 / 52, seed=0):
+    # One weekly row per (region, type, week) with prices that have a yearly
+    # season and a random walk, and volumes whose parts add up like the real ones
+    random = np.random.default_rng(seed)
+    weeks = max(1, int(round(years * 52)))
+    region_names = names(REAL_REGIONS, regions, "Region")
+    type_names = names(REAL_TYPES, types, "type")
+    series = regions * types
+
+    dates = np.datetime64(FIRST_WEEK, "ns") + np.arange(weeks) * np.timedelta64(7, "D")
+    season = np.sin(2 * np.pi * np.arange(weeks) / 52.18)
+    base_price = random.uniform(0.9, 1.7, (series, 1))
+    walk = random.normal(0, 0.02, (series, weeks)).cumsum(axis=1)
+    price = np.clip(base_price + 0.15 * season + walk + random.normal(0, 0.05, (series, weeks)), 0.44, 3.25)
+
+    base_volume = np.exp(random.uniform(8, 15, (series, 1)))
+    volume = base_volume * np.exp(-0.1 * season + random.normal(0, 0.15, (series, weeks)))
+    shares = random.dirichlet([4, 4, 0.3, 3], size=(series, weeks))
+    bag_shares = random.dirichlet([8, 2, 0.2], size=(series, weeks))
+    bags = volume * shares[..., 3]
+
+    frame = pd.DataFrame(
+        {
+            "Unnamed: 0": np.tile(np.arange(weeks), series),
+            "Date": np.tile(dates, series),
+            "AveragePrice": np.round(price, 2).ravel(),
+            "Total Volume": np.round(volume, 2).ravel(),
+            "4046": np.round(volume * shares[..., 0], 2).ravel(),
+            "4225": np.round(volume * shares[..., 1], 2).ravel(),
+            "4770": np.round(volume * shares[..., 2], 2).ravel(),
+            "Total Bags": np.round(bags, 2).ravel(),
+            "Small Bags": np.round(bags * bag_shares[..., 0], 2).ravel(),
+            "Large Bags": np.round(bags * bag_shares[..., 1], 2).ravel(),
+            "XLarge Bags": np.round(bags * bag_shares[..., 2], 2).ravel(),
+            "type": np.repeat(np.tile(type_names, regions), weeks),
+            "region": np.repeat(np.repeat(region_names, types), weeks),
+        }
+    )
+    frame.insert(12, "year", frame["Date"].dt.year)
+    return frame
+
+
+def write_csv(path, regions=54, types=2, years=169 / 52, seed=0):
+    # Written without the index and with ISO dates, like avocado.csv
+    frame = generate(regions, types, years, seed)
+    frame["Date"] = frame["Date"].dt.strftime("%Y-%m-%d")
+    frame.to_csv(path, index=False)
+    return len(frame)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic avocado.csv data")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--scale", type=int, choices=sorted(SCALES))
+    parser.add_argument("--regions", type=int, default=54)
+    parser.add_argument("--types", type=int, default=2)
+    parser.add_argument("--years", type=float, default=169 / 52)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    regions, types, years = SCALES[args.scale] if args.scale else (args.regions, args.types, args.years)
+    rows = write_csv(args.output, regions, types, years, args.seed)
+    print(f"wrote {rows} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
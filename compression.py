@@ -0,0 +1,62 @@
+import gzip
+
+from flask import request
+
+from metrics import phase
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "text/html",
+    "text/css",
+    "text/javascript",
+)
+
+
+def _choose_encoding(accept_encoding):
+    accepted = {part.split(";")[0].strip() for part in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def enable_compression(server, min_size=500, level=6):
+    # Compress the JSON callback responses and the layout/asset responses of the
+    # Flask server underneath the Dash app
+    @server.after_request
+    def compress_response(response):
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200
+            or response.status_code >= 300
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES
+        ):
+            return response
+        encoding = _choose_encoding(request.headers.get("Accept-Encoding", ""))
+        if encoding is None:
+            return response
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+
+        with phase("response", "compress"):
+            if encoding == "br":
+                body = brotli.compress(body, quality=min(level, 11))
+            else:
+                body = gzip.compress(body, compresslevel=level)
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        response.headers["Content-Length"] = len(body)
+        response.vary.add("Accept-Encoding")
+        return response
+
+    return server
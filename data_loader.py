@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from metrics import phase
+
+# Locations of the raw data and of the columnar cache built from it
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(BASE_DIR, "avocado.csv")
+ZIP_PATH = os.path.join(BASE_DIR, "avocado.csv.zip")
+CACHE_DIR = os.environ.get("AVOCADO_CACHE_DIR", os.path.join(BASE_DIR, ".avocado_cache"))
+
+# Bump this whenever the on-disk layout of the cache changes
+CACHE_FORMAT = 1
+
+CATEGORICAL_COLUMNS = ["region", "type"]
+
+# Narrower types for the data the app keeps in memory. Every value in the CSV
+# has two decimals: prices stay exact in float32 and volumes keep about seven
+# significant digits, more than the charts and tables show.
+COMPACT_DTYPES = {
+    "AveragePrice": np.float32,
+    "Total Volume": np.float32,
+    "4046": np.float32,
+    "4225": np.float32,
+    "4770": np.float32,
+    "Total Bags": np.float32,
+    "Small Bags": np.float32,
+    "Large Bags": np.float32,
+    "XLarge Bags": np.float32,
+    "year": np.int16,
+}
+
+
+def source_path():
+    # AVOCADO_SOURCE may point at another CSV (e.g. synthetic benchmark data).
+    # Otherwise prefer the plain CSV and fall back to the zipped copy shipped with the repo
+    source = os.environ.get("AVOCADO_SOURCE")
+    if source and os.path.isfile(source):
+        return source
+    if os.path.exists(CSV_PATH):
+        return CSV_PATH
+    return ZIP_PATH
+
+
+def _file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_source(path):
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            with archive.open("avocado.csv") as handle:
+                return pd.read_csv(handle)
+    return pd.read_csv(path)
+
+
+def parse_frame(raw):
+    # Apply the same cleaning both scripts used to do by hand
+    data = raw.drop(columns=["Unnamed: 0"], errors="ignore")
+    data["Date"] = pd.to_datetime(data["Date"], format="%Y-%m-%d")
+    for column in CATEGORICAL_COLUMNS:
+        data[column] = data[column].astype("category")
+    return data
+
+
+def compact_frame(data):
+    # Apply COMPACT_DTYPES to the columns the frame has
+    return data.astype({name: dtype for name, dtype in COMPACT_DTYPES.items() if name in data})
+
+
+def write_arrays(arrays, directory, extra=None):
+    # Store every array as its own .npy file so it can be memory-mapped back,
+    # building the directory aside and renaming it into place. arrays maps
+    # names to arrays or to (array, meta entry fields) pairs.
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+    entries = []
+    for position, (name, values) in enumerate(arrays.items()):
+        values, fields = values if isinstance(values, tuple) else (values, {})
+        entry = {"name": name, "file": f"{position}.npy", **fields}
+        np.save(os.path.join(staging, entry["file"]), values, allow_pickle=False)
+        entries.append(entry)
+    meta = {"format": CACHE_FORMAT, "columns": entries}
+    meta.update(extra or {})
+    with open(os.path.join(staging, "meta.json"), "w") as handle:
+        json.dump(meta, handle)
+    try:
+        os.rename(staging, directory)
+    except OSError:
+        # Another process finished the same build first
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def read_arrays(directory, mmap=True):
+    # The arrays written by write_arrays, by name, and the meta file. Raises
+    # ValueError for a directory written in another format.
+    with open(os.path.join(directory, "meta.json")) as handle:
+        meta = json.load(handle)
+    if meta.get("format") != CACHE_FORMAT:
+        raise ValueError(f"Unknown cache format in {directory}")
+    arrays = {
+        entry["name"]: np.load(
+            os.path.join(directory, entry["file"]),
+            mmap_mode="r" if mmap else None,
+            allow_pickle=False,
+        )
+        for entry in meta["columns"]
+    }
+    return arrays, meta
+
+
+def write_columns(frame, directory, extra=None):
+    # One .npy file per column. Categoricals are stored as integer codes with
+    # the categories in the meta file.
+    arrays = {}
+    for name in frame.columns:
+        column = frame[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            arrays[name] = (column.cat.codes.to_numpy(), {"categories": column.cat.categories.tolist()})
+        else:
+            values = column.to_numpy()
+            if values.dtype == object:
+                # Plain string columns are stored as fixed-width unicode
+                values = values.astype(str)
+            arrays[name] = values
+    write_arrays(arrays, directory, extra)
+
+
+def read_columns(directory, mmap=True):
+    arrays, meta = read_arrays(directory, mmap)
+    columns = {}
+    for entry in meta["columns"]:
+        values = arrays[entry["name"]]
+        if "categories" in entry:
+            values = pd.Categorical.from_codes(values, categories=entry["categories"])
+        columns[entry["name"]] = values
+    return pd.DataFrame(columns)
+
+
+def _load_manifest(manifest_path):
+    try:
+        with open(manifest_path) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+
+def dataset_version(path=None):
+    # Content hash of the source file. The size and mtime are checked first so
+    # the file only has to be hashed again when it may have changed.
+    path = path or source_path()
+    stat = os.stat(path)
+    manifest_path = os.path.join(CACHE_DIR, "manifest.json")
+    manifest = _load_manifest(manifest_path)
+    entry = manifest.get(os.path.abspath(path), {})
+    if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+        return entry["sha1"]
+
+    sha1 = _file_hash(path)
+    manifest[os.path.abspath(path)] = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha1": sha1,
+    }
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, staging = tempfile.mkstemp(dir=CACHE_DIR, prefix=".manifest-")
+    with os.fdopen(fd, "w") as handle:
+        json.dump(manifest, handle)
+    os.replace(staging, manifest_path)
+    return sha1
+
+
+def load_avocado(path=None, use_cache=True, compact=False):
+    # Load the avocado dataset with Date as datetime64 and region/type as
+    # categoricals, building the columnar cache on the first read. With
+    # compact the numbers use COMPACT_DTYPES, cached separately so the
+    # narrow columns are read back without a conversion. pandas copies the
+    # mapped columns into its own blocks, so the frame is private memory;
+    # the server's workers share it only copy-on-write (see wsgi.py).
+    path = path or source_path()
+    if not use_cache:
+        with phase("load", "read_csv"):
+            data = parse_frame(_read_source(path))
+        return compact_frame(data) if compact else data
+
+    version = dataset_version(path)
+    suffix = "-compact" if compact else ""
+    directory = os.path.join(CACHE_DIR, f"avocado-{CACHE_FORMAT}-{version[:16]}{suffix}")
+    if not os.path.exists(os.path.join(directory, "meta.json")):
+        with phase("load", "read_csv"):
+            data = parse_frame(_read_source(path))
+            if compact:
+                data = compact_frame(data)
+        with phase("load", "write_cache"):
+            write_columns(data, directory, {"source_sha1": version})
+    with phase("load", "read_cache"):
+        return read_columns(directory)
@@ -0,0 +1,132 @@
+import os
+
+import numpy as np
+
+from data_loader import CACHE_DIR, read_arrays, write_arrays
+from metrics import phase
+from stats import nanmean
+
+DECOMPOSITION_DIR = os.path.join(CACHE_DIR, "decomposition")
+DECOMPOSITION_FORMAT = 2
+COMPONENTS = ["observed", "trend", "seasonal", "resid"]
+# Weekly data with a yearly cycle, as in avocado.py
+PERIOD = 52
+
+
+def _moving_average(x, period):
+    # Centred moving average down axis 0, the filter statsmodels'
+    # seasonal_decompose uses (a 2 x period average when period is even).
+    # Windows that reach past either end or hold a missing week are NaN.
+    weights = np.full(period + 1 - period % 2, 1.0)
+    if period % 2 == 0:
+        weights[0] = weights[-1] = 0.5
+    half = len(weights) // 2
+    trend = np.full(x.shape, np.nan)
+    if len(x) < len(weights):
+        return trend
+    missing = np.isnan(x)
+    filled = np.where(missing, 0.0, x)
+    # A running sum gives every full window at once; the two half-weighted
+    # ends are taken off separately
+    totals = np.cumsum(np.vstack([np.zeros((1, x.shape[1])), filled]), axis=0)
+    gaps = np.cumsum(np.vstack([np.zeros((1, x.shape[1])), missing]), axis=0)
+    size = len(weights)
+    window = totals[size:] - totals[:-size]
+    if period % 2 == 0:
+        window -= 0.5 * (filled[: len(window)] + filled[size - 1 :])
+    trend[half : len(x) - half] = np.where(
+        gaps[size:] - gaps[:-size] > 0, np.nan, window / period
+    )
+    return trend
+
+
+def decompose(x, period=PERIOD):
+    # Classical additive decomposition of every column of a (dates, series)
+    # array in one pass, matching sm.tsa.seasonal_decompose(model="additive")
+    # column by column. Unlike statsmodels, missing weeks are allowed: they and
+    # the trend windows around them come out as NaN. Series shorter than two
+    # cycles get NaN components.
+    x = np.asarray(x, dtype=np.float64)
+    trend = _moving_average(x, period)
+    detrended = x - trend
+    size = len(x)
+    seasonal = np.full(x.shape, np.nan)
+    if size >= 2 * period:
+        # Mean of each week of the cycle, centred on zero, repeated down the dates
+        padding = np.full((-size % period, x.shape[1]), np.nan)
+        cycles = np.vstack([detrended, padding]).reshape(-1, period, x.shape[1])
+        averages = nanmean(cycles)
+        averages -= nanmean(averages)
+        seasonal = averages[np.arange(size) % period]
+    return {
+        "observed": x,
+        "trend": trend,
+        "seasonal": seasonal,
+        "resid": detrended - seasonal,
+    }
+
+
+class Decomposition:
+    # Components of every (region, type) series of a RegionMatrix measure,
+    # each a (dates, series) array with one column per key in keys
+
+    def __init__(self, dates, keys, components):
+        self.dates = dates
+        self.keys = [tuple(key) for key in keys]
+        self.components = components
+        self._positions = {key: position for position, key in enumerate(self.keys)}
+
+    @classmethod
+    def from_matrix(cls, matrix, measure="Total Volume", period=PERIOD):
+        keys = [(region, avocado_type) for avocado_type in matrix.types for region in matrix.regions]
+        values = np.hstack([matrix.values[avocado_type, measure] for avocado_type in matrix.types])
+        return cls(matrix.dates, keys, decompose(values, period))
+
+    def series(self, region, avocado_type):
+        # {"Date", "observed", "trend", "seasonal", "resid"} for one series, with
+        # the weeks before its first and after its last row left out
+        position = self._positions.get((region, avocado_type))
+        if position is None:
+            return {"Date": self.dates[:0], **{name: np.empty(0) for name in COMPONENTS}}
+        observed = self.components["observed"][:, position]
+        rows = np.flatnonzero(~np.isnan(observed))
+        lo, hi = (rows[0], rows[-1] + 1) if len(rows) else (0, 0)
+        return {
+            "Date": self.dates[lo:hi],
+            **{name: self.components[name][lo:hi, position] for name in COMPONENTS},
+        }
+
+    def write(self, directory):
+        # One .npy per component, in the columnar cache layout of data_loader
+        write_arrays(
+            {"dates": self.dates, **self.components},
+            directory,
+            {"decomposition_format": DECOMPOSITION_FORMAT, "keys": self.keys},
+        )
+
+    @classmethod
+    def read(cls, directory, mmap=True):
+        arrays, meta = read_arrays(directory, mmap)
+        if meta.get("decomposition_format") != DECOMPOSITION_FORMAT:
+            raise ValueError(f"Unknown decomposition format in {directory}")
+        return cls(arrays["dates"], meta["keys"], {name: arrays[name] for name in COMPONENTS})
+
+
+def decomposition_directory(version, measure="Total Volume", period=PERIOD):
+    name = f"{version[:16]}-{measure.replace(' ', '_')}-{period}-{DECOMPOSITION_FORMAT}"
+    return os.path.join(DECOMPOSITION_DIR, name)
+
+
+def cached_decomposition(matrix, version, measure="Total Volume", period=PERIOD):
+    # Decompose every series once per data version and reuse it afterwards,
+    # from any process on the host
+    directory = decomposition_directory(version, measure, period)
+    try:
+        with phase("load", "read_decomposition"):
+            return Decomposition.read(directory)
+    except (OSError, ValueError):
+        pass
+    with phase("load", "decompose"):
+        decomposition = Decomposition.from_matrix(matrix, measure, period)
+    decomposition.write(directory)
+    return decomposition
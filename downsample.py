@@ -0,0 +1,86 @@
+import numpy as np
+
+# Roughly one point per horizontal pixel is all a line chart can show
+DEFAULT_MAX_POINTS = 1000
+MIN_POINTS = 100
+DEFAULT_METHOD = "lttb"
+
+
+def points_for_width(width):
+    # Rounded up to a multiple of MIN_POINTS, so windows of about the same
+    # width ask for the same number of points and can share cached results
+    if not width:
+        return DEFAULT_MAX_POINTS
+    return max(MIN_POINTS, -(-int(width) // MIN_POINTS) * MIN_POINTS)
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if values.dtype.kind == "M":
+        values = values.astype("datetime64[ns]").astype(np.int64)
+    return values.astype(np.float64)
+
+
+def minmax_indices(y, max_points):
+    # Keep the lowest and highest point of each of max_points / 2 equal buckets,
+    # plus the first and last point, so no peak or trough is lost
+    size = len(y)
+    if size <= max_points:
+        return np.arange(size)
+    y = _as_float(y)
+    bucket_size = -(-size // max(1, (max_points - 2) // 2))
+    buckets = -(-size // bucket_size)
+    padded = np.full(buckets * bucket_size, np.nan)
+    padded[:size] = y
+    padded = padded.reshape(buckets, bucket_size)
+    missing = np.isnan(padded)
+    starts = np.arange(buckets) * bucket_size
+    lows = starts + np.argmin(np.where(missing, np.inf, padded), axis=1)
+    highs = starts + np.argmax(np.where(missing, -np.inf, padded), axis=1)
+    return np.unique(np.concatenate(([0], lows, highs, [size - 1])))
+
+
+def lttb_indices(x, y, max_points):
+    # Largest-Triangle-Three-Buckets: from each bucket keep the point that
+    # forms the largest triangle with the previously kept point and the
+    # average of the next bucket
+    size = len(y)
+    if size <= max_points or max_points < 3:
+        return np.arange(size)
+    x = _as_float(x)
+    y = _as_float(y)
+
+    edges = np.linspace(1, size - 1, max_points - 1).astype(np.int64)
+    counts = np.diff(edges)
+    average_x = np.add.reduceat(x[: size - 1], edges[:-1]) / counts
+    average_y = np.add.reduceat(y[: size - 1], edges[:-1]) / counts
+    next_x = np.append(average_x[1:], x[-1])
+    next_y = np.append(average_y[1:], y[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = size - 1
+    anchor = 0
+    for bucket in range(max_points - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        area = np.abs(
+            (x[anchor] - next_x[bucket]) * (y[lo:hi] - y[anchor])
+            - (x[anchor] - x[lo:hi]) * (next_y[bucket] - y[anchor])
+        )
+        anchor = lo + int(np.argmax(area))
+        selected[bucket + 1] = anchor
+    return selected
+
+
+def downsample(columns, x, y, max_points=DEFAULT_MAX_POINTS, method=DEFAULT_METHOD):
+    # Reduce a dict of equally long arrays to at most max_points rows chosen
+    # from the (x, y) shape. Short series are returned untouched.
+    if len(columns[y]) <= max_points:
+        return columns
+    if method == "minmax":
+        indices = minmax_indices(columns[y], max_points)
+    elif method == "lttb":
+        indices = lttb_indices(columns[x], columns[y], max_points)
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    return {name: values[indices] for name, values in columns.items()}
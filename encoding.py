@@ -0,0 +1,78 @@
+import base64
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+
+# Base64 typed arrays are smaller before compression but larger after it
+# (random-looking bytes gzip poorly), so they are only sent when asked for
+# with AVOCADO_BINARY_TRACES=1 and the bundled plotly.js can decode them
+BINARY_TRACES = os.environ.get("AVOCADO_BINARY_TRACES") == "1"
+
+
+@lru_cache(maxsize=None)
+def plotlyjs_version():
+    # Version of the plotly.js bundle that dash serves to the browser
+    from dash import dcc
+
+    path = os.path.join(os.path.dirname(dcc.__file__), "plotly.min.js")
+    try:
+        with open(path) as handle:
+            header = handle.read(200)
+    except OSError:
+        return None
+    match = re.search(r"plotly\.js v(\d+)\.(\d+)\.(\d+)", header)
+    return tuple(int(part) for part in match.groups()) if match else None
+
+
+@lru_cache(maxsize=None)
+def binary_traces_supported():
+    # plotly.js decodes {"dtype", "bdata"} typed arrays from 2.28.0 on
+    version = plotlyjs_version()
+    return version is not None and version >= (2, 28, 0)
+
+
+def _binary(binary):
+    if binary is None:
+        return BINARY_TRACES and binary_traces_supported()
+    return binary
+
+
+def typed_array(values, dtype="f8"):
+    # Base64 typed-array spec understood by plotly.js >= 2.28
+    array = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder("<"))
+    return {"dtype": dtype, "bdata": base64.b64encode(array.tobytes()).decode("ascii")}
+
+
+def encode_dates(values, binary=None):
+    # Dates at midnight (all of this data) as "YYYY-MM-DD" strings, formatted
+    # by NumPy in one call instead of by pandas element by element. They are
+    # about half the length of pandas' ISO timestamps and, unlike epoch
+    # milliseconds, gzip well since neighbouring dates share their prefix.
+    # Other dates go out as epoch milliseconds, which plotly also reads on a
+    # date axis.
+    values = np.asarray(values)
+    if values.dtype.kind == "M":
+        if _binary(binary):
+            return typed_array(values.astype("datetime64[ms]").astype(np.int64), "f8")
+        days = values.astype("datetime64[D]")
+        if (days == values).all():
+            return np.datetime_as_string(days, unit="D")
+        return values.astype("datetime64[ms]").astype(np.int64)
+    if _binary(binary):
+        return typed_array(values, "f8")
+    return values
+
+
+def encode_values(values, binary=None, decimals=None):
+    # float32 values go out as f4 typed arrays. As JSON numbers they are
+    # widened to float64, where 1.33 becomes 1.3300000429153442, so give
+    # decimals to round that noise away.
+    values = np.asarray(values)
+    if _binary(binary):
+        return typed_array(values, "f4" if values.dtype == np.float32 else "f8")
+    values = np.asarray(values, dtype=np.float64)
+    if decimals is not None:
+        values = np.round(values, decimals)
+    return values
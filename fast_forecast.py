@@ -0,0 +1,189 @@
+import itertools
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from stats import nanmean
+
+WEEK = np.timedelta64(7, "D")
+# Weekly data with a yearly cycle, as in decomposition.py
+PERIOD = 52
+
+# Smoothing parameters tried for every series; each series keeps the
+# combination with the smallest one-step-ahead squared error
+HOLT_WINTERS_GRID = list(
+    itertools.product((0.1, 0.3, 0.6, 0.9), (0.0, 0.05, 0.2), (0.05, 0.2, 0.5))
+)
+# Fewer observations than this and a series is reported as not forecastable
+MIN_OBSERVATIONS = 3
+
+
+def weekly_matrix(series, extra_weeks=0):
+    # Put every (dates, values) series on one weekly calendar. Returns the
+    # first week, a (weeks, series) array with NaN for the weeks a series has
+    # no value for (including extra_weeks empty weeks at the end) and the
+    # position of each series' last week.
+    dates = [np.asarray(series_dates, dtype="datetime64[ns]") for series_dates, _ in series]
+    origin = min((series_dates[0] for series_dates in dates if len(series_dates)), default=None)
+    if origin is None:
+        return None, np.full((extra_weeks, len(series)), np.nan), np.full(len(series), -1)
+    positions = [np.rint((series_dates - origin) / WEEK).astype(np.int64) for series_dates in dates]
+    last = np.array([position[-1] if len(position) else -1 for position in positions])
+    matrix = np.full((int(last.max()) + 1 + extra_weeks, len(series)), np.nan)
+    rows = np.concatenate(positions)
+    columns = np.repeat(np.arange(len(series)), [len(position) for position in positions])
+    matrix[rows, columns] = np.concatenate([np.asarray(values, dtype=np.float64) for _, values in series])
+    return origin, matrix, last
+
+
+def _initial_state(x, period):
+    # Level, trend, seasonal indices and first week to update from, per column.
+    # With two seasons of history the classical start is used: the first
+    # season's mean, the trend between the first two seasons, and the first
+    # season's deviations from that trend line. Shorter series start from
+    # their first value without a season.
+    size, columns = x.shape
+    observed = ~np.isnan(x)
+    first = np.argmax(observed, axis=0)
+    rows = first + np.arange(2 * period)[:, np.newaxis]
+    window = np.take_along_axis(np.vstack([x, np.full((2 * period, columns), np.nan)]), rows, axis=0)
+    first_mean = nanmean(window[:period])
+    second_mean = nanmean(window[period:])
+    seasonal_start = ~np.isnan(first_mean) & ~np.isnan(second_mean)
+
+    trend = np.where(seasonal_start, (second_mean - first_mean) / period, 0.0)
+    level = np.where(
+        seasonal_start,
+        first_mean + trend * (period - 1) / 2,
+        x[first, np.arange(columns)],
+    )
+    seasonal = np.zeros((period, columns))
+    ramp = trend * (np.arange(period) - (period - 1) / 2)[:, np.newaxis]
+    deviations = np.nan_to_num(window[:period] - first_mean - ramp)
+    phases = (first + np.arange(period)[:, np.newaxis]) % period
+    np.put_along_axis(seasonal, phases, np.where(seasonal_start, deviations, 0.0), axis=0)
+    start = np.where(seasonal_start, first + period, first + 1)
+    return level, trend, seasonal, start
+
+
+def _holt_winters(x, alpha, beta, gamma, period, repeat=1, record=False):
+    # Additive Holt-Winters run down every column of x at once, each with its
+    # own parameters; with repeat, x is run that many times side by side (one
+    # copy per parameter set in alpha, beta and gamma). Missing weeks advance
+    # the level by the trend without an update, so the one-step forecasts
+    # recorded past a series' last week are its multi-step forecasts. Returns
+    # the squared error sum, the number of errors and, with record, the
+    # (weeks, columns) one-step forecasts.
+    level, trend, seasonal, start = _initial_state(x, period)
+    advance = np.arange(x.shape[0])[:, np.newaxis] >= start
+    update = (advance & ~np.isnan(x)).astype(np.float64)
+    values = np.nan_to_num(x)
+    if repeat > 1:
+        level, trend = np.tile(level, repeat), np.tile(trend, repeat)
+        seasonal, advance, update, values = (
+            np.tile(array, (1, repeat)) for array in (seasonal, advance, update, values)
+        )
+    # The usual level, trend and season updates in error-correction form, so
+    # each week is a handful of array operations with no branching
+    level_gain, trend_gain, season_gain = alpha, alpha * beta, (1 - alpha) * gamma
+    squared_errors = np.zeros(values.shape[1])
+    forecasts = np.full(values.shape, np.nan) if record else None
+    for week in range(values.shape[0]):
+        phase = week % period
+        forecast = level + trend + seasonal[phase]
+        if record:
+            forecasts[week] = np.where(advance[week], forecast, np.nan)
+        error = (values[week] - forecast) * update[week]
+        squared_errors += error * error
+        level = level + trend * advance[week] + level_gain * error
+        trend = trend + trend_gain * error
+        seasonal[phase] += season_gain * error
+    return squared_errors, update.sum(axis=0), forecasts
+
+
+def _frames(origin, last, yhat, spread, weeks_to_forecast, usable):
+    # One forecast frame per series (None for the ones that were not usable)
+    frames = []
+    for column, series_last in enumerate(last):
+        if not usable[column]:
+            frames.append(None)
+            continue
+        ds = origin + (series_last + np.arange(1, weeks_to_forecast + 1)) * WEEK
+        frames.append(
+            pd.DataFrame(
+                {
+                    "ds": ds,
+                    "yhat": yhat[:, column],
+                    "yhat_lower": yhat[:, column] - spread[:, column],
+                    "yhat_upper": yhat[:, column] + spread[:, column],
+                }
+            )
+        )
+    return frames
+
+
+def _horizon_rows(last, weeks_to_forecast):
+    # (weeks_to_forecast, series) row positions of each series' forecast weeks
+    return last + np.arange(1, weeks_to_forecast + 1)[:, np.newaxis]
+
+
+def holt_winters(series, interval_width, weeks_to_forecast, period=PERIOD, grid=HOLT_WINTERS_GRID):
+    # Forecast every (dates, values) series at once. The parameter search runs
+    # all series x all grid points as columns of one array; a second pass with
+    # the chosen parameters records the forecasts. Returns a list of frames
+    # with the forecast columns, None for series too short to forecast.
+    origin, x, last = weekly_matrix(series, extra_weeks=weeks_to_forecast)
+    count = len(series)
+    usable = (~np.isnan(x)).sum(axis=0) >= MIN_OBSERVATIONS
+    if not usable.any():
+        return [None] * count
+    history = x[: int(last.max()) + 1]
+
+    parameters = np.repeat(np.array(grid, dtype=np.float64), count, axis=0)
+    squared_errors, errors, _ = _holt_winters(history, *parameters.T, period, repeat=len(grid))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = (squared_errors / errors).reshape(len(grid), count)
+    best = np.argmin(np.where(np.isfinite(scores), scores, np.inf), axis=0)
+    alpha, beta, gamma = parameters.reshape(len(grid), count, 3)[best, np.arange(count)].T
+
+    squared_errors, errors, forecasts = _holt_winters(x, alpha, beta, gamma, period, record=True)
+    yhat = np.take_along_axis(forecasts, _horizon_rows(last, weeks_to_forecast), axis=0)
+
+    # Forecast variance of additive Holt-Winters h weeks ahead (Hyndman &
+    # Athanasopoulos, ETS(A,A,A)), with the smoothing parameters in ETS form
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sigma = np.sqrt(squared_errors / errors)
+    steps = np.arange(1, weeks_to_forecast)[:, np.newaxis]
+    terms = alpha + alpha * beta * steps + (1 - alpha) * gamma * (steps % period == 0)
+    multiplier = np.sqrt(1 + np.vstack([np.zeros((1, count)), np.cumsum(terms**2, axis=0)]))
+    z = NormalDist().inv_cdf(0.5 + interval_width / 2)
+    return _frames(origin, last, yhat, z * sigma * multiplier, weeks_to_forecast, usable)
+
+
+def seasonal_naive(series, interval_width, weeks_to_forecast, period=PERIOD):
+    # Every week repeats the same week a year earlier; series with less than
+    # a year of history repeat their last value instead. The interval comes
+    # from the spread of those one-season (or one-week) differences.
+    origin, x, last = weekly_matrix(series, extra_weeks=weeks_to_forecast)
+    count = len(series)
+    usable = (~np.isnan(x)).sum(axis=0) >= MIN_OBSERVATIONS
+    columns = np.arange(count)
+
+    seasonal_differences = x[period:] - x[:-period] if len(x) > period else np.empty((0, count))
+    seasonal = (~np.isnan(seasonal_differences)).sum(axis=0) >= MIN_OBSERVATIONS - 1
+    lag = np.where(seasonal, period, 1)
+    differences = np.where(seasonal, nanmean(seasonal_differences**2), nanmean(np.diff(x, axis=0) ** 2))
+
+    # Carry each series' last value forward over missing weeks first, so a
+    # gap a year back falls back to the closest earlier week
+    rows = np.where(~np.isnan(x), np.arange(len(x))[:, np.newaxis], 0)
+    filled = x[np.maximum.accumulate(rows, axis=0), columns]
+    horizon = _horizon_rows(last, weeks_to_forecast)
+    steps = horizon - last
+    source = last - (lag - 1 - (steps - 1) % lag)
+    yhat = filled[np.maximum(source, 0), columns]
+
+    z = NormalDist().inv_cdf(0.5 + interval_width / 2)
+    spread = z * np.sqrt(differences) * np.sqrt((steps - 1) // lag + 1)
+    return _frames(origin, last, yhat, spread, weeks_to_forecast, usable)
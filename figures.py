@@ -0,0 +1,249 @@
+from dash import dash_table, html
+
+from encoding import encode_dates, encode_values
+
+# Styling shared by every chart. Built once at import and referenced by each
+# figure's layout instead of being rebuilt and patched on every callback.
+# Dates are sent as "YYYY-MM-DD" strings (see encoding.py) on a date axis.
+CHART_TEMPLATE = {
+    "layout": {
+        "title": {"x": 0.05, "xanchor": "left"},
+        "xaxis": {"fixedrange": True, "type": "date", "title": {"text": "Date"}},
+        "yaxis": {"fixedrange": True},
+    }
+}
+
+PRICE_HOVER = "$%{y:.2f}<extra></extra>"
+VOLUME_HOVER = "%{y:.2f}<extra></extra>"
+
+# The data has two decimals; the app keeps it as float32 (data_loader.COMPACT_DTYPES)
+VALUE_DECIMALS = 2
+
+TABLE_STYLE = {
+    "style_cell": {"textAlign": "left"},
+    "style_header": {
+        "backgroundColor": "white",
+        "fontWeight": "bold",
+        "border": "1px solid black",
+    },
+    "style_data": {"border": "1px solid black"},
+}
+
+
+def _layout(title, **layout):
+    return {"template": CHART_TEMPLATE, "title": {"text": title}, **layout}
+
+
+def price_figure(dates, prices):
+    return {
+        "data": [
+            {
+                "x": encode_dates(dates),
+                "y": encode_values(prices, decimals=VALUE_DECIMALS),
+                "type": "lines",
+                "hovertemplate": PRICE_HOVER,
+                "line": {"color": "#E12D39"},
+            },
+        ],
+        "layout": _layout(
+            "Average Price of Avocados",
+            yaxis={"tickprefix": "$", "title": {"text": "Price"}},
+        ),
+    }
+
+
+def volume_figure(dates, volumes):
+    return {
+        "data": [
+            {
+                "x": encode_dates(dates),
+                "y": encode_values(volumes, decimals=VALUE_DECIMALS),
+                "type": "lines",
+                "hovertemplate": VOLUME_HOVER,
+                "line": {"color": "#17B897"},
+            },
+        ],
+        "layout": _layout(
+            "Avocados Sold", yaxis={"title": {"text": "Avocados Sold"}}
+        ),
+    }
+
+
+# What the comparison chart can show for the selected regions: a measure from
+# the region matrix, or each region's share of the TotalUS volume
+COMPARISON_METRICS = {
+    "AveragePrice": {
+        "label": "Average Price",
+        "hover": "$%{y:.2f}",
+        "decimals": VALUE_DECIMALS,
+        "yaxis": {"tickprefix": "$", "title": {"text": "Price"}},
+    },
+    "Total Volume": {
+        "label": "Avocados Sold",
+        "hover": "%{y:.2f}",
+        "decimals": VALUE_DECIMALS,
+        "yaxis": {"title": {"text": "Avocados Sold"}},
+    },
+    "share": {
+        "label": "Share of TotalUS Volume",
+        "hover": "%{y:.2%}",
+        "decimals": 5,
+        "yaxis": {"tickformat": ".0%", "title": {"text": "Share of TotalUS"}},
+    },
+}
+
+
+def comparison_figure(series, metric):
+    # One line per region; series maps each region to its (dates, values).
+    # Sent whole to the comparison-store and sliced by date in the browser,
+    # so plain arrays as in series_store.
+    settings = COMPARISON_METRICS[metric]
+    return {
+        "data": [
+            {
+                "x": encode_dates(region_dates, binary=False),
+                "y": encode_values(values, binary=False, decimals=settings["decimals"]),
+                "type": "lines",
+                "name": region,
+                "hovertemplate": f"{region}: {settings['hover']}<extra></extra>",
+            }
+            for region, (region_dates, values) in series.items()
+        ],
+        "layout": _layout(
+            f"{settings['label']} by Region",
+            yaxis=settings["yaxis"],
+            showlegend=True,
+        ),
+    }
+
+
+def decomposition_figure(components):
+    # The observed volume with its trend on top, then the seasonal component
+    # and the residual on their own axes below, sharing the date axis
+    dates = encode_dates(components["Date"])
+    traces = [
+        ("observed", "Observed", "y", "#17B897"),
+        ("trend", "Trend", "y", "#222222"),
+        ("seasonal", "Seasonal", "y2", "#E12D39"),
+        ("resid", "Residual", "y3", "#079A82"),
+    ]
+    return {
+        "data": [
+            {
+                "x": dates,
+                "y": encode_values(components[name], decimals=VALUE_DECIMALS),
+                "type": "lines",
+                "name": label,
+                "yaxis": axis,
+                "hovertemplate": f"{label}: {VOLUME_HOVER}",
+                "line": {"color": color},
+            }
+            for name, label, axis, color in traces
+        ],
+        "layout": _layout(
+            "Trend and Seasonality of Avocados Sold",
+            height=600,
+            yaxis={"domain": [0.55, 1], "title": {"text": "Avocados Sold"}},
+            yaxis2={"domain": [0.28, 0.5], "fixedrange": True, "title": {"text": "Seasonal"}},
+            yaxis3={"domain": [0, 0.22], "fixedrange": True, "title": {"text": "Residual"}},
+        ),
+    }
+
+
+def series_store(columns, date_column="Date"):
+    # The columns of one series for the series-store, which the browser slices
+    # by date (assets/client_filter.js). Plain arrays rather than typed arrays,
+    # as the client-side callbacks index into them; dates are "YYYY-MM-DD"
+    # strings, which sort the same way as the dates.
+    store = {"dates": encode_dates(columns[date_column], binary=False)}
+    for name, values in columns.items():
+        if name != date_column:
+            store[name] = encode_values(values, binary=False, decimals=VALUE_DECIMALS)
+    return store
+
+
+def forecast_figure(forecast):
+    band = {
+        "type": "lines",
+        "hovertemplate": PRICE_HOVER,
+        "line": {"color": "#E12D39", "dash": "dash"},
+        "showlegend": False,
+    }
+    dates = encode_dates(forecast["ds"])
+    return {
+        "data": [
+            {
+                "x": dates,
+                "y": encode_values(forecast["yhat"]),
+                "type": "lines",
+                "hovertemplate": PRICE_HOVER,
+            },
+            {"x": dates, "y": encode_values(forecast["yhat_upper"]), **band},
+            {"x": dates, "y": encode_values(forecast["yhat_lower"]), **band},
+        ],
+        "layout": _layout(
+            "Forecasted Average Price of Avocados",
+            yaxis={"tickprefix": "$", "title": {"text": "Price"}},
+            colorway=["#17B897"],
+            hovermode="x unified",
+        ),
+    }
+
+
+def pending_figure(title):
+    # An empty chart for the initial layout, filled in by a callback on load
+    return {"data": [], "layout": _layout(title)}
+
+
+# Shown instead of a series' forecast, by ForecastWorker.state
+FORECAST_MESSAGES = {
+    "pending": "Forecast is being computed...",
+    "failed": "Forecast failed, see the server log",
+    "too-short": "Not enough data to forecast this series",
+}
+
+
+def pending_forecast_figure(state="pending"):
+    # Placeholder shown until the background forecast has finished, or
+    # instead of one that could not be made
+    message = FORECAST_MESSAGES[state]
+    return {
+        "data": [],
+        "layout": _layout(
+            "Forecasted Average Price of Avocados",
+            xaxis={"visible": False},
+            yaxis={"visible": False},
+            annotations=[
+                {"text": message, "showarrow": False, "font": {"size": 16}}
+            ],
+        ),
+    }
+
+
+def forecast_table(forecast, weeks_to_forecast):
+    table_data = forecast.loc[:, ["ds", "yhat", "yhat_lower", "yhat_upper"]].tail(
+        weeks_to_forecast
+    )
+    table_data = table_data.rename(columns={"ds": "Date", "yhat": "Projected Price"})
+    return dash_table.DataTable(
+        data=table_data.to_dict("records"),
+        columns=[{"id": c, "name": c} for c in table_data.columns],
+        **TABLE_STYLE,
+    )
+
+
+def pending_stats_table(columns, id=None):
+    # The summary table without rows. assets/client_filter.js fills in one row
+    # per statistic of stats.describe, rounded to cents, for the selected dates.
+    return dash_table.DataTable(
+        **({"id": id} if id is not None else {}),
+        data=[],
+        columns=[{"id": c, "name": c} for c in ["Statistic", *columns]],
+        **TABLE_STYLE,
+    )
+
+
+def pending_forecast_table(state="pending"):
+    if state == "pending":
+        return html.P("Projected prices will appear here once the forecast is ready.")
+    return html.P("No projected prices for this series.")
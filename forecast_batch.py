@@ -0,0 +1,120 @@
+# Forecast every (region, type) series without starting the web app, e.g.
+# nightly on a batch machine. The forecasts are written to the columnar
+# cache, where app.py (run with the same engine) loads them instead of
+# fitting models itself.
+#
+#     python forecast_batch.py --engine prophet --processes 8
+#     python forecast_batch.py --engine arima --targets "Total Volume"
+#     python forecast_batch.py --engine holt-winters
+import argparse
+import os
+import shutil
+import sys
+import time
+
+from data_loader import dataset_version, load_avocado, source_path
+from forecasting import FORECAST_ENGINES, batch_directory, batch_forecasts, write_batch
+from series_index import SeriesIndex
+
+TARGETS = ["AveragePrice", "Total Volume"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Forecast every (region, type) series and write the results for the dashboard"
+    )
+    parser.add_argument("--source", help="CSV file to forecast (defaults to the bundled data)")
+    parser.add_argument("--engine", choices=sorted(FORECAST_ENGINES), default="prophet")
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=TARGETS)
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (defaults to the CPU count)")
+    parser.add_argument("--interval-width", type=float, default=0.95)
+    parser.add_argument("--weeks", type=int, default=12, help="weeks to forecast")
+    parser.add_argument("--force", action="store_true", help="refit even if this data was already forecast")
+    return parser.parse_args(argv)
+
+
+def progress_printer(target):
+    started = time.perf_counter()
+
+    def progress(done, total, series_key, result):
+        status = "failed" if result is None else f"{result['seconds']:7.2f}s"
+        print(
+            f"[{target}] {done:>4}/{total} {'/'.join(series_key):<32} {status}"
+            f"   {time.perf_counter() - started:7.1f}s elapsed",
+            flush=True,
+        )
+
+    return progress
+
+
+def run(
+    source=None,
+    engine="prophet",
+    targets=TARGETS,
+    processes=None,
+    interval_width=0.95,
+    weeks_to_forecast=12,
+    force=False,
+):
+    # Returns the series that could not be forecast, per target
+    source = source or source_path()
+    version = dataset_version(source)
+    series_index = SeriesIndex(load_avocado(source))
+    failures = {}
+    for target in targets:
+        directory = batch_directory(version, interval_width, weeks_to_forecast, target, engine)
+        if os.path.exists(os.path.join(directory, "meta.json")):
+            if not force:
+                print(f"[{target}] already forecast for this data in {directory}")
+                continue
+            shutil.rmtree(directory)
+
+        started = time.perf_counter()
+        forecasts = batch_forecasts(
+            series_index,
+            target,
+            engine,
+            interval_width,
+            weeks_to_forecast,
+            processes,
+            progress=progress_printer(target),
+        )
+        failed = sorted(set(series_index.series_keys()) - set(forecasts))
+        elapsed = time.perf_counter() - started
+        write_batch(
+            forecasts,
+            directory,
+            {
+                "engine": engine,
+                "target": target,
+                "source_sha1": version,
+                "interval_width": interval_width,
+                "weeks_to_forecast": weeks_to_forecast,
+                "failed": ["/".join(series_key) for series_key in failed],
+                "seconds": elapsed,
+            },
+        )
+        print(
+            f"[{target}] {len(forecasts)} series forecast with {engine} in "
+            f"{elapsed:.1f}s, {len(failed)} failed, written to {directory}"
+        )
+        failures[target] = failed
+    return failures
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    failures = run(
+        args.source,
+        args.engine,
+        args.targets,
+        args.processes,
+        args.interval_width,
+        args.weeks,
+        args.force,
+    )
+    return 1 if any(failures.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
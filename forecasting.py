@@ -0,0 +1,544 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CACHE_DIR, read_columns, write_columns
+from fast_forecast import MIN_OBSERVATIONS, holt_winters, seasonal_naive
+from metrics import FORECAST_SERIES, observe_phase
+
+try:
+    import fcntl
+except ImportError:  # not on Windows, where the app runs as a single process anyway
+    fcntl = None
+
+FORECAST_DIR = os.path.join(CACHE_DIR, "forecasts")
+FORECAST_COLUMNS = ["ds", "yhat", "yhat_lower", "yhat_upper"]
+
+# The ARIMA engine models the yearly season of the weekly series with Fourier
+# terms and gives the order search of every series this many seconds
+ARIMA_FOURIER_TERMS = 4
+ARIMA_TIME_BUDGET = 60
+
+
+def forecast_key(version, interval_width, weeks_to_forecast, target="AveragePrice"):
+    # Forecasts are only reusable for the same data and the same settings
+    settings = json.dumps(
+        [version, target, float(interval_width), int(weeks_to_forecast)]
+    )
+    return hashlib.sha1(settings.encode()).hexdigest()[:16]
+
+
+def warm_start_params(model):
+    # Fitted parameters of a previous model, used as the optimizer's starting
+    # point (see the Prophet docs on updating fitted models)
+    params = {}
+    for name in ["k", "m", "sigma_obs"]:
+        params[name] = model.params[name][0][0]
+    for name in ["delta", "beta"]:
+        params[name] = model.params[name][0]
+    return params
+
+
+def _fit_series(key, dates, values, interval_width, weeks_to_forecast, previous=None):
+    # Runs inside a worker process, so keep the heavy imports local
+    from prophet import Prophet
+    from prophet.serialize import model_from_json, model_to_json
+
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    started = time.perf_counter()
+    history = pd.DataFrame({"ds": dates, "y": values})
+    model = Prophet(interval_width=interval_width)
+    if previous is None:
+        model.fit(history)
+    else:
+        try:
+            model.fit(history, init=warm_start_params(model_from_json(previous)))
+        except Exception:
+            # The previous parameters no longer fit the model, start from scratch
+            model = Prophet(interval_width=interval_width)
+            model.fit(history)
+    fitted = time.perf_counter()
+    future = model.make_future_dataframe(
+        periods=weeks_to_forecast, freq="W", include_history=False
+    )
+    forecast = model.predict(future)[FORECAST_COLUMNS]
+    timings = {"fit": fitted - started, "predict": time.perf_counter() - fitted}
+    return key, {"model": model_to_json(model), "forecast": forecast, "timings": timings}
+
+
+def _fit_series_arima(key, dates, values, interval_width, weeks_to_forecast, previous=None):
+    # ARIMA with the yearly season as Fourier terms; the order search runs
+    # in this process since every series already has a worker of its own
+    from arima_search import fit_best_arima
+
+    started = time.perf_counter()
+    model = fit_best_arima(
+        values,
+        name="/".join(map(str, key)),
+        fourier_terms=ARIMA_FOURIER_TERMS,
+        time_budget=ARIMA_TIME_BUDGET,
+        processes=1,
+    )
+    fitted = time.perf_counter()
+    yhat, interval = model.predict(
+        n_periods=weeks_to_forecast, return_conf_int=True, alpha=1 - interval_width
+    )
+    ds = pd.date_range(pd.Timestamp(dates[-1]), periods=weeks_to_forecast + 1, freq="W")[1:]
+    forecast = pd.DataFrame(
+        {
+            "ds": ds,
+            "yhat": np.asarray(yhat),
+            "yhat_lower": interval[:, 0],
+            "yhat_upper": interval[:, 1],
+        }
+    )
+    timings = {"fit": fitted - started, "predict": time.perf_counter() - fitted}
+    return key, {"model": None, "forecast": forecast, "timings": timings}
+
+
+# Engines that fit one series at a time run in a process pool, one series per
+# task. Batch engines get every series at once and fit them together with array
+# operations in the calling process: fn(series, interval_width,
+# weeks_to_forecast) with series a list of (dates, values), returning one
+# forecast frame (or None if it could not be fitted) per series.
+SERIES_ENGINES = {"prophet": _fit_series, "arima": _fit_series_arima}
+BATCH_ENGINES = {"holt-winters": holt_winters, "seasonal-naive": seasonal_naive}
+FORECAST_ENGINES = {**SERIES_ENGINES, **BATCH_ENGINES}
+DEFAULT_ENGINE = "prophet"
+
+
+def _timed_fit(engine, *args):
+    started = time.perf_counter()
+    key, result = SERIES_ENGINES[engine](*args)
+    result["seconds"] = time.perf_counter() - started
+    return key, result
+
+
+def pool_context():
+    # app.py does its work at import time, so worker processes must not
+    # re-import the main module the way the spawn start method does. Forking
+    # is only safe while this is the process' one thread, though: a lock held
+    # by another thread stays locked in the child. With other threads running,
+    # the processes come from a forkserver with this module already imported.
+    # The app forks its pool before starting any thread (see start_pool).
+    methods = multiprocessing.get_all_start_methods()
+    if "fork" in methods and threading.active_count() == 1:
+        return multiprocessing.get_context("fork")
+    if "forkserver" in methods:
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["forecasting"])
+        return context
+    return multiprocessing.get_context()
+
+
+def start_pool(processes=None):
+    # A process pool for _fit_many with all its processes started, forked
+    # from the calling thread: call it before starting other threads
+    pool = ProcessPoolExecutor(max_workers=processes, mp_context=pool_context())
+    # With fork the first job starts every process at once
+    pool.submit(int).result()
+    return pool
+
+
+def _read_cache(path):
+    try:
+        with open(path, "rb") as handle:
+            return pickle.load(handle)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def _write_cache(path, forecasts):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, staging = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "wb") as handle:
+        pickle.dump(forecasts, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(staging, path)
+
+
+@contextmanager
+def file_lock(path):
+    # Exclusive lock on path + ".lock" across processes on the host. Held
+    # while fitting the forecasts for one cache file, so that server workers
+    # reacting to the same new data fit once and the others read the result
+    # instead of refitting it themselves
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".lock", "w") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _fit_batch(series_index, series_keys, settings, progress=None):
+    # Every series in one call to a batch engine, in this process
+    target = settings["target"]
+    started = time.perf_counter()
+    series = []
+    for series_key in series_keys:
+        columns = series_index.columns(*series_key, names=["Date", target])
+        series.append((columns["Date"], columns[target]))
+    frames = BATCH_ENGINES[settings["engine"]](
+        series, settings["interval_width"], settings["weeks_to_forecast"]
+    )
+    elapsed = time.perf_counter() - started
+    observe_phase("forecast", "batch", elapsed)
+    results = {}
+    for done, (series_key, frame) in enumerate(zip(series_keys, frames), start=1):
+        if frame is None:
+            logging.getLogger(__name__).warning("Could not forecast %s", series_key)
+            FORECAST_SERIES.inc(engine=settings["engine"], outcome="failed")
+        else:
+            FORECAST_SERIES.inc(engine=settings["engine"], outcome="fitted")
+            # The series share the fit, so each is charged an equal part
+            results[series_key] = {
+                "model": None,
+                "forecast": frame,
+                "seconds": elapsed / len(series_keys),
+                "timings": {"fit": elapsed / len(series_keys)},
+            }
+        if progress is not None:
+            progress(done, len(series_keys), series_key, results.get(series_key))
+    return results
+
+
+def _fit_many(series_index, series_keys, settings, previous=None, progress=None, pool=None):
+    # progress(done, total, series_key, result) is called as each series
+    # finishes, with result None for a series that failed. Uses pool (see
+    # start_pool) when given, or a pool of its own for this call.
+    previous = previous or {}
+    series_keys = list(series_keys)
+    if settings["engine"] in BATCH_ENGINES:
+        return _fit_batch(series_index, series_keys, settings, progress)
+    target = settings["target"]
+    results = {}
+    with nullcontext(pool) if pool is not None else ProcessPoolExecutor(
+        max_workers=settings["processes"], mp_context=pool_context()
+    ) as pool:
+        jobs = {}
+        for series_key in series_keys:
+            columns = series_index.columns(*series_key, names=["Date", target])
+            job = pool.submit(
+                _timed_fit,
+                settings["engine"],
+                series_key,
+                columns["Date"],
+                columns[target],
+                settings["interval_width"],
+                settings["weeks_to_forecast"],
+                previous.get(series_key, {}).get("model"),
+            )
+            jobs[job] = series_key
+        for done, job in enumerate(as_completed(jobs), start=1):
+            series_key = jobs[job]
+            # One series that cannot be fitted (e.g. a new region with a
+            # single week) should not cost every other forecast
+            try:
+                results[series_key] = job.result()[1]
+            except Exception:
+                logging.getLogger(__name__).exception(
+                    "Could not forecast %s", series_key
+                )
+                FORECAST_SERIES.inc(engine=settings["engine"], outcome="failed")
+            else:
+                FORECAST_SERIES.inc(engine=settings["engine"], outcome="fitted")
+                # Fitting happens in the pool, so the parent records the timings
+                for name, seconds in results[series_key]["timings"].items():
+                    observe_phase("forecast", name, seconds)
+            if progress is not None:
+                progress(done, len(jobs), series_key, results.get(series_key))
+    return results
+
+
+def _settings(interval_width, weeks_to_forecast, target, processes, engine=DEFAULT_ENGINE):
+    if engine not in FORECAST_ENGINES:
+        raise ValueError(f"Unknown forecast engine: {engine}")
+    return {
+        "interval_width": interval_width,
+        "weeks_to_forecast": weeks_to_forecast,
+        "target": target,
+        "processes": processes,
+        "engine": engine,
+    }
+
+
+def _cache_path(version, settings):
+    key = forecast_key(
+        version,
+        settings["interval_width"],
+        settings["weeks_to_forecast"],
+        settings["target"],
+    )
+    return os.path.join(FORECAST_DIR, f"{key}-{settings['engine']}.pkl")
+
+
+def batch_directory(
+    version,
+    interval_width=0.95,
+    weeks_to_forecast=12,
+    target="AveragePrice",
+    engine=DEFAULT_ENGINE,
+):
+    # Where forecast_batch.py writes the forecasts of every series for one
+    # target, data version, engine and settings
+    key = forecast_key(version, interval_width, weeks_to_forecast, target)
+    return os.path.join(FORECAST_DIR, f"batch-{key}-{engine}")
+
+
+def write_batch(forecasts, directory, extra=None):
+    # All forecast frames in one long columnar table, one block per series
+    frames = [
+        result["forecast"].assign(region=series_key[0], type=series_key[1])
+        for series_key, result in sorted(forecasts.items())
+    ]
+    table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=["region", "type", *FORECAST_COLUMNS]
+    )
+    table = table[["region", "type", *FORECAST_COLUMNS]].astype(
+        {"region": "category", "type": "category", "ds": "datetime64[ns]"}
+    )
+    timings = {
+        "/".join(series_key): result.get("seconds")
+        for series_key, result in sorted(forecasts.items())
+    }
+    write_columns(table, directory, {**(extra or {}), "timings": timings})
+
+
+def read_batch(directory):
+    # Forecasts written by write_batch in the shape fit_forecasts returns,
+    # or None when there is no batch output for these settings
+    if not os.path.exists(os.path.join(directory, "meta.json")):
+        return None
+    table = read_columns(directory, mmap=False)
+    forecasts = {}
+    for (region, avocado_type), frame in table.groupby(
+        ["region", "type"], sort=False, observed=True
+    ):
+        forecasts[(region, avocado_type)] = {
+            "model": None,
+            "forecast": frame[FORECAST_COLUMNS].reset_index(drop=True),
+        }
+    return forecasts
+
+
+def fit_forecasts(
+    series_index,
+    version,
+    interval_width=0.95,
+    weeks_to_forecast=12,
+    target="AveragePrice",
+    processes=None,
+    engine=DEFAULT_ENGINE,
+    pool=None,
+):
+    # Forecast every (region, type) series with the engine (one model per
+    # series in a process pool for Prophet and ARIMA) and persist the fitted
+    # models and forecast frames for the next start. Forecasts produced by
+    # the batch job for the same data and engine are used as is.
+    forecasts = read_batch(
+        batch_directory(version, interval_width, weeks_to_forecast, target, engine)
+    )
+    if forecasts is not None:
+        return forecasts
+
+    settings = _settings(interval_width, weeks_to_forecast, target, processes, engine)
+    path = _cache_path(version, settings)
+    forecasts = _read_cache(path)
+    if forecasts is not None:
+        return forecasts
+
+    with file_lock(path):
+        forecasts = _read_cache(path)
+        if forecasts is None:
+            forecasts = _fit_many(series_index, series_index.series_keys(), settings, pool=pool)
+            _write_cache(path, forecasts)
+    return forecasts
+
+
+def batch_forecasts(
+    series_index,
+    target="AveragePrice",
+    engine=DEFAULT_ENGINE,
+    interval_width=0.95,
+    weeks_to_forecast=12,
+    processes=None,
+    progress=None,
+    series_keys=None,
+):
+    # Forecasts of every series (or the given ones) with the given engine,
+    # without any caching; used by forecast_batch.py, which writes them out
+    # with write_batch, and by backtest.py
+    settings = _settings(interval_width, weeks_to_forecast, target, processes, engine)
+    if series_keys is None:
+        series_keys = series_index.series_keys()
+    return _fit_many(series_index, series_keys, settings, progress=progress)
+
+
+def refit_forecasts(
+    forecasts,
+    series_index,
+    version,
+    series_keys,
+    interval_width=0.95,
+    weeks_to_forecast=12,
+    target="AveragePrice",
+    processes=None,
+    engine=DEFAULT_ENGINE,
+    pool=None,
+):
+    # Refit only the given series after new rows arrived, warm-starting each
+    # from its previous parameters, and keep every other forecast as it was
+    settings = _settings(interval_width, weeks_to_forecast, target, processes, engine)
+    path = _cache_path(version, settings)
+    cached = _read_cache(path)
+    if cached is not None:
+        return cached
+
+    with file_lock(path):
+        cached = _read_cache(path)
+        if cached is not None:
+            return cached
+        refitted = _fit_many(series_index, series_keys, settings, previous=forecasts, pool=pool)
+        forecasts = {**forecasts, **refitted}
+        _write_cache(path, forecasts)
+    return forecasts
+
+
+def _failure_reason(series_index, key, settings):
+    # Why a series got no forecast: too few weeks to fit, or the fit failed
+    values = series_index.columns(*key, names=[settings.get("target", "AveragePrice")])
+    observations = np.count_nonzero(~np.isnan(next(iter(values.values()))))
+    return "too-short" if observations < MIN_OBSERVATIONS else "failed"
+
+
+class ForecastWorker:
+    # Computes the forecasts in a background thread so the app can serve the
+    # price and volume charts while the models are still fitting. Refits for new
+    # data are queued to the same thread, and the previous forecasts are
+    # served until they finish.
+
+    def __init__(self, series_index, version, **settings):
+        # Fail at startup on a misconfigured engine, not in the background
+        _settings(None, None, None, None, settings.get("engine", DEFAULT_ENGINE))
+        self.settings = settings
+        self.version = None
+        self.forecasts = None
+        self.error = None
+        # Series the last fit could not forecast: "too-short" or "failed"
+        self.failures = {}
+        self._pool = None
+        self._requests = queue.Queue()
+        self._requests.put((series_index, version, None))
+        self._first_done = threading.Event()
+        self._thread = threading.Thread(
+            target=self._loop, name="forecast-worker", daemon=True
+        )
+
+    def _loop(self):
+        while True:
+            series_index, version, series_keys = self._requests.get()
+            # Fold every request that queued up meanwhile into one refit of
+            # the latest data; None means every series
+            while not self._requests.empty():
+                series_index, version, more_keys = self._requests.get()
+                if series_keys is None or more_keys is None:
+                    series_keys = None
+                else:
+                    series_keys = series_keys | more_keys
+            self._run(series_index, version, series_keys)
+            self._first_done.set()
+
+    def _run(self, series_index, version, series_keys):
+        started = time.perf_counter()
+        step = "initial" if self.forecasts is None or series_keys is None else "refit"
+        try:
+            if step == "initial":
+                forecasts = fit_forecasts(series_index, version, pool=self._pool, **self.settings)
+            else:
+                forecasts = refit_forecasts(
+                    self.forecasts,
+                    series_index,
+                    version,
+                    series_keys,
+                    pool=self._pool,
+                    **self.settings,
+                )
+        except Exception as error:
+            logging.getLogger(__name__).exception("Forecast fitting failed")
+            self.error = error
+            return
+        finally:
+            observe_phase("forecast", step, time.perf_counter() - started)
+        failures = {key: reason for key, reason in self.failures.items() if key not in forecasts}
+        for key in series_index.series_keys() if series_keys is None else series_keys:
+            if key not in forecasts:
+                failures[key] = _failure_reason(series_index, key, self.settings)
+        self.forecasts, self.failures, self.version, self.error = forecasts, failures, version, None
+
+    def prime(self):
+        # Do the initial fit (or cache load) in the calling thread, e.g. in a
+        # server process before it forks its workers so they share the result.
+        # start() afterwards only handles refits.
+        if not self._first_done.is_set():
+            self._run(*self._requests.get())
+            self._first_done.set()
+        return self
+
+    def start(self):
+        # The fitting thread reuses one process pool, forked here before it
+        # starts (and before the caller starts any other thread)
+        if self.settings.get("engine", DEFAULT_ENGINE) not in BATCH_ENGINES:
+            self._pool = start_pool(self.settings.get("processes"))
+        self._thread.start()
+        return self
+
+    def refit(self, series_index, version, series_keys):
+        # Queue a refit of the given series for a new data version
+        self._requests.put((series_index, version, set(series_keys)))
+
+    def wait(self, timeout=None):
+        self._first_done.wait(timeout)
+        return self.ready
+
+    @property
+    def ready(self):
+        return self.forecasts is not None
+
+    @property
+    def status(self):
+        if self.error is not None and not self.ready:
+            return "failed"
+        return "ready" if self.ready else "pending"
+
+    def state(self, key):
+        # "ready", "pending" while the series is still being fitted, or why
+        # it has no forecast: "too-short" or "failed"
+        key = tuple(key)
+        if self.ready and key in self.forecasts:
+            return "ready"
+        if key in self.failures:
+            return self.failures[key]
+        return "failed" if self.error is not None else "pending"
+
+    def get(self, key):
+        # The forecast frame for one series, or None while still pending
+        if not self.ready:
+            return None
+        result = self.forecasts.get(tuple(key))
+        return None if result is None else result["forecast"]
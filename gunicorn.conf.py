@@ -0,0 +1,67 @@
+# Gunicorn settings for wsgi.py. Values can be overridden on the command line
+# or with GUNICORN_CMD_ARGS, e.g. GUNICORN_CMD_ARGS="--workers 8".
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get("AVOCADO_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("AVOCADO_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("AVOCADO_THREADS", 2))
+
+# Load the data and forecasts once in the master and fork the workers from it
+preload_app = True
+
+# Each process records its own metrics; they are summed on /metrics from
+# per-process files in this directory (see metrics.MULTIPROCESS_DIR). Set
+# before the app is preloaded so metrics.py picks it up.
+os.environ.setdefault(
+    "AVOCADO_METRICS_DIR",
+    os.path.join(tempfile.gettempdir(), f"avocado-metrics-{os.getpid()}"),
+)
+
+
+def on_starting(server):
+    # Start from an empty directory. The master's own timings (loading the
+    # data, fitting the forecasts) count once, from their own file, rather
+    # than once per forked worker.
+    import metrics
+
+    shutil.rmtree(metrics.MULTIPROCESS_DIR, ignore_errors=True)
+    metrics.write_snapshot(name="master")
+
+
+def post_fork(server, worker):
+    import metrics
+
+    metrics.REGISTRY.reset()
+
+
+def post_worker_init(worker):
+    # Each worker writes its metrics for the other workers to serve. The
+    # drop directory is not watched here, so the workers keep sharing the
+    # master's data (see PREFORK in app.py); restart or upgrade the server
+    # (kill -USR2 <master pid>) to serve newly dropped rows.
+    import metrics
+
+    metrics.start_snapshots()
+
+
+def worker_exit(server, worker):
+    # The worker's last counts, for child_exit to keep
+    import metrics
+
+    metrics.write_snapshot()
+
+
+def child_exit(server, worker):
+    # In the master, once the worker is gone (also when it was killed before
+    # worker_exit ran): add its last snapshot to the running total of exited
+    # workers and remove its file
+    import metrics
+
+    metrics.retire_snapshots(worker.pid)
+
+
+def on_exit(server):
+    shutil.rmtree(os.environ["AVOCADO_METRICS_DIR"], ignore_errors=True)
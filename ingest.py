@@ -0,0 +1,62 @@
+import glob
+import logging
+import os
+import threading
+
+import pandas as pd
+
+from data_loader import BASE_DIR, parse_frame
+
+# New weekly rows are dropped here as CSV files with the avocado.csv columns
+DROP_DIR = os.environ.get("AVOCADO_DROP_DIR", os.path.join(BASE_DIR, "incoming"))
+
+
+def read_rows(path):
+    return parse_frame(pd.read_csv(path))
+
+
+class DropDirectoryWatcher:
+    # Polls a directory for new or changed CSV files and hands over their rows.
+    # Write files elsewhere and move them in so a half-written file is never read.
+    # Files are left in place, so a restart picks them up again on top of
+    # avocado.csv; rows that are seen twice replace each other.
+
+    def __init__(self, directory=DROP_DIR, interval=5.0):
+        self.directory = directory
+        self.interval = interval
+        self._seen = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def scan(self):
+        # Rows of every file that is new or changed since the last scan
+        frames = []
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.csv"))):
+            try:
+                stat = os.stat(path)
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if self._seen.get(path) == signature:
+                    continue
+                frames.append(read_rows(path))
+                self._seen[path] = signature
+            except Exception:
+                logging.getLogger(__name__).exception("Could not ingest %s", path)
+        return frames
+
+    def _loop(self, on_rows):
+        while not self._stop.wait(self.interval):
+            for rows in self.scan():
+                try:
+                    on_rows(rows)
+                except Exception:
+                    logging.getLogger(__name__).exception("Could not merge new rows")
+
+    def start(self, on_rows):
+        self._thread = threading.Thread(
+            target=self._loop, args=(on_rows,), name="drop-dir-watcher", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,383 @@
+import bisect
+import glob
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+
+# Upper bounds in seconds, from sub-millisecond callbacks to minute-long fits
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+TRACE = os.environ.get("AVOCADO_TRACE", "") not in ("", "0")
+trace_log = logging.getLogger("avocado.trace")
+
+# With several server processes each one records into its own registry. When
+# this directory is set (gunicorn.conf.py does) every process also writes its
+# registry to <pid>-<random>.pickle there, and /metrics serves the sum of the
+# files, whichever worker answers. The random part keeps a new process that
+# gets an old pid from overwriting the old one's counts. When a worker exits
+# its last counts are added to exited.pickle and its own file is removed, so
+# the counters never go back and the directory does not grow.
+MULTIPROCESS_DIR = os.environ.get("AVOCADO_METRICS_DIR")
+FLUSH_SECONDS = float(os.environ.get("AVOCADO_METRICS_FLUSH", 5))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    # Monotonic count per label combination
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def state(self):
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, state):
+        with self._lock:
+            for key, value in state.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram:
+    # Cumulative bucket counts, sum and count per label combination. An
+    # observation is a binary search and two additions under a lock.
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # One slot per bucket plus the +Inf overflow, then the sum
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[position] += 1
+            series[-1] += value
+
+    def state(self):
+        with self._lock:
+            return {key: list(series) for key, series in self._series.items()}
+
+    def merge(self, state):
+        # Series of the same buckets add up slot by slot
+        with self._lock:
+            for key, series in state.items():
+                current = self._series.setdefault(key, [0] * len(series[:-1]) + [0.0])
+                for position, value in enumerate(series):
+                    current[position] += value
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def totals(self):
+        # {label values: (count, sum)} of everything observed so far
+        with self._lock:
+            return {key: (sum(series[:-1]), series[-1]) for key, series in self._series.items()}
+
+    def samples(self):
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series[:-1]):
+                cumulative += count
+                le = f'le="{bound}"' if bound == "+Inf" else f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {repr(series[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.metrics.setdefault(name, Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.metrics.setdefault(
+            name, Histogram(name, documentation, labelnames, buckets)
+        )
+
+    def empty(self):
+        # A registry with the same metrics and nothing recorded
+        registry = Registry()
+        for metric in self.metrics.values():
+            if metric.kind == "histogram":
+                registry.histogram(
+                    metric.name, metric.documentation, metric.labelnames, metric.buckets
+                )
+            else:
+                registry.counter(metric.name, metric.documentation, metric.labelnames)
+        return registry
+
+    def state(self):
+        return {name: metric.state() for name, metric in self.metrics.items()}
+
+    def merge(self, state):
+        for name, metric_state in state.items():
+            if name in self.metrics:
+                self.metrics[name].merge(metric_state)
+
+    def reset(self):
+        for metric in self.metrics.values():
+            metric.reset()
+
+    def render(self):
+        # Prometheus text exposition format
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+PHASE_SECONDS = REGISTRY.histogram(
+    "avocado_phase_seconds",
+    "Time spent in each phase of a callback or a load step",
+    ["step", "phase"],
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "avocado_request_seconds",
+    "Time to handle an HTTP request, by route and Dash callback component",
+    ["route", "callback"],
+)
+REQUESTS = REGISTRY.counter(
+    "avocado_requests_total",
+    "HTTP requests handled, by route, Dash callback component and status",
+    ["route", "callback", "status"],
+)
+FORECAST_SERIES = REGISTRY.counter(
+    "avocado_forecast_series_total",
+    "Series forecast, by engine and outcome",
+    ["engine", "outcome"],
+)
+
+
+RETIRED_SNAPSHOT = "exited"
+_snapshot_name = (None, None)
+
+
+def snapshot_name():
+    # <pid>-<random> for this process, chosen again after a fork
+    global _snapshot_name
+    pid, name = _snapshot_name
+    if pid != os.getpid():
+        pid = os.getpid()
+        name = f"{pid}-{uuid.uuid4().hex[:12]}"
+        _snapshot_name = (pid, name)
+    return name
+
+
+def write_snapshot(directory=MULTIPROCESS_DIR, name=None, registry=REGISTRY):
+    # Write what this process has recorded to <snapshot_name()>.pickle (or
+    # <name>.pickle) in directory, replacing its previous snapshot
+    os.makedirs(directory, exist_ok=True)
+    fd, staging = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as handle:
+        pickle.dump(registry.state(), handle, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(staging, os.path.join(directory, f"{name or snapshot_name()}.pickle"))
+
+
+def _load(paths, registry):
+    # A registry holding the sum of the snapshots in paths
+    merged = registry.empty()
+    for path in paths:
+        try:
+            with open(path, "rb") as handle:
+                merged.merge(pickle.load(handle))
+        except FileNotFoundError:
+            pass
+        except (OSError, EOFError, pickle.UnpicklingError):
+            logging.getLogger(__name__).warning("Could not read the metrics snapshot %s", path)
+    return merged
+
+
+def collect(directory=MULTIPROCESS_DIR, registry=REGISTRY):
+    # A registry holding the sum of every process' snapshot in directory
+    return _load(sorted(glob.glob(os.path.join(directory, "*.pickle"))), registry)
+
+
+def retire_snapshots(pid, directory=MULTIPROCESS_DIR, registry=REGISTRY):
+    # Add the last snapshot of the exited process pid to exited.pickle and
+    # remove its own file. Only the process that reaps pid (gunicorn's
+    # master) calls this, so exited.pickle has a single writer.
+    paths = glob.glob(os.path.join(directory, f"{pid}-*.pickle"))
+    if not paths:
+        return
+    retired = os.path.join(directory, f"{RETIRED_SNAPSHOT}.pickle")
+    write_snapshot(directory, RETIRED_SNAPSHOT, _load([retired, *paths], registry))
+    for path in paths:
+        os.remove(path)
+
+
+def start_snapshots(directory=MULTIPROCESS_DIR, interval=FLUSH_SECONDS):
+    # Write this process' snapshot every interval seconds from a daemon
+    # thread, so /metrics served by another worker is at most that far behind
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                write_snapshot(directory)
+            except OSError:
+                logging.getLogger(__name__).exception("Could not write the metrics snapshot")
+
+    thread = threading.Thread(target=loop, name="metrics-snapshots", daemon=True)
+    thread.start()
+    return thread
+
+
+def render_metrics(directory=MULTIPROCESS_DIR):
+    # Everything recorded, by every process sharing directory when it is set
+    if directory is None:
+        return REGISTRY.render()
+    write_snapshot(directory)
+    return collect(directory).render()
+
+
+def observe_phase(step, phase_name, seconds):
+    PHASE_SECONDS.observe(seconds, step=step, phase=phase_name)
+    # Remember the phases of the current request for tracing and for
+    # splitting the callback time from Dash's own work
+    if has_request_context() and "metrics_phases" in g:
+        g.metrics_phases.append((step, phase_name, seconds))
+
+
+def phase_report(steps=None):
+    # Lines of "step phase count seconds" for the phases recorded so far, in
+    # the order they were first seen, e.g. for startup_profile.py
+    lines = []
+    for (step, phase_name), (count, seconds) in PHASE_SECONDS.totals().items():
+        if steps is None or step in steps:
+            lines.append(f"{step:<20} {phase_name:<22} {count:>5} {seconds:>9.3f}s")
+    return lines
+
+
+@contextmanager
+def phase(step, phase_name):
+    # with phase("price-chart", "filter"): ...
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_phase(step, phase_name, time.perf_counter() - started)
+
+
+def _callback_name():
+    # The component a Dash callback request updates, e.g. "price-chart" for
+    # "price-chart.figure" or "..forecast-chart.figure...forecast-table.children.."
+    if request.path.endswith("/_dash-update-component"):
+        body = request.get_json(silent=True) or {}
+        return str(body.get("output", "")).lstrip(".").split(".")[0]
+    return ""
+
+
+def enable_metrics(server, trace=TRACE):
+    # Time every request, serve everything recorded on /metrics, and with
+    # trace (or AVOCADO_TRACE=1) log one line per request with its phases.
+    # Register this before other after_request hooks (e.g. compression) so
+    # their work is included in the request time.
+    if trace and not trace_log.handlers:
+        trace_log.addHandler(logging.StreamHandler())
+        trace_log.setLevel(logging.INFO)
+
+    @server.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        g.metrics_phases = []
+
+    @server.after_request
+    def record_request(response):
+        if "metrics_started" not in g:
+            return response
+        elapsed = time.perf_counter() - g.metrics_started
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        callback = _callback_name()
+        REQUEST_SECONDS.observe(elapsed, route=route, callback=callback)
+        REQUESTS.inc(route=route, callback=callback, status=response.status_code)
+        if callback:
+            # What the callback phases do not account for is Dash decoding the
+            # inputs and serializing the outputs to JSON
+            measured = sum(seconds for _, _, seconds in g.metrics_phases)
+            PHASE_SECONDS.observe(max(elapsed - measured, 0.0), step=callback, phase="serialize")
+        if trace:
+            phases = " ".join(
+                f"{step}.{name}={seconds * 1000:.2f}ms"
+                for step, name, seconds in g.metrics_phases
+            )
+            trace_log.info(
+                "%s %s %s %s %.2fms %s",
+                request.method,
+                request.path,
+                callback or "-",
+                response.status_code,
+                elapsed * 1000,
+                phases,
+            )
+        return response
+
+    @server.route("/metrics")
+    def metrics():
+        return Response(render_metrics(), content_type=CONTENT_TYPE)
+
+    return server
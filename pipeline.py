@@ -0,0 +1,210 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from aggregation import CUBE_KEYS, CUBE_MEASURES, build_cube
+from data_loader import parse_frame, source_path
+from stats import StreamingStats
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# Numeric columns averaged by resample('W').mean() in avocado.py
+WEEKLY_COLUMNS = [
+    "AveragePrice",
+    "Total Volume",
+    "4046",
+    "4225",
+    "4770",
+    "Total Bags",
+    "Small Bags",
+    "Large Bags",
+    "XLarge Bags",
+    "year",
+]
+
+# AveragePrice histogram resolution, one bucket per cent
+PRICE_BUCKET = 0.01
+
+
+def source_files(source=None):
+    # A single CSV (or zipped CSV), a directory of partitioned CSV files or a glob
+    source = source or source_path()
+    if os.path.isdir(source):
+        return sorted(glob.glob(os.path.join(source, "*.csv*")))
+    if glob.has_magic(source):
+        return sorted(glob.glob(source))
+    return [source]
+
+
+def iter_chunks(source=None, chunksize=DEFAULT_CHUNKSIZE, exclude_regions=("TotalUS",)):
+    # Cleaned chunks of at most chunksize rows, with the same steps as avocado.py:
+    # drop 'Unnamed: 0', parse 'Date' and leave out the TotalUS aggregate rows
+    for path in source_files(source):
+        for raw in pd.read_csv(path, chunksize=chunksize):
+            chunk = parse_frame(raw)
+            if exclude_regions:
+                chunk = chunk[~chunk["region"].isin(exclude_regions)]
+            yield chunk
+
+
+def _week_ending(dates):
+    # Label of the resample('W') bin, i.e. the Sunday that closes the week
+    days = np.asarray(dates, dtype="datetime64[ns]").astype("datetime64[D]")
+    weekday = (days.astype(np.int64) + 3) % 7
+    return (days + (6 - weekday)).astype("datetime64[ns]")
+
+
+def histogram_quantile(histogram, q):
+    # The q quantile of the values a (value -> count) histogram stands for,
+    # interpolated between the closest ranks as pandas and numpy do
+    ranks = np.cumsum(histogram.to_numpy())
+    position = q * (ranks[-1] - 1)
+    lower = np.floor(position)
+    values = histogram.index.to_numpy(dtype=np.float64)
+    low = values[np.searchsorted(ranks, lower, side="right")]
+    high = values[np.searchsorted(ranks, min(lower + 1, ranks[-1] - 1), side="right")]
+    return low + (high - low) * (position - lower)
+
+
+def histogram_bin_edges(histogram):
+    # np.histogram_bin_edges(values, "auto") of the values the histogram
+    # stands for (numpy does not estimate bins for weighted data): the
+    # smaller of the Freedman-Diaconis and Sturges bin widths
+    count = histogram.sum()
+    first, last = float(histogram.index.min()), float(histogram.index.max())
+    sturges = (last - first) / (np.log2(count) + 1.0)
+    iqr = histogram_quantile(histogram, 0.75) - histogram_quantile(histogram, 0.25)
+    freedman_diaconis = 2.0 * iqr * count ** (-1.0 / 3.0)
+    width = min(freedman_diaconis, sturges) if freedman_diaconis else sturges
+    bins = int(np.ceil((last - first) / width)) if width else 1
+    return np.linspace(first, last, bins + 1)
+
+
+def histogram_kde_kws(histogram):
+    # Keyword arguments for seaborn's KDE so that weighting it by the
+    # histogram's counts draws the KDE of the values themselves. scipy's
+    # weighted KDE takes the effective sample size and the weighted
+    # covariance, both of which differ from the unweighted ones, hence
+    # bw_adjust; seaborn lays out its grid without the weights, hence clip.
+    values = histogram.index.to_numpy(dtype=np.float64)
+    counts = histogram.to_numpy(dtype=np.float64)
+    count, squares = counts.sum(), (counts**2).sum()
+    effective = count**2 / squares
+    bw_adjust = (effective / count) ** 0.2 * np.sqrt((count - squares / count) / (count - 1))
+    mean = (values * counts).sum() / count
+    variance = (counts * (values - mean) ** 2).sum() / (count - 1)
+    # Scott's bandwidth and seaborn's default cut of 3 bandwidths
+    bandwidth = np.sqrt(variance) * count ** (-0.2)
+    return {"bw_adjust": bw_adjust, "clip": (values[0] - 3 * bandwidth, values[-1] + 3 * bandwidth)}
+
+
+class Summary:
+    # Mergeable partial aggregates of the avocado data: weekly sums and counts,
+    # the (year, month, region, type) cube, overall moments, missing values
+    # and an AveragePrice histogram. Chunks can be summarized independently
+    # (or in different processes) and merged, so peak memory is one chunk.
+    # For exact Total Volume quantiles its values are kept as well, 8 bytes a
+    # row; with exact_quantiles=False only a 1% QuantileSketch is.
+
+    def __init__(self, exact_quantiles=True):
+        self.weekly_sums = None
+        self.weekly_counts = None
+        self.cubes = []
+        self.totals = StreamingStats(["AveragePrice", "Total Volume"])
+        self.missing = None
+        self.price_counts = {}
+        self.volumes = [] if exact_quantiles else None
+        self.rows = 0
+
+    def update(self, chunk):
+        if chunk.empty:
+            return self
+        labels = pd.Index(_week_ending(chunk["Date"]), name="Date")
+        grouped = chunk[WEEKLY_COLUMNS].groupby(labels)
+        self._add_weekly(grouped.sum(), grouped.count())
+        self.cubes = [self._merged_cube(self.cubes + [build_cube(chunk)])]
+        self.totals.update(chunk)
+        self._add_missing(chunk.isnull().sum())
+        buckets, counts = np.unique(
+            np.round(chunk["AveragePrice"].to_numpy(dtype=np.float64) / PRICE_BUCKET).astype(np.int64),
+            return_counts=True,
+        )
+        for bucket, count in zip(buckets.tolist(), counts.tolist()):
+            self.price_counts[bucket] = self.price_counts.get(bucket, 0) + count
+        if self.volumes is not None:
+            self.volumes.append(chunk["Total Volume"].to_numpy(dtype=np.float64))
+        self.rows += len(chunk)
+        return self
+
+    def _add_weekly(self, sums, counts):
+        if self.weekly_sums is None:
+            self.weekly_sums, self.weekly_counts = sums, counts
+        else:
+            self.weekly_sums = self.weekly_sums.add(sums, fill_value=0)
+            self.weekly_counts = self.weekly_counts.add(counts, fill_value=0)
+
+    def _add_missing(self, missing):
+        self.missing = missing if self.missing is None else self.missing.add(missing, fill_value=0)
+
+    @staticmethod
+    def _merged_cube(cubes):
+        cube = pd.concat(cubes, ignore_index=True)
+        return cube.groupby(CUBE_KEYS, sort=True)[[*CUBE_MEASURES, "rows"]].sum().reset_index()
+
+    def merge(self, other):
+        if other.weekly_sums is not None:
+            self._add_weekly(other.weekly_sums, other.weekly_counts)
+        if other.cubes:
+            self.cubes = [self._merged_cube(self.cubes + other.cubes)]
+        self.totals.merge(other.totals)
+        if other.missing is not None:
+            self._add_missing(other.missing)
+        for bucket, count in other.price_counts.items():
+            self.price_counts[bucket] = self.price_counts.get(bucket, 0) + count
+        # Exact only if both sides kept their values
+        if self.volumes is not None and other.volumes is not None:
+            self.volumes.extend(other.volumes)
+        else:
+            self.volumes = None
+        self.rows += other.rows
+        return self
+
+    @property
+    def cube(self):
+        return self.cubes[0] if self.cubes else None
+
+    def weekly(self):
+        # Same frame as df.set_index('Date').resample('W').mean()
+        means = self.weekly_sums / self.weekly_counts.where(self.weekly_counts > 0)
+        weeks = pd.date_range(means.index.min(), means.index.max(), freq="W", name="Date")
+        return means.reindex(weeks)[WEEKLY_COLUMNS]
+
+    def price_histogram(self):
+        # AveragePrice values and how often they occur, for weighted plotting
+        buckets = np.array(sorted(self.price_counts))
+        counts = np.array([self.price_counts[bucket] for bucket in buckets])
+        return pd.Series(counts, index=np.round(buckets * PRICE_BUCKET, 2), name="count")
+
+    def describe(self):
+        # stats.describe() of AveragePrice and Total Volume. The AveragePrice
+        # quantiles are exact (from the one-cent histogram), and so are the
+        # Total Volume ones unless only the QuantileSketch was kept.
+        table = self.totals.result()
+        quantiles = ["25%", "Median", "75%", "Interquartile Range"]
+        histogram = self.price_histogram()
+        q1, median, q3 = (histogram_quantile(histogram, q) for q in (0.25, 0.5, 0.75))
+        table.loc["AveragePrice", quantiles] = [q1, median, q3, q3 - q1]
+        if self.volumes:
+            volumes = np.concatenate(self.volumes)
+            q1, median, q3 = np.quantile(volumes[~np.isnan(volumes)], [0.25, 0.5, 0.75])
+            table.loc["Total Volume", quantiles] = [q1, median, q3, q3 - q1]
+        return table
+
+
+def summarize(chunks, exact_quantiles=True):
+    summary = Summary(exact_quantiles)
+    for chunk in chunks:
+        summary.update(chunk)
+    return summary
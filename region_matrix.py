@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+MATRIX_MEASURES = ["AveragePrice", "Total Volume"]
+TOTAL_REGION = "TotalUS"
+
+
+class RegionMatrix:
+    # Every measure as a dense date x region array per type, with NaN where a
+    # region has no row for a week. Comparing any set of regions is a column
+    # gather, and a date range is two binary searches on the shared dates.
+
+    def __init__(self, index, measures=MATRIX_MEASURES):
+        data = index.data
+        self.dates, date_codes = np.unique(index.dates, return_inverse=True)
+        self.regions = pd.Index(sorted(data["region"].astype(str).unique()))
+        self.types = sorted(data["type"].astype(str).unique())
+        region_codes = self.regions.get_indexer(data["region"].astype(str))
+        type_codes = pd.Index(self.types).get_indexer(data["type"].astype(str))
+
+        shape = (len(self.dates), len(self.regions))
+        self.values = {}
+        for position, avocado_type in enumerate(self.types):
+            rows = type_codes == position
+            for measure in measures:
+                column = index.arrays[measure]
+                matrix = np.full(shape, np.nan, dtype=np.result_type(column.dtype, np.float32))
+                matrix[date_codes[rows], region_codes[rows]] = column[rows]
+                self.values[avocado_type, measure] = matrix
+
+    def bounds(self, start_date=None, end_date=None):
+        # Rows [lo, hi) between the two dates (inclusive)
+        lo, hi = 0, len(self.dates)
+        if start_date is not None:
+            start = pd.Timestamp(start_date).to_datetime64()
+            lo = int(np.searchsorted(self.dates, start, side="left"))
+        if end_date is not None:
+            end = pd.Timestamp(end_date).to_datetime64()
+            hi = int(np.searchsorted(self.dates, end, side="right"))
+        return lo, max(lo, hi)
+
+    def columns(self, avocado_type, regions, measure, start_date=None, end_date=None):
+        # Dates and a (dates, regions) array with one column per selected
+        # region, in the order given. Unknown regions are all NaN.
+        lo, hi = self.bounds(start_date, end_date)
+        matrix = self.values[avocado_type, measure]
+        positions = self.regions.get_indexer(regions)
+        gathered = matrix[lo:hi].take(np.maximum(positions, 0), axis=1)
+        gathered[:, positions < 0] = np.nan
+        return self.dates[lo:hi], gathered
+
+    def share(
+        self,
+        avocado_type,
+        regions,
+        measure="Total Volume",
+        total=TOTAL_REGION,
+        start_date=None,
+        end_date=None,
+    ):
+        # Each region's fraction of the total region's measure, week by week
+        dates, values = self.columns(
+            avocado_type, [*regions, total], measure, start_date, end_date
+        )
+        values = values.astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shares = values[:, :-1] / values[:, -1:]
+        shares[~np.isfinite(shares)] = np.nan
+        return dates, shares
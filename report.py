@@ -0,0 +1,223 @@
+# Headless rendering of the avocado.py report figures into Output/, with the
+# drawing functions avocado.py uses (report_figures.py). The inputs of every
+# figure are prepared here and hashed together with the source of the
+# function that draws it; figures whose hashes match the last run are skipped
+# and the rest are drawn on the Agg backend in parallel worker processes.
+#
+#     python report.py
+#     python report.py --only forecast --force
+import argparse
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from data_loader import BASE_DIR, CACHE_DIR
+from report_figures import draw_decomposition, draw_forecast, draw_revenue, draw_sales, figure_inputs
+
+OUTPUT_DIR = os.path.join(BASE_DIR, "Output")
+MANIFEST_PATH = os.path.join(CACHE_DIR, "report", "manifest.json")
+# Bump to redraw every figure, e.g. after changing something all of them share
+REPORT_FORMAT = 1
+
+
+# The file each figure is written to and the function that draws it
+FIGURES = {
+    "sales": ("output1.png", draw_sales),
+    "revenue": ("output2.png", draw_revenue),
+    "decomposition": ("output3.png", draw_decomposition),
+    "forecast": ("output4.png", draw_forecast),
+}
+# Modules whose code decides what a figure shows besides its inputs, e.g.
+# the ARIMA order search and fit that draw_forecast runs
+FIGURE_MODULES = {
+    "forecast": ["arima_search"],
+}
+
+
+def prepare_inputs(source=None, fourier_terms=None, time_budget=300):
+    # Everything each figure is drawn from, computed once in this process
+    # from the data streamed in chunks, as avocado.py does. No figure shows a
+    # Total Volume quantile, so its values are not kept.
+    from pipeline import iter_chunks, summarize
+
+    summary = summarize(iter_chunks(source), exact_quantiles=False)
+    return figure_inputs(summary, fourier_terms, time_budget)
+
+
+def data_hash(inputs):
+    return hashlib.sha1(pickle.dumps(inputs, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+
+def code_version(name):
+    # Hash of what decides how a figure looks besides its data: the drawing
+    # function and the helpers of its module it calls, figure_inputs that
+    # prepares its data, the modules of FIGURE_MODULES, the report format and
+    # the plotting library versions
+    import matplotlib
+    import seaborn
+
+    _, draw = FIGURES[name]
+    digest = hashlib.sha1(inspect.getsource(draw).encode())
+    for helper in draw.__code__.co_names:
+        if inspect.isfunction(draw.__globals__.get(helper)):
+            digest.update(inspect.getsource(draw.__globals__[helper]).encode())
+    digest.update(inspect.getsource(figure_inputs).encode())
+    for module in FIGURE_MODULES.get(name, []):
+        digest.update(inspect.getsource(importlib.import_module(module)).encode())
+    digest.update(f"{REPORT_FORMAT}:{matplotlib.__version__}:{seaborn.__version__}".encode())
+    return digest.hexdigest()
+
+
+def _read_manifest():
+    try:
+        with open(MANIFEST_PATH) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(manifest):
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    fd, staging = tempfile.mkstemp(dir=os.path.dirname(MANIFEST_PATH), prefix=".tmp-")
+    with os.fdopen(fd, "w") as handle:
+        json.dump(manifest, handle, indent=2)
+    os.replace(staging, MANIFEST_PATH)
+
+
+def _use_agg():
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+def render(name, inputs, path):
+    # Draw one figure and write it to path, replacing the old file only once
+    # the new one is complete. Returns the seconds it took.
+    started = time.perf_counter()
+    _use_agg()
+    import matplotlib.pyplot as plt
+
+    _, draw = FIGURES[name]
+    try:
+        draw(inputs)
+        staging = os.path.join(os.path.dirname(path), f".tmp-{os.getpid()}-{os.path.basename(path)}")
+        plt.savefig(staging, bbox_inches="tight")
+        os.replace(staging, path)
+    finally:
+        plt.close("all")
+    return time.perf_counter() - started
+
+
+def stale_figures(inputs, output_dir, names, force=False):
+    # {name: (path, data hash, code version)} of the figures to draw: those
+    # missing from output_dir or whose data or drawing code changed
+    manifest = _read_manifest()
+    stale = {}
+    for name in names:
+        filename, _ = FIGURES[name]
+        path = os.path.abspath(os.path.join(output_dir, filename))
+        hashes = {"data": data_hash(inputs[name]), "code": code_version(name)}
+        if force or not os.path.exists(path) or manifest.get(path) != hashes:
+            stale[name] = (path, hashes)
+    return stale
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render the avocado.py report figures headless, skipping the unchanged ones"
+    )
+    parser.add_argument("--source", help="CSV file to report on (defaults to the bundled data)")
+    parser.add_argument("--output", default=OUTPUT_DIR, help="directory to write the figures to")
+    parser.add_argument("--only", nargs="+", choices=list(FIGURES), help="render only these figures")
+    parser.add_argument("--force", action="store_true", help="redraw figures even if unchanged")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (defaults to the CPU count)")
+    parser.add_argument(
+        "--arima-budget",
+        type=float,
+        default=float(os.environ.get("AVOCADO_ARIMA_BUDGET", 300)),
+        help="seconds the ARIMA order search of the forecast may take",
+    )
+    parser.add_argument(
+        "--fourier",
+        type=int,
+        default=int(os.environ.get("AVOCADO_ARIMA_FOURIER", 0)),
+        help="model the forecast's yearly season with this many Fourier terms",
+    )
+    return parser.parse_args(argv)
+
+
+def run(source=None, output_dir=OUTPUT_DIR, names=None, force=False, processes=None, time_budget=300, fourier_terms=None):
+    # Draw the stale figures and return {name: seconds, or None if skipped}.
+    # Figures that fail are left out of the manifest so the next run retries.
+    from forecasting import pool_context
+
+    names = names or list(FIGURES)
+    inputs = prepare_inputs(source, fourier_terms or None, time_budget)
+    stale = stale_figures(inputs, output_dir, names, force)
+    os.makedirs(output_dir, exist_ok=True)
+    timings = {name: None for name in names}
+    failed = []
+
+    def finish(name, outcome):
+        path, hashes = stale[name]
+        try:
+            seconds = outcome()
+        except Exception as error:
+            print(f"[{name}] failed: {error!r}", file=sys.stderr, flush=True)
+            failed.append(name)
+            return
+        manifest = _read_manifest()
+        manifest[path] = hashes
+        _write_manifest(manifest)
+        timings[name] = seconds
+        print(f"[{name}] {os.path.basename(path)} drawn in {seconds:.1f}s", flush=True)
+
+    processes = min(processes or os.cpu_count() or 1, len(stale)) if stale else 0
+    if processes == 1:
+        for name, (path, _) in stale.items():
+            finish(name, lambda: render(name, inputs[name], path))
+    elif processes > 1:
+        with ProcessPoolExecutor(processes, mp_context=pool_context(), initializer=_use_agg) as executor:
+            futures = {
+                executor.submit(render, name, inputs[name], path): name
+                for name, (path, _) in stale.items()
+            }
+            for future in as_completed(futures):
+                finish(futures[future], future.result)
+    for name in names:
+        if name not in stale:
+            print(f"[{name}] unchanged, skipped", flush=True)
+    if failed:
+        raise RuntimeError(f"Could not draw: {', '.join(failed)}")
+    return timings
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    started = time.perf_counter()
+    try:
+        run(
+            args.source,
+            args.output,
+            args.only,
+            args.force,
+            args.processes,
+            args.arima_budget,
+            args.fourier,
+        )
+    except RuntimeError as error:
+        print(error, file=sys.stderr)
+        return 1
+    print(f"report done in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+# The figures of the avocado.py report, drawn from the aggregates of a
+# streamed pipeline.Summary. avocado.py draws them interactively and shows
+# them; report.py draws the same functions on the Agg backend into Output/.
+# Every draw_* function takes its part of figure_inputs() and draws on a new
+# current figure.
+PERIOD = 52
+FORECAST_WEEKS = 52
+
+
+def figure_inputs(summary, fourier_terms=None, time_budget=300):
+    # Everything each figure is drawn from, by figure name. These are small
+    # (roll-ups of the cube, the one-cent price histogram and the weekly
+    # series), so report.py can hash them and send them to its workers.
+    import calendar
+
+    from aggregation import rollup
+    from decomposition import decompose
+
+    cube = summary.cube
+    by_year = rollup(cube, "year") / 1000000
+    by_month = rollup(cube, "month") / 1000000
+    by_month.index = by_month.index.map(lambda month: calendar.month_name[month])
+    by_region = rollup(cube, "region") / 1000000
+    by_type = rollup(cube, "type") / 1000000
+
+    weekly = summary.weekly()
+    components = decompose(weekly[["Total Volume"]].to_numpy(), PERIOD)
+    return {
+        "sales": {
+            "by_year": by_year["Total Volume"],
+            "by_month": by_month["Total Volume"],
+            "top_regions": by_region["Total Volume"].nlargest(10),
+            "price_histogram": summary.price_histogram(),
+            "mean_price": summary.describe().loc["AveragePrice", "Mean"],
+        },
+        "revenue": {
+            "by_year": by_year["EarnedRevenue"],
+            "by_month": by_month["EarnedRevenue"],
+            "top_regions": by_region["EarnedRevenue"].nlargest(10),
+            "by_type": by_type["EarnedRevenue"],
+        },
+        "decomposition": {
+            "dates": weekly.index,
+            **{name: components[name][:, 0] for name in ["observed", "trend", "seasonal"]},
+        },
+        "forecast": {
+            "weekly": weekly,
+            "fourier_terms": fourier_terms,
+            "time_budget": time_budget,
+            "weeks": FORECAST_WEEKS,
+        },
+    }
+
+
+def _millions_formatter(prefix=""):
+    import matplotlib.ticker as ticker
+
+    return ticker.StrMethodFormatter(prefix + "{x:,.0f}M")
+
+
+def draw_sales(inputs):
+    # Sales by year, month and top regions, and the price distribution
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    from pipeline import histogram_bin_edges, histogram_kde_kws, histogram_quantile
+
+    plt.figure(figsize=(16, 12))
+
+    plt.subplot(2, 2, 1)
+    inputs["by_year"].plot(kind="bar", color="skyblue")
+    plt.title("Total Sales by Year", fontsize=16)
+    plt.xlabel("Year", fontsize=12)
+    plt.ylabel("Total Sales (Millions of Units)", fontsize=12)
+    plt.xticks(rotation=45)
+    plt.grid(axis="y", linestyle="--")
+    plt.gca().yaxis.set_major_formatter(_millions_formatter())
+
+    plt.subplot(2, 2, 2)
+    inputs["by_month"].plot(kind="bar", color="lightgreen")
+    plt.title("Total Sales by Month", fontsize=16)
+    plt.xlabel("Month", fontsize=12)
+    plt.ylabel("Total Sales (Millions of Units)", fontsize=12)
+    plt.xticks(rotation=45)
+    plt.grid(axis="y", linestyle="--")
+    plt.gca().yaxis.set_major_formatter(_millions_formatter())
+
+    plt.subplot(2, 2, 3)
+    top_regions = inputs["top_regions"]
+    sns.barplot(x=top_regions.values, y=top_regions.index, palette="viridis")
+    plt.title("Total Sales by Top 10 Regions", fontsize=16)
+    plt.xlabel("Total Sales (Millions of Units)", fontsize=12)
+    plt.ylabel("Region", fontsize=12)
+    plt.grid(axis="x", linestyle="--")
+    plt.gca().xaxis.set_major_formatter(_millions_formatter())
+    percentages = top_regions / top_regions.sum() * 100
+    for position, (volume, percentage) in enumerate(zip(top_regions.values, percentages.values)):
+        plt.text(volume + 20, position, f"{percentage:.2f}%", ha="left", va="center")
+
+    # The AveragePrice histogram drawn with the bins and KDE bandwidth the
+    # prices themselves would get (see pipeline.histogram_kde_kws)
+    plt.subplot(2, 2, 4)
+    histogram = inputs["price_histogram"]
+    kde_kws = histogram_kde_kws(histogram)
+    sns.histplot(
+        x=histogram.index,
+        weights=histogram.values,
+        bins=histogram_bin_edges(histogram),
+        kde=True,
+        kde_kws=kde_kws,
+        color="orange",
+        element="step",
+    )
+    sns.kdeplot(x=histogram.index, weights=histogram.values, color="blue", **kde_kws)
+    mean_price, median_price = inputs["mean_price"], histogram_quantile(histogram, 0.5)
+    axes = plt.gca()
+    plt.text(1.07, 0.8, f"Mean: {mean_price:.2f}", fontsize=12, color="red", transform=axes.transAxes)
+    plt.text(1.07, 0.75, f"Median: {median_price:.2f}", fontsize=12, color="green", transform=axes.transAxes)
+    plt.axvline(mean_price, color="red", linestyle="--", linewidth=1, label="Mean")
+    plt.axvline(median_price, color="green", linestyle="--", linewidth=1, label="Median")
+    plt.title("Average Price Distribution", fontsize=16)
+    plt.xlabel("Average Price", fontsize=12)
+    plt.ylabel("Frequency", fontsize=12)
+    plt.grid(axis="y", linestyle="--")
+    plt.legend()
+
+    plt.tight_layout()
+
+
+def draw_revenue(inputs):
+    # Earned revenue by year, month, top regions and type
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.figure(figsize=(16, 12))
+
+    plt.subplot(2, 2, 1)
+    inputs["by_year"].plot(kind="bar", color="skyblue")
+    plt.title("Earned Revenue by Year", fontsize=16)
+    plt.xlabel("Year", fontsize=12)
+    plt.ylabel("Earned Revenue (Millions of Dollars)", fontsize=12)
+    plt.xticks(rotation=45)
+    plt.grid(axis="y", linestyle="--")
+    plt.gca().yaxis.set_major_formatter(_millions_formatter("$"))
+
+    plt.subplot(2, 2, 2)
+    inputs["by_month"].plot(kind="bar", color="lightgreen")
+    plt.title("Earned Revenue by Month", fontsize=16)
+    plt.xlabel("Month", fontsize=12)
+    plt.ylabel("Earned Revenue (Millions of Dollars)", fontsize=12)
+    plt.xticks(rotation=45)
+    plt.grid(axis="y", linestyle="--")
+    plt.gca().yaxis.set_major_formatter(_millions_formatter("$"))
+
+    plt.subplot(2, 2, 3)
+    top_regions = inputs["top_regions"]
+    sns.barplot(x=top_regions.values, y=top_regions.index, palette="viridis")
+    plt.title("Top 10 Revenue-Generating Regions", fontsize=16)
+    plt.xlabel("Earned Revenue (Millions of Dollars)", fontsize=12)
+    plt.ylabel("Region", fontsize=12)
+    plt.grid(axis="x", linestyle="--")
+    plt.gca().xaxis.set_major_formatter(_millions_formatter("$"))
+    percentages = top_regions / top_regions.sum() * 100
+    for position, (revenue, percentage) in enumerate(zip(top_regions.values, percentages.values)):
+        plt.text(revenue + 0.5, position, f"{percentage:.1f}%", fontsize=12, va="center")
+
+    plt.subplot(2, 2, 4)
+    by_type = inputs["by_type"]
+    plt.pie(
+        by_type,
+        labels=by_type.index,
+        colors=["orange", "green"],
+        autopct="%1.1f%%",
+        startangle=90,
+        textprops={"fontsize": 12},
+    )
+    plt.title("Earned Revenue by Type", fontsize=16)
+    axes = plt.gca()
+    axes.add_artist(plt.Circle(xy=(0, 0), radius=0.5, facecolor="white"))
+    plt.grid(axis="x", linestyle="--")
+    plt.text(1.05, 0.9, "Total Revenue", fontsize=12, transform=axes.transAxes)
+    plt.text(1.05, 0.8, f"${round(by_type.sum(), 2)}M", fontsize=12, transform=axes.transAxes)
+    plt.legend(loc="lower center", bbox_to_anchor=(0.5, -0.2), ncol=2, fontsize=12)
+
+    plt.tight_layout()
+
+
+def draw_decomposition(inputs):
+    # Weekly total volume with its trend and seasonal components
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker as ticker
+
+    panels = [
+        ("observed", "blue", "Original Data", "Total Volume (Thousands of Units)"),
+        ("trend", "green", "Weekly Trend Component", "Trend (Thousands of Units)"),
+        ("seasonal", "red", "Weekly Seasonal Component", "Seasonality (Thousands of Units)"),
+    ]
+    plt.figure(figsize=(12, 8))
+    for position, (component, color, title, label) in enumerate(panels, start=1):
+        plt.subplot(3, 1, position)
+        plt.plot(inputs["dates"], inputs[component] / 1000, color=color)
+        plt.title(title, fontsize=16)
+        plt.ylabel(label, fontsize=12)
+        plt.xticks(rotation=45)
+        plt.yticks(fontsize=10)
+        plt.grid(axis="both", linestyle="--")
+        plt.gca().yaxis.set_major_formatter(ticker.StrMethodFormatter("{x:,.0f}"))
+
+    plt.tight_layout()
+
+
+def draw_forecast(inputs):
+    # A year of weekly total volume forecast with the best ARIMA found. The
+    # order search is cached per series in arima_search.py, so an unchanged
+    # series only pays for the final fit.
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    from arima_search import fit_best_arima
+
+    weekly = inputs["weekly"]
+    total_volume = weekly["Total Volume"]
+    exogenous_variables = weekly.drop(["Total Volume", "year"], axis=1)
+    model = fit_best_arima(
+        total_volume,
+        X=exogenous_variables,
+        name="total_volume",
+        m=PERIOD,
+        fourier_terms=inputs["fourier_terms"],
+        time_budget=inputs["time_budget"],
+    )
+    steps = inputs["weeks"]
+    forecast, conf_int = model.predict(
+        n_periods=steps, X=exogenous_variables[-steps:], return_conf_int=True
+    )
+    future_dates = pd.date_range(start=total_volume.index[-1], periods=steps + 1, freq="W")[1:]
+
+    plt.figure(figsize=(12, 6))
+    plt.plot(total_volume.index, total_volume, label="Historical")
+    plt.plot(future_dates, forecast, label="Forecast")
+    plt.fill_between(future_dates, conf_int[:, 0], conf_int[:, 1], color="gray", alpha=0.3)
+    plt.title("Total Volume Forecast")
+    plt.xlabel("Date")
+    plt.ylabel("Total Volume")
+    plt.legend()
@@ -0,0 +1,165 @@
+import functools
+import glob
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import time
+
+from data_loader import BASE_DIR, CACHE_DIR
+from metrics import REGISTRY
+
+RESULT_CACHE_DIR = os.environ.get("AVOCADO_RESULT_CACHE_DIR", os.path.join(CACHE_DIR, "results"))
+RESULT_CACHE_TTL = float(os.environ.get("AVOCADO_RESULT_CACHE_TTL", 3600))
+RESULT_CACHE_MB = float(os.environ.get("AVOCADO_RESULT_CACHE_MB", 256))
+
+RESULT_CACHE = REGISTRY.counter(
+    "avocado_result_cache_total",
+    "Result cache lookups, by cached function and outcome (hit or miss)",
+    ["cache", "outcome"],
+)
+RESULT_CACHE_EVICTIONS = REGISTRY.counter(
+    "avocado_result_cache_evictions_total",
+    "Result cache entries removed because they expired or the cache was full",
+)
+
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    # Hash of the app's modules, so results built by other code (an older
+    # release, or workers of a deploy still shutting down) never match
+    digest = hashlib.sha1()
+    for path in sorted(glob.glob(os.path.join(BASE_DIR, "*.py"))):
+        with open(path, "rb") as handle:
+            digest.update(handle.read())
+    return digest.hexdigest()
+
+
+def cache_key(name, args):
+    # Callback inputs are JSON values (strings, numbers, None), so their JSON
+    # form identifies them. Data and forecast versions are passed as arguments.
+    payload = json.dumps([code_version(), name, args], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+class DiskCache:
+    # Pickled results in a directory shared by every server worker on the host.
+    # Entries older than ttl seconds are misses, and once the directory grows
+    # past max_bytes the least recently used entries are removed. Writes are
+    # atomic renames, so a reader never sees a partial entry.
+
+    def __init__(
+        self,
+        directory=RESULT_CACHE_DIR,
+        ttl=RESULT_CACHE_TTL,
+        max_bytes=RESULT_CACHE_MB * 2**20,
+        evict_every=100,
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self._writes = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        # (True, value) on a hit, (False, None) on a miss
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+            if time.time() - stat.st_mtime > self.ttl:
+                return False, None
+            with open(path, "rb") as handle:
+                value = pickle.load(handle)
+            # Access time drives the LRU eviction; the write time stays for the TTL
+            os.utime(path, (time.time(), stat.st_mtime))
+            return True, value
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return False, None
+
+    def set(self, key, value):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, staging = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            with os.fdopen(fd, "wb") as handle:
+                pickle.dump(value, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(staging, path)
+        except OSError:
+            logging.getLogger(__name__).exception("Could not cache a result")
+            return
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            RESULT_CACHE_EVICTIONS.inc(self.evict())
+
+    def entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    yield path, os.stat(path)
+                except OSError:
+                    pass
+
+    def evict(self):
+        # Remove expired entries, then the least recently used ones until the
+        # cache fits in max_bytes. Returns how many entries were removed.
+        now = time.time()
+        removed = 0
+        alive = []
+        for path, stat in self.entries():
+            if now - stat.st_mtime > self.ttl:
+                removed += _remove(path)
+            else:
+                alive.append((stat.st_atime, stat.st_size, path))
+        size = sum(entry[1] for entry in alive)
+        for _, entry_size, path in sorted(alive):
+            if size <= self.max_bytes:
+                break
+            removed += _remove(path)
+            size -= entry_size
+        return removed
+
+    def clear(self):
+        for path, _ in self.entries():
+            _remove(path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return 1
+    except OSError:
+        # Another worker removed it first
+        return 0
+
+
+def cached(cache, name=None):
+    # Memoize a function of JSON-like arguments in cache. Include every
+    # version the result depends on in the arguments, so new data or new
+    # forecasts give new keys instead of stale hits.
+    def decorator(function):
+        cache_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args):
+            if cache is None:
+                return function(*args)
+            key = cache_key(cache_name, args)
+            hit, value = cache.get(key)
+            RESULT_CACHE.inc(cache=cache_name, outcome="hit" if hit else "miss")
+            if hit:
+                return value
+            value = function(*args)
+            cache.set(key, value)
+            return value
+
+        return wrapper
+
+    return decorator
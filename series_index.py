@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+
+def _to_datetime64(value):
+    return pd.Timestamp(value).to_datetime64().astype("datetime64[ns]")
+
+
+class SeriesIndex:
+    # Date-sorted, contiguous blocks of rows for every (region, type) pair.
+    # Looking up a series is a dict hit, and a date range inside it is two
+    # binary searches followed by a zero-copy slice.
+
+    def __init__(self, data, keys=("region", "type"), date_column="Date"):
+        self.keys = tuple(keys)
+        self.date_column = date_column
+        self.data = data.sort_values(
+            by=[*self.keys, date_column], kind="mergesort"
+        ).reset_index(drop=True)
+        self.dates = self.data[date_column].to_numpy(dtype="datetime64[ns]")
+
+        # One contiguous array per numeric column so slices are plain views
+        self.arrays = {
+            column: np.ascontiguousarray(self.data[column].to_numpy())
+            for column in self.data.columns
+            if column not in self.keys
+        }
+
+        # Find where each (region, type) block starts and stops
+        size = len(self.data)
+        changed = np.zeros(size, dtype=bool)
+        if size:
+            changed[0] = True
+        for key in self.keys:
+            values = self.data[key].to_numpy()
+            changed[1:] |= values[1:] != values[:-1]
+        starts = np.flatnonzero(changed)
+        stops = np.append(starts[1:], size)
+        key_values = [self.data[key].to_numpy()[starts] for key in self.keys]
+        self.blocks = {
+            tuple(values): (int(start), int(stop))
+            for values, start, stop in zip(zip(*key_values), starts, stops)
+        }
+
+    def __contains__(self, key):
+        return tuple(key) in self.blocks
+
+    def series_keys(self):
+        return list(self.blocks)
+
+    def bounds(self, *key, start_date=None, end_date=None):
+        # Row positions [lo, hi) of the series rows between the two dates (inclusive)
+        start, stop = self.blocks.get(tuple(key), (0, 0))
+        block = self.dates[start:stop]
+        lo, hi = 0, len(block)
+        if start_date is not None:
+            lo = np.searchsorted(block, _to_datetime64(start_date), side="left")
+        if end_date is not None:
+            hi = np.searchsorted(block, _to_datetime64(end_date), side="right")
+        return start + int(lo), start + max(int(lo), int(hi))
+
+    def slice(self, *key, start_date=None, end_date=None):
+        lo, hi = self.bounds(*key, start_date=start_date, end_date=end_date)
+        return self.data.iloc[lo:hi]
+
+    def columns(self, *key, start_date=None, end_date=None, names=None):
+        # Same as slice() but returns views into the per-column NumPy arrays
+        lo, hi = self.bounds(*key, start_date=start_date, end_date=end_date)
+        names = names or list(self.arrays)
+        return {name: self.arrays[name][lo:hi] for name in names}
+
+    def append(self, rows):
+        # A new index over the current rows plus the given ones. Rows for a
+        # (region, type, Date) that already exists replace the old values.
+        data = self.data
+        rows = rows.copy()
+        for key in self.keys:
+            if isinstance(data[key].dtype, pd.CategoricalDtype):
+                categories = data[key].cat.categories.union(
+                    pd.Index(rows[key].astype(str).unique())
+                )
+                data = data.assign(**{key: data[key].cat.set_categories(categories)})
+                rows[key] = pd.Categorical(rows[key].astype(str), categories=categories)
+        combined = pd.concat([data, rows[data.columns]], ignore_index=True)
+        combined = combined.drop_duplicates(
+            subset=[*self.keys, self.date_column], keep="last"
+        )
+        return SeriesIndex(combined, keys=self.keys, date_column=self.date_column)
@@ -0,0 +1,74 @@
+# Where the dashboard's startup time goes: the imports of the libraries it
+# is built on, then importing app.py itself split into its phases (reading
+# the data, deriving the index and region arrays, fitting or loading the
+# forecasts and building the layout). Run it in a fresh interpreter:
+#
+#     python startup_profile.py            # with the caches as they are
+#     python startup_profile.py --cold     # with empty caches
+import argparse
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Imported before the app, in this order, each timed on its own. The app's
+# import then only pays for what these do not already load.
+LIBRARIES = ["numpy", "pandas", "flask", "dash"]
+# Libraries the app should only import when it first needs them
+LAZY_LIBRARIES = ["prophet", "pmdarima", "statsmodels", "matplotlib", "scipy"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Profile the dashboard's startup: imports, data load, derived arrays and forecasts"
+    )
+    parser.add_argument("--cold", action="store_true", help="start from an empty cache directory")
+    parser.add_argument(
+        "--background",
+        action="store_true",
+        help="fit the forecasts in the background thread, as the development server does",
+    )
+    return parser.parse_args(argv)
+
+
+def timed_import(name):
+    started = time.perf_counter()
+    importlib.import_module(name)
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.cold:
+        os.environ["AVOCADO_CACHE_DIR"] = tempfile.mkdtemp(prefix="avocado-cache-")
+    # Fit (or load) the forecasts while importing the app, as the WSGI server
+    # does before it forks, so their time is part of the startup
+    if not args.background:
+        os.environ.setdefault("AVOCADO_PREFORK", "1")
+
+    started = time.perf_counter()
+    print("imports")
+    for name in LIBRARIES:
+        print(f"  {name:<40} {timed_import(name):>9.3f}s")
+    app_seconds = timed_import("app")
+    print(f"  {'app':<40} {app_seconds:>9.3f}s")
+
+    from metrics import phase_report
+
+    sys.modules["app"].forecast_worker.wait()
+    print("phases")
+    for line in phase_report(["load", "startup", "forecast"]):
+        print(f"  {line}")
+    print(f"total {time.perf_counter() - started:.3f}s")
+
+    loaded = [name for name in LAZY_LIBRARIES if name in sys.modules]
+    print(f"heavy libraries imported: {', '.join(loaded) or 'none'}")
+    if args.cold:
+        shutil.rmtree(os.environ["AVOCADO_CACHE_DIR"], ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+STAT_COLUMNS = [
+    "Count",
+    "Mean",
+    "Median",
+    "Standard Deviation",
+    "Variance",
+    "Range",
+    "Interquartile Range",
+    "Min",
+    "25%",
+    "75%",
+    "Max",
+]
+
+
+def nanmean(values, axis=0):
+    # np.nanmean without the warning for all-missing columns (which give NaN)
+    present = ~np.isnan(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(present, values, 0.0).sum(axis=axis) / present.sum(axis=axis)
+
+
+def _group_codes(data, by, size):
+    # One integer code per row for the combination of the group keys
+    if not by:
+        return np.zeros(size, dtype=np.int64), None
+    if size == 0:
+        return np.zeros(0, dtype=np.int64), pd.MultiIndex.from_arrays([[]] * len(by), names=by)
+    keys = pd.MultiIndex.from_arrays([np.asarray(data[key]) for key in by], names=by)
+    codes, groups = pd.factorize(keys, sort=True)
+    return codes.astype(np.int64), groups.set_names(by)
+
+
+def _sorted_quantile(values, starts, counts, q):
+    # Linear interpolation between the closest ranks, as pandas does
+    position = starts + q * (counts - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, starts + counts - 1)
+    fraction = position - lower
+    return values[lower] + (values[upper] - values[lower]) * fraction
+
+
+def describe(data, columns, by=None):
+    # Count, mean, median, standard deviation, variance, range, interquartile
+    # range and quartiles of every column for every group. Per column this is
+    # one sort plus a few np.bincount passes, whatever the number of groups.
+    by = [by] if isinstance(by, str) else list(by or [])
+    size = len(np.asarray(data[columns[0]]))
+    codes, groups = _group_codes(data, by, size)
+    group_count = len(groups) if groups is not None else 1
+
+    frames = []
+    for column in columns:
+        values = np.asarray(data[column], dtype=np.float64)
+        present = ~np.isnan(values)
+        values, column_codes = values[present], codes[present]
+
+        # Sort by group and then by value, so every group is a sorted run
+        order = np.lexsort((values, column_codes))
+        values, column_codes = values[order], column_codes[order]
+        counts = np.bincount(column_codes, minlength=group_count)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        filled = counts > 0
+        safe_counts = np.where(filled, counts, 1)
+
+        means = np.bincount(column_codes, weights=values, minlength=group_count) / safe_counts
+        squares = np.bincount(
+            column_codes,
+            weights=(values - means[column_codes]) ** 2,
+            minlength=group_count,
+        )
+        variances = np.where(counts > 1, squares / np.maximum(counts - 1, 1), np.nan)
+
+        stats = np.full((group_count, len(STAT_COLUMNS)), np.nan)
+        stats[:, 0] = counts
+        if filled.any():
+            f_starts, f_counts = starts[filled], counts[filled]
+            low = values[f_starts]
+            high = values[f_starts + f_counts - 1]
+            q1 = _sorted_quantile(values, f_starts, f_counts, 0.25)
+            q3 = _sorted_quantile(values, f_starts, f_counts, 0.75)
+            stats[filled, 1] = means[filled]
+            stats[filled, 2] = _sorted_quantile(values, f_starts, f_counts, 0.5)
+            stats[filled, 3] = np.sqrt(variances[filled])
+            stats[filled, 4] = variances[filled]
+            stats[filled, 5] = high - low
+            stats[filled, 6] = q3 - q1
+            stats[filled, 7] = low
+            stats[filled, 8] = q1
+            stats[filled, 9] = q3
+            stats[filled, 10] = high
+        frames.append(_stats_frame(stats, groups, column))
+    return pd.concat(frames) if frames else pd.DataFrame(columns=STAT_COLUMNS)
+
+
+def _stats_frame(stats, groups, column):
+    frame = pd.DataFrame(stats, columns=STAT_COLUMNS)
+    if groups is None:
+        frame.index = pd.Index([column])
+    else:
+        frame.index = pd.MultiIndex.from_tuples(
+            [(*group, column) for group in groups], names=[*groups.names, None]
+        )
+    return frame
+
+
+class QuantileSketch:
+    # Mergeable quantile sketch with a relative accuracy guarantee (DDSketch):
+    # values are counted in logarithmic buckets, so merging two sketches is
+    # adding their bucket counts
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+
+    def _add_buckets(self, store, values):
+        buckets, counts = np.unique(
+            np.ceil(np.log(values) / self._log_gamma).astype(np.int64),
+            return_counts=True,
+        )
+        for bucket, count in zip(buckets.tolist(), counts.tolist()):
+            store[bucket] = store.get(bucket, 0) + count
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+        self._add_buckets(self.positive, values[values > 0])
+        self._add_buckets(self.negative, -values[values < 0])
+        self.zeros += int(np.count_nonzero(values == 0))
+        self.count += int(values.size)
+        return self
+
+    def merge(self, other):
+        for store, other_store in [
+            (self.positive, other.positive),
+            (self.negative, other.negative),
+        ]:
+            for bucket, count in other_store.items():
+                store[bucket] = store.get(bucket, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def _value(self, bucket):
+        return 2 * self.gamma**bucket / (self.gamma + 1)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.negative, reverse=True):
+            seen += self.negative[bucket]
+            if seen > rank:
+                return -self._value(bucket)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for bucket in sorted(self.positive):
+            seen += self.positive[bucket]
+            if seen > rank:
+                return self._value(bucket)
+        return self._value(max(self.positive))
+
+
+class StreamingStats:
+    # The statistics of describe() for data that arrives in chunks. Moments
+    # are kept as count/mean/M2 per group and merged with Welford's update
+    # (Chan et al.), quantiles come from a QuantileSketch per group and column.
+    # Two StreamingStats built on different chunks can be merged.
+
+    def __init__(self, columns, by=None, relative_accuracy=0.01):
+        self.columns = list(columns)
+        self.by = [by] if isinstance(by, str) else list(by or [])
+        self.relative_accuracy = relative_accuracy
+        self.moments = {}
+
+    def _state(self, key):
+        if key not in self.moments:
+            self.moments[key] = {
+                "count": 0,
+                "mean": 0.0,
+                "m2": 0.0,
+                "min": np.inf,
+                "max": -np.inf,
+                "sketch": QuantileSketch(self.relative_accuracy),
+            }
+        return self.moments[key]
+
+    def _combine(self, state, count, mean, m2, low, high, sketch):
+        if count == 0:
+            return
+        total = state["count"] + count
+        delta = mean - state["mean"]
+        state["mean"] += delta * count / total
+        state["m2"] += m2 + delta**2 * state["count"] * count / total
+        state["count"] = total
+        state["min"] = min(state["min"], low)
+        state["max"] = max(state["max"], high)
+        state["sketch"].merge(sketch)
+
+    def update(self, chunk):
+        size = len(chunk)
+        codes, groups = _group_codes(chunk, self.by, size)
+        if size == 0:
+            return self
+        group_keys = list(groups) if groups is not None else [()]
+        for column in self.columns:
+            values = np.asarray(chunk[column], dtype=np.float64)
+            present = ~np.isnan(values)
+            values, column_codes = values[present], codes[present]
+            order = np.argsort(column_codes, kind="stable")
+            values, column_codes = values[order], column_codes[order]
+            counts = np.bincount(column_codes, minlength=len(group_keys))
+            bounds = np.concatenate(([0], np.cumsum(counts)))
+            means = np.bincount(column_codes, weights=values, minlength=len(group_keys))
+            means = means / np.maximum(counts, 1)
+            m2 = np.bincount(
+                column_codes,
+                weights=(values - means[column_codes]) ** 2,
+                minlength=len(group_keys),
+            )
+            for code, group in enumerate(group_keys):
+                if counts[code] == 0:
+                    continue
+                group_values = values[bounds[code] : bounds[code + 1]]
+                self._combine(
+                    self._state((tuple(group), column)),
+                    int(counts[code]),
+                    float(means[code]),
+                    float(m2[code]),
+                    float(group_values.min()),
+                    float(group_values.max()),
+                    QuantileSketch(self.relative_accuracy).update(group_values),
+                )
+        return self
+
+    def merge(self, other):
+        for key, state in other.moments.items():
+            self._combine(
+                self._state(key),
+                state["count"],
+                state["mean"],
+                state["m2"],
+                state["min"],
+                state["max"],
+                state["sketch"],
+            )
+        return self
+
+    def result(self):
+        # Same layout as describe(); quantiles are within the sketch accuracy
+        rows, index = [], []
+        for (group, column), state in sorted(self.moments.items()):
+            count = state["count"]
+            variance = state["m2"] / (count - 1) if count > 1 else np.nan
+            sketch = state["sketch"]
+            q1, q3 = sketch.quantile(0.25), sketch.quantile(0.75)
+            rows.append(
+                [
+                    count,
+                    state["mean"],
+                    sketch.quantile(0.5),
+                    math.sqrt(variance) if count > 1 else np.nan,
+                    variance,
+                    state["max"] - state["min"],
+                    q3 - q1,
+                    state["min"],
+                    q1,
+                    q3,
+                    state["max"],
+                ]
+            )
+            index.append((*group, column))
+        frame = pd.DataFrame(rows, columns=STAT_COLUMNS)
+        if self.by:
+            frame.index = pd.MultiIndex.from_tuples(index, names=[*self.by, None])
+        else:
+            frame.index = pd.Index([key[-1] for key in index])
+        return frame
@@ -0,0 +1,36 @@
+import hashlib
+import threading
+
+import pandas as pd
+
+from region_matrix import RegionMatrix
+from series_index import SeriesIndex
+
+
+class DataStore:
+    # The dataset currently served by the app. append() builds a new index and
+    # region matrix and swaps them in, so readers just use store.index and
+    # store.matrix without any locking.
+
+    def __init__(self, data, version):
+        self.index = SeriesIndex(data)
+        self.matrix = RegionMatrix(self.index)
+        self.version = version
+        self._lock = threading.Lock()
+
+    @property
+    def data(self):
+        return self.index.data
+
+    def append(self, rows):
+        # Merge newly landed rows and return the (region, type) series they touched
+        if rows.empty:
+            return set()
+        with self._lock:
+            index = self.index.append(rows)
+            matrix = RegionMatrix(index)
+            digest = hashlib.sha1(self.version.encode())
+            digest.update(pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes())
+            self.index, self.matrix, self.version = index, matrix, digest.hexdigest()
+        keys = rows[list(index.keys)].astype(str).drop_duplicates()
+        return set(keys.itertuples(index=False, name=None))
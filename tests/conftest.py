@@ -0,0 +1,41 @@
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+from plotly.io.json import to_json_plotly
+
+from data_loader import load_avocado
+
+CLIENT_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets", "client_filter.js")
+
+
+@pytest.fixture(scope="session")
+def avocado():
+    # The bundled dataset, read from the CSV without touching the cache
+    return load_avocado(use_cache=False)
+
+
+@pytest.fixture
+def client():
+    # Call a function of assets/client_filter.js under node with JSON-able
+    # arguments (NumPy arrays included) and return its result
+    node = shutil.which("node")
+    if node is None:
+        pytest.skip("node is not installed")
+    with open(CLIENT_SCRIPT) as handle:
+        source = handle.read()
+
+    def call(function, *args):
+        script = (
+            "var window = {dash_clientside: {no_update: null}};\n"
+            f"{source}\n"
+            f"var args = {to_json_plotly(list(args))};\n"
+            f"var result = window.dash_clientside.avocado[{json.dumps(function)}].apply(null, args);\n"
+            "process.stdout.write(JSON.stringify(result));\n"
+        )
+        output = subprocess.run([node, "-e", script], capture_output=True, text=True, check=True)
+        return json.loads(output.stdout)
+
+    return call
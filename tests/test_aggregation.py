@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregation import CUBE_MEASURES, build_cube, rollup
+
+
+@pytest.fixture(scope="module")
+def without_totalUS(avocado):
+    data = avocado[avocado["region"] != "TotalUS"]
+    return data.assign(
+        EarnedRevenue=data["AveragePrice"] * data["Total Volume"],
+        month=data["Date"].dt.month,
+    )
+
+
+@pytest.mark.parametrize("by", ["year", "month", "region", "type", ["year", "type"]])
+def test_rollup_matches_groupby(without_totalUS, by):
+    cube = build_cube(without_totalUS)
+    expected = without_totalUS.groupby(by, sort=True, observed=True)[CUBE_MEASURES].sum()
+    result = rollup(cube, by)
+    assert list(map(str, result.index)) == list(map(str, expected.index))
+    np.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-9)
+
+
+def test_cube_counts_every_row(without_totalUS):
+    cube = build_cube(without_totalUS)
+    assert cube["rows"].sum() == len(without_totalUS)
+    assert not cube.duplicated(["year", "month", "region", "type"]).any()
+
+
+def test_cube_of_plain_strings_matches_categoricals(without_totalUS):
+    # Regions and types that are not categoricals are factorized instead
+    plain = without_totalUS.astype({"region": str, "type": str})
+    pd.testing.assert_frame_equal(build_cube(plain), build_cube(without_totalUS))
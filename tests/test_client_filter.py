@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import figures
+from downsample import lttb_indices, points_for_width
+from encoding import encode_dates
+from stats import describe
+
+SUMMARY_COLUMNS = ["AveragePrice", "Total Volume"]
+
+
+@pytest.fixture
+def series():
+    # One weekly series with two-decimal values, as the series-store sends
+    rng = np.random.default_rng(7)
+    dates = pd.date_range("2015-01-04", periods=169, freq="W")
+    return pd.DataFrame(
+        {
+            "Date": dates,
+            "AveragePrice": np.round(rng.uniform(0.5, 3.0, len(dates)), 2),
+            "Total Volume": np.round(rng.lognormal(10, 1, len(dates)), 2),
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    "start_date, end_date",
+    [
+        (None, None),
+        ("2016-01-01", "2016-12-31"),
+        ("2017-03-05T00:00:00", "2017-03-05T00:00:00"),
+        ("2015-02-01", "2015-02-20"),
+    ],
+)
+def test_summary_matches_stats_describe(client, series, start_date, end_date):
+    store = figures.series_store({name: series[name] for name in series.columns})
+    rows = client("summary", store, start_date, end_date)
+
+    selected = series
+    if start_date is not None:
+        dates = series["Date"]
+        selected = series[(dates >= start_date[:10]) & (dates <= end_date[:10])]
+    stats = describe(selected, SUMMARY_COLUMNS).round(2)
+
+    assert [row["Statistic"] for row in rows] == list(stats.columns)
+    for row, (_, expected) in zip(rows, stats.T.iterrows()):
+        for column in SUMMARY_COLUMNS:
+            if pd.isna(expected[column]):
+                assert row[column] is None
+            else:
+                # Both round to cents, NumPy halves to even and JavaScript halves up
+                assert row[column] == pytest.approx(expected[column], abs=0.0101)
+
+
+def test_summary_of_empty_selection_is_null(client, series):
+    store = figures.series_store({name: series[name] for name in series.columns})
+    rows = client("summary", store, "2020-01-01", "2020-12-31")
+    assert all(row[column] is None for row in rows for column in SUMMARY_COLUMNS)
+
+
+def weekly_series(size, seed=11):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2015-01-04", periods=size, freq="W")
+    return pd.DataFrame(
+        {
+            "Date": dates,
+            "AveragePrice": np.round(rng.uniform(0.5, 3.0, size), 2),
+            "Total Volume": np.round(rng.lognormal(10, 1, size), 2),
+        }
+    )
+
+
+# (size - 2) / (points - 2) is a whole number only for (394, 100), and a
+# series of 90 weeks fits in the chart as it is
+@pytest.mark.parametrize(
+    "size, width",
+    [(169, 100), (394, 100), (457, 150), (1000, 300), (1337, None), (90, 100)],
+)
+def test_chart_lttb_matches_downsample(client, size, width):
+    series = weekly_series(size)
+    store = figures.series_store({name: series[name] for name in series.columns})
+    figure = {"data": [{"type": "scatter", "mode": "lines"}], "layout": {}}
+    result = client("priceChart", store, None, None, width, figure)
+
+    # The client runs LTTB on epoch milliseconds
+    x = series["Date"].to_numpy(dtype="datetime64[ms]").astype(np.int64)
+    kept = lttb_indices(x, series["AveragePrice"], points_for_width(width))
+    trace = result["data"][0]
+    assert trace["x"] == x[kept].tolist()
+    assert trace["y"] == series["AveragePrice"].to_numpy()[kept].tolist()
+
+
+def test_comparison_lttb_matches_downsample(client):
+    # Every trace of the comparison figure is cut and downsampled on its own
+    series = [weekly_series(size, seed) for size, seed in [(300, 1), (257, 2)]]
+    figure = {
+        "data": [
+            {"type": "scatter", "x": encode_dates(s["Date"], binary=False), "y": s["AveragePrice"]}
+            for s in series
+        ],
+        "layout": {},
+    }
+    result = client("comparisonChart", figure, "2015-06-01", "2019-12-31", 100)
+
+    for s, trace in zip(series, result["data"]):
+        selected = s[(s["Date"] >= "2015-06-01") & (s["Date"] <= "2019-12-31")]
+        x = selected["Date"].to_numpy(dtype="datetime64[ms]").astype(np.int64)
+        kept = lttb_indices(x, selected["AveragePrice"], 100)
+        assert len(kept) == 100
+        assert trace["x"] == x[kept].tolist()
+        assert trace["y"] == selected["AveragePrice"].to_numpy()[kept].tolist()
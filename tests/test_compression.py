@@ -0,0 +1,61 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask, Response
+
+import compression
+from compression import enable_compression
+
+PAYLOAD = json.dumps({"x": list(range(500)), "y": [1.25] * 500})
+
+
+@pytest.fixture
+def server():
+    server = Flask(__name__)
+
+    @server.route("/data")
+    def data():
+        return Response(PAYLOAD, mimetype="application/json")
+
+    @server.route("/small")
+    def small():
+        return Response("{}", mimetype="application/json")
+
+    @server.route("/image")
+    def image():
+        return Response(b"\x89PNG" * 500, mimetype="image/png")
+
+    return enable_compression(server).test_client()
+
+
+def test_gzip(server):
+    response = server.get("/data", headers={"Accept-Encoding": "gzip, deflate"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert int(response.headers["Content-Length"]) == len(response.data) < len(PAYLOAD)
+    assert gzip.decompress(response.data).decode() == PAYLOAD
+
+
+def test_brotli(server):
+    brotli = pytest.importorskip("brotli")
+    response = server.get("/data", headers={"Accept-Encoding": "gzip, deflate, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert brotli.decompress(response.data).decode() == PAYLOAD
+
+
+def test_gzip_without_brotli(server, monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    response = server.get("/data", headers={"Accept-Encoding": "br;q=1.0, gzip;q=0.5"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.data).decode() == PAYLOAD
+
+
+@pytest.mark.parametrize(
+    "path, accept_encoding",
+    [("/data", ""), ("/data", "identity"), ("/small", "gzip"), ("/image", "gzip")],
+)
+def test_left_uncompressed(server, path, accept_encoding):
+    # Nothing the client accepts, too small to gain, or already compressed
+    response = server.get(path, headers={"Accept-Encoding": accept_encoding})
+    assert "Content-Encoding" not in response.headers
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import statsmodels.api as sm
+
+from decomposition import COMPONENTS, Decomposition, decompose
+from region_matrix import RegionMatrix
+from series_index import SeriesIndex
+
+
+@pytest.fixture(scope="module")
+def matrix(avocado):
+    return RegionMatrix(SeriesIndex(avocado))
+
+
+def test_decompose_matches_statsmodels(matrix):
+    # Every complete series of the bundled data, decomposed in one pass
+    volumes = matrix.values["organic", "Total Volume"]
+    complete = ~np.isnan(volumes).any(axis=0)
+    volumes = volumes[:, complete]
+    components = decompose(volumes, 52)
+    for column in range(volumes.shape[1]):
+        expected = sm.tsa.seasonal_decompose(volumes[:, column], model="additive", period=52)
+        for name in ["trend", "seasonal", "resid"]:
+            np.testing.assert_allclose(
+                components[name][:, column], getattr(expected, name), rtol=1e-9, atol=1e-6
+            )
+
+
+@pytest.mark.parametrize("period", [4, 7])
+def test_decompose_matches_statsmodels_for_other_periods(period):
+    rng = np.random.default_rng(period)
+    values = rng.normal(100, 10, (60, 3)) + np.arange(60)[:, None]
+    components = decompose(values, period)
+    for column in range(values.shape[1]):
+        expected = sm.tsa.seasonal_decompose(values[:, column], model="additive", period=period)
+        np.testing.assert_allclose(components["trend"][:, column], expected.trend, rtol=1e-9)
+        np.testing.assert_allclose(components["seasonal"][:, column], expected.seasonal, rtol=1e-9)
+
+
+def test_missing_weeks_leave_their_windows_out():
+    values = np.arange(30, dtype=np.float64)[:, None]
+    values[15] = np.nan
+    trend = decompose(values, 4)["trend"][:, 0]
+    assert np.isnan(trend[13:18]).all()
+    assert not np.isnan(trend[2:13]).any()
+
+
+def test_write_and_read_back(matrix, tmp_path):
+    decomposition = Decomposition.from_matrix(matrix)
+    directory = str(tmp_path / "decomposition")
+    decomposition.write(directory)
+    read = Decomposition.read(directory)
+    assert read.keys == decomposition.keys
+    np.testing.assert_array_equal(read.dates, decomposition.dates)
+    for name in COMPONENTS:
+        np.testing.assert_array_equal(read.components[name], decomposition.components[name])
@@ -0,0 +1,87 @@
+import base64
+import gzip
+import importlib
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask, Response
+from plotly.io.json import to_json_plotly
+
+import encoding
+import figures
+from compression import enable_compression
+
+
+@pytest.fixture
+def binary_traces(monkeypatch):
+    # As if the server started with AVOCADO_BINARY_TRACES=1, serving a
+    # plotly.js that decodes typed arrays
+    monkeypatch.setenv("AVOCADO_BINARY_TRACES", "1")
+    importlib.reload(encoding)
+    encoding.binary_traces_supported = lambda: True
+    yield
+    monkeypatch.undo()
+    importlib.reload(encoding)
+
+
+def decode(array):
+    # What plotly.js does with a {"dtype", "bdata"} typed array
+    return np.frombuffer(base64.b64decode(array["bdata"]), dtype=np.dtype(array["dtype"]).newbyteorder("<"))
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(5)
+    dates = pd.date_range("2015-01-04", periods=169, freq="W")
+    return dates, rng.uniform(0.5, 3.0, len(dates)).astype(np.float32)
+
+
+def serve(figure):
+    # The figure as a compressed JSON response, the way Dash sends it
+    server = Flask(__name__)
+
+    @server.route("/figure")
+    def figure_response():
+        return Response(to_json_plotly(figure), mimetype="application/json")
+
+    response = enable_compression(server).test_client().get("/figure", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    return json.loads(gzip.decompress(response.data))
+
+
+def test_binary_round_trip(binary_traces, series):
+    dates, prices = series
+    trace = serve(figures.price_figure(dates, prices))["data"][0]
+    assert trace["x"]["dtype"] == "f8" and trace["y"]["dtype"] == "f4"
+    np.testing.assert_array_equal(decode(trace["x"]).astype("datetime64[ms]"), dates.to_numpy())
+    np.testing.assert_array_equal(decode(trace["y"]), prices)
+
+
+def test_binary_forecast_round_trip(binary_traces):
+    forecast = pd.DataFrame(
+        {
+            "ds": pd.date_range("2018-04-01", periods=12, freq="W"),
+            "yhat": np.linspace(1.0, 1.5, 12),
+            "yhat_lower": np.linspace(0.9, 1.2, 12),
+            "yhat_upper": np.linspace(1.1, 1.8, 12),
+        }
+    )
+    data = serve(figures.forecast_figure(forecast))["data"]
+    for trace, column in zip(data, ["yhat", "yhat_upper", "yhat_lower"]):
+        np.testing.assert_array_equal(decode(trace["x"]).astype("datetime64[ms]"), forecast["ds"].to_numpy())
+        np.testing.assert_array_equal(decode(trace["y"]), forecast[column].to_numpy())
+
+
+def test_plain_traces_by_default(series):
+    # Without the setting (or with an older plotly.js) traces stay JSON arrays
+    dates, prices = series
+    trace = serve(figures.price_figure(dates, prices))["data"][0]
+    assert trace["x"][:2] == ["2015-01-04", "2015-01-11"]
+    np.testing.assert_array_equal(trace["y"], np.round(prices.astype(np.float64), figures.VALUE_DECIMALS))
+
+
+def test_binary_traces_need_a_recent_plotly(binary_traces, monkeypatch):
+    monkeypatch.setattr(encoding, "binary_traces_supported", lambda: False)
+    assert isinstance(encoding.encode_values(np.arange(3.0)), np.ndarray)
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+from fast_forecast import holt_winters, seasonal_naive
+
+WEEKS = 156
+DATES = pd.date_range("2015-01-04", periods=WEEKS, freq="W").to_numpy()
+STEPS = np.arange(WEEKS)
+SERIES = {
+    "trend": 100 + 0.5 * STEPS,
+    "seasonal": 100 + 20 * np.sin(2 * np.pi * STEPS / 52),
+    "trend and season": 100 + 0.5 * STEPS + 20 * np.sin(2 * np.pi * STEPS / 52),
+}
+
+
+def noisy(seed=0):
+    rng = np.random.default_rng(seed)
+    return SERIES["trend and season"] + rng.normal(0, 2, WEEKS)
+
+
+@pytest.mark.parametrize("name", list(SERIES))
+def test_holt_winters_matches_statsmodels(name):
+    values = SERIES[name]
+    forecast = holt_winters([(DATES, values)], 0.95, 26)[0]
+    expected = (
+        ExponentialSmoothing(values, trend="add", seasonal="add", seasonal_periods=52)
+        .fit()
+        .forecast(26)
+    )
+    np.testing.assert_allclose(forecast["yhat"], expected, rtol=1e-3)
+    expected_dates = pd.date_range(DATES[-1], periods=27, freq="W")[1:]
+    np.testing.assert_array_equal(forecast["ds"], expected_dates)
+
+
+def test_holt_winters_forecasts_every_series_at_once():
+    series = [(DATES, values) for values in SERIES.values()]
+    together = holt_winters(series, 0.95, 10)
+    for (dates, values), frame in zip(series, together):
+        pd.testing.assert_frame_equal(frame, holt_winters([(dates, values)], 0.95, 10)[0])
+
+
+@pytest.mark.parametrize("engine", [holt_winters, seasonal_naive])
+def test_interval_widens(engine):
+    forecast = engine([(DATES, noisy())], 0.8, 60)[0]
+    width = (forecast["yhat_upper"] - forecast["yhat_lower"]).to_numpy()
+    assert (width > 0).all()
+    assert (np.diff(width) >= -1e-9).all()
+    assert width[-1] > width[0]
+    # A wider interval around the same forecast
+    wider = engine([(DATES, noisy())], 0.95, 60)[0]
+    np.testing.assert_allclose(wider["yhat"], forecast["yhat"])
+    assert ((wider["yhat_upper"] - wider["yhat_lower"]).to_numpy() > width).all()
+
+
+@pytest.mark.parametrize("engine", [holt_winters, seasonal_naive])
+def test_too_short_series_are_none(engine):
+    forecasts = engine([(DATES[:2], [1.0, 2.0]), (DATES, noisy())], 0.8, 4)
+    assert forecasts[0] is None
+    assert forecasts[1] is not None
+
+
+def test_seasonal_naive_repeats_last_year():
+    values = noisy()
+    forecast = seasonal_naive([(DATES, values)], 0.8, 60)[0]
+    expected = np.concatenate([values[-52:], values[-52:]])[:60]
+    np.testing.assert_allclose(forecast["yhat"], expected)
+
+
+def test_seasonal_naive_without_a_year_repeats_last_value():
+    forecast = seasonal_naive([(DATES[:10], np.arange(10.0))], 0.8, 5)[0]
+    np.testing.assert_allclose(forecast["yhat"], 9.0)
+
+
+def test_missing_weeks():
+    values = SERIES["trend"].copy()
+    gaps = np.ones(WEEKS, dtype=bool)
+    gaps[[20, 70, 71, 140]] = False
+    forecast = holt_winters([(DATES[gaps], values[gaps])], 0.95, 3)[0]
+    # The gap in the first season shifts its mean, and so the starting state, a little
+    np.testing.assert_allclose(forecast["yhat"], [178.0, 178.5, 179.0], rtol=1e-3)
+
+    # A week missing a year back falls back to the closest earlier week
+    naive = seasonal_naive([(DATES[gaps], values[gaps])], 0.8, 52)[0]
+    position = 140 - (WEEKS - 52)
+    assert naive["yhat"][position] == values[139]
+    assert np.isfinite(naive[["yhat", "yhat_lower", "yhat_upper"]].to_numpy()).all()
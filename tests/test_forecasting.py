@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import forecasting
+from forecasting import ForecastWorker
+from series_index import SeriesIndex
+
+
+def frame(region, weeks):
+    dates = pd.date_range("2015-01-04", periods=weeks, freq="W")
+    return pd.DataFrame(
+        {
+            "Date": dates,
+            "region": region,
+            "type": "organic",
+            "AveragePrice": 1.5 + 0.1 * np.sin(np.arange(weeks) / 8),
+        }
+    )
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr(forecasting, "FORECAST_DIR", str(tmp_path))
+    return SeriesIndex(pd.concat([frame("Albany", 120), frame("Atlantis", 2), frame("Boston", 60)]))
+
+
+def worker(index):
+    return ForecastWorker(index, "v1", interval_width=0.8, weeks_to_forecast=4, engine="holt-winters")
+
+
+def test_states_of_fitted_and_too_short_series(index):
+    forecasts = worker(index)
+    assert forecasts.state(("Albany", "organic")) == "pending"
+    forecasts.prime()
+    assert forecasts.state(("Albany", "organic")) == "ready"
+    assert len(forecasts.get(("Albany", "organic"))) == 4
+    assert forecasts.state(("Atlantis", "organic")) == "too-short"
+    assert forecasts.get(("Atlantis", "organic")) is None
+
+
+def test_failed_series_and_later_refit(index, monkeypatch):
+    engine = forecasting.BATCH_ENGINES["holt-winters"]
+
+    def without_boston(series, *args):
+        frames = engine(series, *args)
+        return [None if len(dates) == 60 else result for (dates, _), result in zip(series, frames)]
+
+    monkeypatch.setitem(forecasting.BATCH_ENGINES, "holt-winters", without_boston)
+    forecasts = worker(index).prime()
+    assert forecasts.state(("Boston", "organic")) == "failed"
+
+    # A refit that succeeds clears the failure; other failures are kept
+    monkeypatch.setitem(forecasting.BATCH_ENGINES, "holt-winters", engine)
+    forecasts._run(index, "v2", {("Boston", "organic")})
+    assert forecasts.state(("Boston", "organic")) == "ready"
+    assert forecasts.state(("Atlantis", "organic")) == "too-short"
+
+
+def test_new_series_is_pending_until_refit(index):
+    forecasts = worker(index).prime()
+    assert forecasts.state(("Chicago", "organic")) == "pending"
@@ -0,0 +1,41 @@
+import os
+
+import metrics
+from metrics import Registry, collect, retire_snapshots, snapshot_name, write_snapshot
+
+
+def registry_with(count):
+    registry = Registry()
+    registry.counter("requests_total", "Requests", ["route"]).inc(count, route="/")
+    registry.histogram("seconds", "Seconds", buckets=(1.0,)).observe(0.5)
+    return registry
+
+
+def total(registry):
+    return registry.metrics["requests_total"].state()[("/",)]
+
+
+def test_snapshot_name_changes_with_the_process(monkeypatch):
+    name = snapshot_name()
+    assert name.startswith(f"{os.getpid()}-")
+    assert snapshot_name() == name
+    # A process that reuses the pid (or a forked child) gets a new name
+    monkeypatch.setattr(metrics, "_snapshot_name", (os.getpid(), "stale"))
+    monkeypatch.setattr(os, "getpid", lambda: 12345)
+    assert snapshot_name().startswith("12345-")
+
+
+def test_retired_snapshots_keep_their_counts(tmp_path):
+    directory = str(tmp_path)
+    write_snapshot(directory, "master", registry_with(1))
+    write_snapshot(directory, "101-aaaa", registry_with(2))
+    write_snapshot(directory, "102-bbbb", registry_with(4))
+    write_snapshot(directory, "103-cccc", registry_with(8))
+
+    retire_snapshots(101, directory, registry_with(0))
+    retire_snapshots(102, directory, registry_with(0))
+    retire_snapshots(999, directory, registry_with(0))
+
+    assert sorted(os.listdir(directory)) == ["103-cccc.pickle", "exited.pickle", "master.pickle"]
+    assert total(collect(directory, registry_with(0))) == 15
+    assert collect(directory, registry_with(0)).metrics["seconds"].totals()[()] == (4, 2.0)
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregation import CUBE_KEYS, build_cube
+from pipeline import (
+    WEEKLY_COLUMNS,
+    histogram_bin_edges,
+    histogram_kde_kws,
+    histogram_quantile,
+    iter_chunks,
+    summarize,
+)
+from stats import describe
+
+
+@pytest.fixture(scope="module")
+def without_totalUS(avocado):
+    return avocado[avocado["region"] != "TotalUS"].reset_index(drop=True)
+
+
+@pytest.fixture(scope="module")
+def summary():
+    # Small chunks, so every aggregate is merged many times
+    return summarize(iter_chunks(chunksize=997))
+
+
+def test_weekly_matches_resample(summary, without_totalUS):
+    expected = without_totalUS.set_index("Date")[WEEKLY_COLUMNS].resample("W").mean()
+    pd.testing.assert_frame_equal(summary.weekly(), expected, check_freq=False, rtol=1e-9)
+
+
+def test_merged_summaries_match_one_pass(without_totalUS):
+    halves = np.array_split(without_totalUS, 2)
+    merged = summarize([halves[0]]).merge(summarize([halves[1]]))
+    whole = summarize([without_totalUS])
+    pd.testing.assert_frame_equal(merged.weekly(), whole.weekly())
+    pd.testing.assert_frame_equal(merged.cube, whole.cube)
+    assert merged.price_counts == whole.price_counts
+
+
+def test_cube_matches_build_cube(summary, without_totalUS):
+    expected = build_cube(without_totalUS).sort_values(CUBE_KEYS, ignore_index=True)
+    pd.testing.assert_frame_equal(summary.cube[expected.columns], expected, check_dtype=False)
+
+
+def test_missing_matches_isnull(summary, without_totalUS):
+    pd.testing.assert_series_equal(summary.missing, without_totalUS.isnull().sum(), check_dtype=False)
+
+
+@pytest.mark.parametrize("q", [0, 0.1, 0.25, 0.5, 0.75, 0.9, 1])
+def test_histogram_quantile_matches_pandas(summary, without_totalUS, q):
+    expected = without_totalUS["AveragePrice"].quantile(q)
+    assert histogram_quantile(summary.price_histogram(), q) == pytest.approx(expected, abs=1e-9)
+
+
+def test_histogram_bin_edges_match_numpy(summary, without_totalUS):
+    expected = np.histogram_bin_edges(without_totalUS["AveragePrice"], bins="auto")
+    np.testing.assert_allclose(histogram_bin_edges(summary.price_histogram()), expected)
+
+
+def test_histogram_kde_matches_raw_kde(summary, without_totalUS):
+    # seaborn's KDE of the weighted histogram against the one of every price
+    from seaborn._statistics import KDE
+
+    histogram = summary.price_histogram()
+    kws = histogram_kde_kws(histogram)
+    density, support = KDE(**kws)(histogram.index.to_numpy(), weights=histogram.to_numpy())
+    expected_density, expected_support = KDE()(without_totalUS["AveragePrice"].to_numpy())
+    np.testing.assert_allclose(support, expected_support, rtol=1e-9)
+    np.testing.assert_allclose(density, expected_density, rtol=1e-9, atol=1e-12)
+
+
+def test_describe_matches_stats(summary, without_totalUS):
+    columns = ["AveragePrice", "Total Volume"]
+    expected = describe(without_totalUS, columns)
+    pd.testing.assert_frame_equal(summary.describe(), expected, rtol=1e-9, check_dtype=False)
+    # What avocado.py prints
+    pd.testing.assert_frame_equal(summary.describe().round(2), expected.round(2), check_dtype=False)
+
+
+def test_describe_with_the_sketch(without_totalUS):
+    sketched = summarize(iter_chunks(chunksize=997), exact_quantiles=False)
+    assert sketched.volumes is None
+    result = sketched.describe()
+    expected = describe(without_totalUS, ["AveragePrice", "Total Volume"])
+    # Everything but the Total Volume quantiles is still exact
+    pd.testing.assert_series_equal(result.loc["AveragePrice"], expected.loc["AveragePrice"], rtol=1e-9)
+    assert result.loc["Total Volume", "Mean"] == pytest.approx(expected.loc["Total Volume", "Mean"])
+    # The quartiles come from a sketch with 1% relative accuracy
+    for quantile in ["Median", "25%", "75%"]:
+        assert result.loc["Total Volume", quantile] == pytest.approx(
+            expected.loc["Total Volume", quantile], rel=0.01
+        )
+    # Merging with a sketched summary keeps only the sketch
+    assert summarize([without_totalUS]).merge(sketched).volumes is None
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from region_matrix import RegionMatrix
+from series_index import SeriesIndex
+
+REGIONS = ["Albany", "Boise", "West", "SanFrancisco"]
+
+
+@pytest.fixture(scope="module")
+def data(avocado):
+    # The bundled data with weeks missing: a year of Albany, a few scattered
+    # Boise weeks, and some TotalUS weeks (no total, so no share)
+    dates = avocado["Date"]
+    weeks = np.sort(dates.unique())
+    missing = (
+        ((avocado["region"] == "Albany") & (dates.dt.year == 2016))
+        | ((avocado["region"] == "Boise") & dates.isin(weeks[::17]))
+        | ((avocado["region"] == "TotalUS") & dates.isin(weeks[5:9]))
+    )
+    return avocado[~missing].reset_index(drop=True)
+
+
+@pytest.fixture(scope="module")
+def matrix(data):
+    return RegionMatrix(SeriesIndex(data))
+
+
+def pandas_share(data, avocado_type, regions, start_date=None, end_date=None):
+    # Every region's Total Volume over TotalUS's by week, from a pivot table
+    selected = data[data["type"] == avocado_type]
+    volumes = selected.pivot(index="Date", columns="region", values="Total Volume")
+    volumes = volumes.reindex(sorted(data["Date"].unique()))
+    shares = volumes.reindex(columns=regions).div(volumes["TotalUS"], axis=0)
+    return shares.loc[start_date:end_date]
+
+
+@pytest.mark.parametrize("avocado_type", ["conventional", "organic"])
+@pytest.mark.parametrize(
+    "start_date, end_date", [(None, None), ("2016-01-01", "2016-12-31"), ("2015-01-15", "2015-03-31")]
+)
+def test_share_matches_pandas(data, matrix, avocado_type, start_date, end_date):
+    dates, shares = matrix.share(avocado_type, REGIONS, start_date=start_date, end_date=end_date)
+    expected = pandas_share(data, avocado_type, REGIONS, start_date, end_date)
+    np.testing.assert_array_equal(dates, expected.index.to_numpy())
+    np.testing.assert_allclose(shares, expected.to_numpy(), rtol=1e-6)
+
+
+def test_share_of_missing_weeks(data, matrix):
+    dates, shares = matrix.share("organic", REGIONS)
+    in_2016 = pd.DatetimeIndex(dates).year == 2016
+    # No row for the region, or for TotalUS, is no share rather than zero
+    assert np.isnan(shares[in_2016, 0]).all()
+    assert np.isnan(shares[::17, 1]).all()
+    assert np.isnan(shares[5:9]).all()
+    # West has every week, so only the weeks without a total are missing
+    assert np.flatnonzero(np.isnan(shares[:, 2])).tolist() == [5, 6, 7, 8]
+
+
+def test_share_of_unknown_region(matrix):
+    _, shares = matrix.share("organic", ["Atlantis", "West"])
+    assert np.isnan(shares[:, 0]).all()
+    assert np.isfinite(shares[:, 1]).any()
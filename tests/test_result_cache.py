@@ -0,0 +1,106 @@
+import os
+import time
+
+import result_cache
+from result_cache import DiskCache, cache_key, cached
+
+
+def age(cache, key, access=None, write=None):
+    # Move an entry's access and write times back by that many seconds
+    path = cache._path(key)
+    stat = os.stat(path)
+    now = time.time()
+    os.utime(
+        path,
+        (
+            now - access if access is not None else stat.st_atime,
+            now - write if write is not None else stat.st_mtime,
+        ),
+    )
+
+
+def test_hit_and_miss(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    assert cache.get("ab12") == (False, None)
+    cache.set("ab12", {"figure": [1, 2]})
+    assert cache.get("ab12") == (True, {"figure": [1, 2]})
+
+
+def test_expired_entries_are_misses_and_evicted(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl=60)
+    cache.set("aa01", "old")
+    cache.set("aa02", "new")
+    age(cache, "aa01", write=120)
+    assert cache.get("aa01") == (False, None)
+    assert cache.get("aa02") == (True, "new")
+    assert cache.evict() == 1
+    assert not os.path.exists(cache._path("aa01"))
+
+
+def test_reading_keeps_the_write_time(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl=60)
+    cache.set("aa01", "value")
+    age(cache, "aa01", write=50)
+    assert cache.get("aa01") == (True, "value")
+    # A hit does not extend the entry's life
+    assert time.time() - os.stat(cache._path("aa01")).st_mtime >= 50
+
+
+def test_least_recently_used_entries_are_evicted_first(tmp_path):
+    value = b"x" * 1000
+    cache = DiskCache(str(tmp_path), max_bytes=2500)
+    for key in ["aa01", "bb02", "cc03"]:
+        cache.set(key, value)
+    age(cache, "aa01", access=30)
+    age(cache, "bb02", access=20)
+    age(cache, "cc03", access=10)
+    # Reading the oldest entry makes bb02 the least recently used
+    assert cache.get("aa01")[0]
+
+    assert cache.evict() == 1
+    assert [cache.get(key)[0] for key in ["aa01", "bb02", "cc03"]] == [True, False, True]
+
+
+def test_eviction_runs_every_few_writes(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=0, evict_every=3)
+    cache.set("aa01", 1)
+    cache.set("aa02", 2)
+    assert len(list(cache.entries())) == 2
+    cache.set("aa03", 3)
+    assert list(cache.entries()) == []
+
+
+def test_new_code_version_invalidates_results(tmp_path, monkeypatch):
+    calls = []
+
+    @cached(DiskCache(str(tmp_path)), "square")
+    def square(value, version):
+        calls.append(value)
+        return value * value
+
+    monkeypatch.setattr(result_cache, "code_version", lambda: "release-1")
+    assert square(3, "v1") == 9
+    assert square(3, "v1") == 9
+    assert calls == [3]
+
+    monkeypatch.setattr(result_cache, "code_version", lambda: "release-2")
+    assert square(3, "v1") == 9
+    assert calls == [3, 3]
+
+
+def test_code_version_follows_the_modules(tmp_path, monkeypatch):
+    module = tmp_path / "module.py"
+    module.write_text("VALUE = 1\n")
+    monkeypatch.setattr(result_cache, "BASE_DIR", str(tmp_path))
+    result_cache.code_version.cache_clear()
+    try:
+        before = result_cache.code_version()
+        key = cache_key("square", [3])
+        module.write_text("VALUE = 2\n")
+        # Computed once per process
+        assert result_cache.code_version() == before
+        result_cache.code_version.cache_clear()
+        assert result_cache.code_version() != before
+        assert cache_key("square", [3]) != key
+    finally:
+        result_cache.code_version.cache_clear()
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from series_index import SeriesIndex
+
+RANGES = [
+    (None, None),
+    ("2016-01-01", "2016-12-31"),
+    ("2017-03-05", "2017-03-05"),
+    ("2015-06-10", None),
+    (None, "2015-02-01"),
+    ("2019-01-01", "2019-12-31"),
+]
+
+
+def query(data, region, avocado_type, start_date, end_date):
+    # What update_data used to filter with, sorted by date like the index
+    conditions = ["region == @region", "type == @avocado_type"]
+    if start_date is not None:
+        conditions.append("Date >= @start_date")
+    if end_date is not None:
+        conditions.append("Date <= @end_date")
+    selected = data.query(" and ".join(conditions))
+    return selected.sort_values("Date", kind="mergesort").reset_index(drop=True)
+
+
+@pytest.fixture(scope="module")
+def index(avocado):
+    return SeriesIndex(avocado)
+
+
+@pytest.mark.parametrize(
+    "region, avocado_type",
+    [("Albany", "organic"), ("TotalUS", "conventional"), ("West", "organic")],
+)
+@pytest.mark.parametrize("start_date, end_date", RANGES)
+def test_slice_matches_query(avocado, index, region, avocado_type, start_date, end_date):
+    expected = query(avocado, region, avocado_type, start_date, end_date)
+    sliced = index.slice(region, avocado_type, start_date=start_date, end_date=end_date)
+    pd.testing.assert_frame_equal(sliced.reset_index(drop=True), expected[sliced.columns])
+
+    columns = index.columns(region, avocado_type, start_date=start_date, end_date=end_date)
+    for name, values in columns.items():
+        assert (values == expected[name].to_numpy()).all()
+
+
+def test_unknown_series_is_empty(index):
+    assert index.slice("Atlantis", "organic").empty
+
+
+def test_append_replaces_existing_rows(avocado, index):
+    latest = avocado[(avocado["region"] == "Albany") & (avocado["type"] == "organic")]
+    latest = latest[latest["Date"] == latest["Date"].max()].copy()
+    latest["AveragePrice"] = 9.99
+    new_week = latest.assign(Date=latest["Date"] + pd.Timedelta(weeks=1), region="Atlantis")
+
+    appended = index.append(pd.concat([latest, new_week]))
+    assert len(appended.data) == len(avocado) + 1
+    assert appended.slice("Albany", "organic")["AveragePrice"].iloc[-1] == 9.99
+    assert len(appended.slice("Atlantis", "organic")) == 1
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stats import STAT_COLUMNS, StreamingStats, describe, nanmean
+
+COLUMNS = ["AveragePrice", "Total Volume"]
+
+
+def pandas_describe(data, columns, by=None):
+    # The same table from pandas, one row per (group..., column)
+    rows = {}
+    groups = data.groupby(by, observed=True, sort=True) if by else [((), data)]
+    for group, frame in groups:
+        group = group if isinstance(group, tuple) else (group,)
+        for column in columns:
+            values = frame[column]
+            q1, q3 = values.quantile(0.25), values.quantile(0.75)
+            rows[(*group, column)] = [
+                values.count(),
+                values.mean(),
+                values.median(),
+                values.std(),
+                values.var(),
+                values.max() - values.min(),
+                q3 - q1,
+                values.min(),
+                q1,
+                q3,
+                values.max(),
+            ]
+    return pd.DataFrame.from_dict(rows, orient="index", columns=STAT_COLUMNS)
+
+
+@pytest.fixture(scope="module")
+def data(avocado):
+    # The bundled data with some missing values, and one series with none left
+    data = avocado.copy()
+    rng = np.random.default_rng(3)
+    data.loc[rng.random(len(data)) < 0.05, "AveragePrice"] = np.nan
+    data.loc[(data["region"] == "Albany") & (data["type"] == "organic"), "Total Volume"] = np.nan
+    return data
+
+
+def test_describe_matches_pandas(data):
+    result = describe(data, COLUMNS)
+    expected = pandas_describe(data, COLUMNS)
+    np.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-9)
+    assert list(result.index) == COLUMNS
+
+
+@pytest.mark.parametrize("by", ["region", ["region", "type"], ["year", "type"]])
+def test_grouped_describe_matches_pandas(data, by):
+    result = describe(data, COLUMNS, by=by)
+    expected = pandas_describe(data, COLUMNS, by=by)
+    result = result.sort_index()
+    expected.index = pd.MultiIndex.from_tuples(expected.index)
+    expected = expected.sort_index()
+    assert [tuple(map(str, key)) for key in result.index] == [tuple(map(str, key)) for key in expected.index]
+    np.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-9, equal_nan=True)
+
+
+def test_grouped_describe_of_a_series_without_values(data):
+    result = describe(data, COLUMNS, by=["region", "type"])
+    row = result.loc[("Albany", "organic", "Total Volume")]
+    assert row["Count"] == 0
+    assert row.drop("Count").isna().all()
+
+
+def test_streaming_stats_match_pandas(data):
+    chunks = np.array_split(data, 7)
+    streamed = StreamingStats(COLUMNS, by="type")
+    for chunk in chunks[:4]:
+        streamed.update(chunk)
+    other = StreamingStats(COLUMNS, by="type")
+    for chunk in chunks[4:]:
+        other.update(chunk)
+    result = streamed.merge(other).result()
+    expected = pandas_describe(data, COLUMNS, by="type")
+    expected.index = pd.MultiIndex.from_tuples(expected.index)
+
+    moments = ["Count", "Mean", "Standard Deviation", "Variance", "Range", "Min", "Max"]
+    np.testing.assert_allclose(result[moments].to_numpy(), expected[moments].to_numpy(), rtol=1e-9)
+    # Quantiles come from a sketch with 1% relative accuracy
+    for quantile in ["Median", "25%", "75%"]:
+        np.testing.assert_allclose(result[quantile].to_numpy(), expected[quantile].to_numpy(), rtol=0.01)
+
+
+def test_nanmean():
+    values = np.array([[1.0, np.nan], [3.0, np.nan]])
+    np.testing.assert_array_equal(nanmean(values), [2.0, np.nan])
@@ -0,0 +1,33 @@
+# WSGI entry point for serving the dashboard with several worker processes:
+#
+#     gunicorn -c gunicorn.conf.py wsgi:application
+#
+# The app is imported once in the server process before it forks (preload_app
+# in gunicorn.conf.py), so the data, the index arrays and the forecasts are
+# built once and every worker shares them copy-on-write. Rows in the incoming
+# directory are merged at that import; new ones are picked up by the next
+# start rather than live (see PREFORK in app.py).
+import gc
+import os
+
+os.environ.setdefault("AVOCADO_PREFORK", "1")
+
+from app import app, decomposition_for, store  # noqa: E402
+
+application = app.server
+
+# Build the layout and the callback map once here as well: the first request
+# imports most of plotly and dash lazily, which would otherwise happen again
+# in every worker
+with application.test_request_context():
+    app._setup_server()
+    app.serve_layout()
+    app.dependencies()
+
+# Decompose (or map from the cache) every series once here too, so the
+# workers share the arrays instead of each building its own on first view
+decomposition_for(store.version)
+
+# Keep everything loaded so far out of the garbage collector, whose passes
+# would otherwise write to those objects in each worker and copy their pages
+gc.freeze()